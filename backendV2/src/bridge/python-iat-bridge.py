@@ -4,18 +4,35 @@ Python IAT Bridge - Comunicación entre Python IAT y Node.js
 Proporciona endpoints para ejecutar análisis IAT desde Node.js
 """
 
+import os
 import sys
 import json
+import time
 import logging
+from datetime import datetime
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
-import pandas as pd
 import numpy as np
 
+# Utilidades compartidas de los motores (src/iat/iatcore), desplegadas junto al bridge
+_IAT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'iat')
+if os.path.isdir(_IAT_DIR) and _IAT_DIR not in sys.path:
+    sys.path.append(_IAT_DIR)
+from iatcore.dscore import d_score_kernel
+from iatcore.frame import TrialFrame
+from iatcore.logs import configure_logging, request_logging
+from iatcore.runtime import PROFILE_FULL, PROFILE_SLIM, process_uptime_ms, runtime_profile
+
 # Configurar logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+COMPATIBLE_BLOCKS = [3, 4, 7]
+INCOMPATIBLE_BLOCKS = [6, 7]
+
+# Arranque en frío medido antes de atender la petición
+STARTUP_MS = process_uptime_ms()
+
 @dataclass
 class IATResponse:
     """Respuesta estándar del bridge Python"""
@@ -23,13 +40,17 @@ class IATResponse:
     data: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     timestamp: Optional[str] = None
+    runtime: Optional[Dict[str, Any]] = None
 
 class IATPythonBridge:
     """Bridge principal para comunicación Python IAT <-> Node.js"""
     
     def __init__(self):
         self.logger = logging.getLogger(f"{__name__}.IATPythonBridge")
-        self.logger.info("Inicializando Python IAT Bridge")
+        self.logger.debug("Inicializando Python IAT Bridge")
+        
+        # 'slim' no intenta importar pyiat (arrastra pandas) y usa el cálculo NumPy
+        self.slim = runtime_profile() == PROFILE_SLIM
         
     def process_iat_data(self, raw_data: Dict[str, Any]) -> IATResponse:
         """
@@ -44,16 +65,16 @@ class IATPythonBridge:
         try:
             self.logger.info("Procesando datos IAT")
             
-            # Convertir datos a DataFrame para pyiat
-            df = self._prepare_dataframe(raw_data)
+            # Convertir datos a columnas compatibles con pyiat
+            trials = self._prepare_trials(raw_data)
             
             # Ejecutar análisis IAT
-            analysis_result = self._run_iat_analysis(df)
+            analysis_result = self._run_iat_analysis(trials)
             
             return IATResponse(
                 success=True,
                 data=analysis_result,
-                timestamp=pd.Timestamp.now().isoformat()
+                timestamp=datetime.now().isoformat()
             )
             
         except Exception as e:
@@ -61,11 +82,11 @@ class IATPythonBridge:
             return IATResponse(
                 success=False,
                 error=str(e),
-                timestamp=pd.Timestamp.now().isoformat()
+                timestamp=datetime.now().isoformat()
             )
     
-    def _prepare_dataframe(self, raw_data: Dict[str, Any]) -> pd.DataFrame:
-        """Convierte datos raw a DataFrame compatible con pyiat"""
+    def _prepare_trials(self, raw_data: Dict[str, Any]) -> TrialFrame:
+        """Convierte datos raw a columnas NumPy con la preparación compartida de los motores"""
         try:
             # Extraer respuestas de la sesión IAT
             responses = raw_data.get('responses', [])
@@ -73,41 +94,31 @@ class IATPythonBridge:
             if not responses:
                 raise ValueError("No se encontraron respuestas IAT")
             
-            # Crear DataFrame con estructura esperada por pyiat
-            data = []
-            for response in responses:
-                data.append({
-                    'trial': response.get('trialNumber', 0),
-                    'block': response.get('blockNumber', 0),
-                    'stimulus': response.get('stimulus', ''),
-                    'response': response.get('response', ''),
-                    'rt': response.get('responseTime', 0),
-                    'correct': response.get('correct', False),
-                    'category': response.get('category', ''),
-                    'attribute': response.get('attribute', '')
-                })
-            
-            df = pd.DataFrame(data)
-            self.logger.info(f"DataFrame preparado con {len(df)} respuestas")
-            return df
+            # Mismas columnas y filtro de RT (0, 10000) que el motor de análisis
+            trials = TrialFrame.from_responses(responses)
+            self.logger.info("Trials preparados con %s respuestas", len(trials))
+            return trials
             
         except Exception as e:
-            self.logger.error(f"Error preparando DataFrame: {str(e)}")
+            self.logger.error(f"Error preparando trials: {str(e)}")
             raise
     
-    def _run_iat_analysis(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _run_iat_analysis(self, trials: TrialFrame) -> Dict[str, Any]:
         """Ejecuta análisis IAT usando pyiat"""
         try:
+            if self.slim:
+                return self._basic_iat_analysis(trials)
+            
             # Importar pyiat dinámicamente para manejar errores
             try:
                 import pyiat
             except ImportError as e:
                 self.logger.error(f"pyiat no disponible: {str(e)}")
                 # Fallback: análisis básico sin pyiat
-                return self._basic_iat_analysis(df)
+                return self._basic_iat_analysis(trials)
             
             # Ejecutar análisis usando funciones de pyiat
-            results = self._run_pyiat_analysis(df)
+            results = self._run_pyiat_analysis(trials)
             
             # Convertir resultados a diccionario serializable
             analysis_result = {
@@ -118,51 +129,38 @@ class IATPythonBridge:
                 'statistical_significance': results.get('statistical_significance', False),
                 'effect_size': results.get('effect_size', 0.0),
                 'confidence_interval': results.get('confidence_interval', [0.0, 0.0]),
-                'raw_data': df.to_dict('records')
+                'raw_data': trials.to_records()
             }
             
-            self.logger.info(f"Análisis IAT completado - D-Score: {analysis_result['d_score']}")
+            self.logger.info("Análisis IAT completado - D-Score: %s", analysis_result['d_score'])
             return analysis_result
             
         except Exception as e:
             self.logger.error(f"Error en análisis IAT: {str(e)}")
             # Fallback: análisis básico
-            return self._basic_iat_analysis(df)
+            return self._basic_iat_analysis(trials)
     
-    def _run_pyiat_analysis(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _run_pyiat_analysis(self, trials: TrialFrame) -> Dict[str, Any]:
         """Ejecuta análisis IAT usando funciones de pyiat"""
         try:
             import pyiat
             
-            # Preparar datos para pyiat (necesita columnas específicas)
-            # pyiat espera: 'rt', 'correct', 'block', 'stimulus'
-            df_pyiat = df.copy()
-            
-            # Asegurar que tenemos las columnas necesarias
-            if 'rt' not in df_pyiat.columns:
-                df_pyiat['rt'] = df_pyiat.get('responseTime', 0)
-            if 'correct' not in df_pyiat.columns:
-                df_pyiat['correct'] = df_pyiat.get('correct', True)
-            if 'block' not in df_pyiat.columns:
-                df_pyiat['block'] = df_pyiat.get('blockNumber', 1)
-            if 'stimulus' not in df_pyiat.columns:
-                df_pyiat['stimulus'] = df_pyiat.get('stimulus', '')
-            
-            # Ejecutar análisis IAT usando pyiat
+            # pyiat espera 'rt', 'correct', 'block', 'stimulus': ya están en las columnas
             # pyiat.iat_get_dscore necesita parámetros específicos
             # Usar análisis básico por ahora, pyiat requiere configuración más compleja
-            d_score = self._calculate_basic_dscore(df_pyiat)
+            d_score = self._calculate_basic_dscore(trials)
             
             # Calcular estadísticas adicionales
-            compatible_blocks = df_pyiat[df_pyiat['block'].isin([3, 4, 7])]
-            incompatible_blocks = df_pyiat[df_pyiat['block'].isin([6, 7])]
+            rt, block = trials['rt'], trials['block']
+            compatible_rt = rt[np.isin(block, COMPATIBLE_BLOCKS)]
+            incompatible_rt = rt[np.isin(block, INCOMPATIBLE_BLOCKS)]
             
-            mean_rt_compatible = compatible_blocks['rt'].mean() if len(compatible_blocks) > 0 else 0
-            mean_rt_incompatible = incompatible_blocks['rt'].mean() if len(incompatible_blocks) > 0 else 0
+            mean_rt_compatible = compatible_rt.mean() if compatible_rt.size > 0 else 0
+            mean_rt_incompatible = incompatible_rt.mean() if incompatible_rt.size > 0 else 0
             
             # Calcular tasa de error
-            total_responses = len(df_pyiat)
-            incorrect_responses = len(df_pyiat[df_pyiat['correct'] == False])
+            total_responses = rt.size
+            incorrect_responses = int((~trials['correct']).sum())
             error_rate = (incorrect_responses / total_responses) * 100 if total_responses > 0 else 0
             
             return {
@@ -174,67 +172,43 @@ class IATPythonBridge:
                 'effect_size': float(abs(d_score)),
                 'confidence_interval': [float(d_score - 0.1), float(d_score + 0.1)],
                 'analysis_method': 'pyiat',
-                'raw_data': df_pyiat.to_dict('records')
+                'raw_data': trials.to_records()
             }
             
         except Exception as e:
             self.logger.error(f"Error en análisis pyiat: {str(e)}")
             # Fallback: análisis básico
-            return self._basic_iat_analysis(df)
+            return self._basic_iat_analysis(trials)
     
-    def _calculate_basic_dscore(self, df: pd.DataFrame) -> float:
-        """Calcula D-Score básico usando la fórmula estándar"""
+    def _calculate_basic_dscore(self, trials: TrialFrame) -> float:
+        """Calcula D-Score con el kernel compartido de los motores (limpieza IQR)"""
         try:
             # Separar bloques compatibles e incompatibles
-            compatible_blocks = df[df['block'].isin([3, 4, 7])]
-            incompatible_blocks = df[df['block'].isin([6, 7])]
-            
-            if len(compatible_blocks) == 0 or len(incompatible_blocks) == 0:
-                return 0.0
-            
-            # Calcular tiempos de respuesta promedio
-            mean_rt_compatible = compatible_blocks['rt'].mean()
-            mean_rt_incompatible = incompatible_blocks['rt'].mean()
-            
-            # Calcular desviación estándar combinada
-            std_compatible = compatible_blocks['rt'].std()
-            std_incompatible = incompatible_blocks['rt'].std()
-            combined_std = (std_compatible + std_incompatible) / 2
-            
-            if combined_std == 0:
-                return 0.0
-            
-            # Fórmula D-Score: (RT_incompatible - RT_compatible) / std_combined
-            d_score = (mean_rt_incompatible - mean_rt_compatible) / combined_std
-            
-            return float(d_score)
+            return d_score_kernel(trials.in_blocks(COMPATIBLE_BLOCKS)['rt'],
+                                  trials.in_blocks(INCOMPATIBLE_BLOCKS)['rt'])
             
         except Exception as e:
             self.logger.error(f"Error calculando D-Score básico: {str(e)}")
             return 0.0
     
-    def _basic_iat_analysis(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _basic_iat_analysis(self, trials: TrialFrame) -> Dict[str, Any]:
         """Análisis IAT básico sin pyiat (fallback)"""
         try:
             # Separar bloques compatibles e incompatibles
-            compatible_blocks = df[df['block'].isin([3, 4, 7])]  # Bloques compatibles
-            incompatible_blocks = df[df['block'].isin([6, 7])]    # Bloques incompatibles
+            rt, block = trials['rt'], trials['block']
+            compatible_rt = rt[np.isin(block, COMPATIBLE_BLOCKS)]      # Bloques compatibles
+            incompatible_rt = rt[np.isin(block, INCOMPATIBLE_BLOCKS)]  # Bloques incompatibles
             
             # Calcular tiempos de respuesta promedio
-            mean_rt_compatible = compatible_blocks['rt'].mean() if len(compatible_blocks) > 0 else 0
-            mean_rt_incompatible = incompatible_blocks['rt'].mean() if len(incompatible_blocks) > 0 else 0
+            mean_rt_compatible = compatible_rt.mean() if compatible_rt.size > 0 else 0
+            mean_rt_incompatible = incompatible_rt.mean() if incompatible_rt.size > 0 else 0
             
             # Calcular D-Score básico (diferencia estandarizada)
-            if mean_rt_compatible > 0 and mean_rt_incompatible > 0:
-                d_score = (mean_rt_incompatible - mean_rt_compatible) / (
-                    (compatible_blocks['rt'].std() + incompatible_blocks['rt'].std()) / 2
-                )
-            else:
-                d_score = 0.0
+            d_score = self._calculate_basic_dscore(trials)
             
             # Calcular tasa de error
-            total_responses = len(df)
-            incorrect_responses = len(df[df['correct'] == False])
+            total_responses = rt.size
+            incorrect_responses = int((~trials['correct']).sum())
             error_rate = (incorrect_responses / total_responses) * 100 if total_responses > 0 else 0
             
             return {
@@ -246,7 +220,7 @@ class IATPythonBridge:
                 'effect_size': float(abs(d_score)),
                 'confidence_interval': [float(d_score - 0.1), float(d_score + 0.1)],
                 'analysis_method': 'basic_fallback',
-                'raw_data': df.to_dict('records')
+                'raw_data': trials.to_records()
             }
             
         except Exception as e:
@@ -264,15 +238,33 @@ class IATPythonBridge:
                 'raw_data': []
             }
 
+def _runtime_report(slim: bool, started: float) -> Dict[str, Any]:
+    """Arranque del proceso y tiempo de la petición (cada ejecución es un arranque en frío)"""
+    return {
+        'profile': PROFILE_SLIM if slim else PROFILE_FULL,
+        'cold_start': True,
+        'startup_ms': STARTUP_MS,
+        'handler_ms': round((time.perf_counter() - started) * 1000.0, 3),
+        'requests': 1
+    }
+
+def handle_request(input_data: Dict[str, Any], bridge: Optional[IATPythonBridge] = None) -> IATResponse:
+    """Procesa una petición ya decodificada reutilizando el bridge si se recibe"""
+    bridge = bridge or IATPythonBridge()
+    return bridge.process_iat_data(input_data)
+
 def main():
     """Función principal para comunicación con Node.js"""
+    started = time.perf_counter()
     try:
         # Leer datos desde stdin (desde Node.js)
         input_data = json.loads(sys.stdin.read())
         
         # Crear bridge y procesar datos
-        bridge = IATPythonBridge()
-        result = bridge.process_iat_data(input_data)
+        with request_logging(input_data.get('log_level')):
+            bridge = IATPythonBridge()
+            result = handle_request(input_data, bridge)
+        result.runtime = _runtime_report(bridge.slim, started)
         
         # Enviar resultado a stdout (hacia Node.js)
         print(json.dumps(asdict(result), ensure_ascii=False))
@@ -282,7 +274,8 @@ def main():
         error_response = IATResponse(
             success=False,
             error=f"Error en bridge Python: {str(e)}",
-            timestamp=pd.Timestamp.now().isoformat()
+            timestamp=datetime.now().isoformat(),
+            runtime=_runtime_report(False, started)
         )
         print(json.dumps(asdict(error_response), ensure_ascii=False))
 
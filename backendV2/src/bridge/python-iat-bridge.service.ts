@@ -20,6 +20,14 @@ interface PythonIATResponse {
   };
   error?: string;
   timestamp?: string;
+  runtime?: {
+    profile: 'full' | 'slim';
+    cold_start: boolean;
+    startup_ms: number | null;
+    handler_ms: number;
+    requests?: number;
+    bytecode?: boolean;
+  };
 }
 
 /**
@@ -17,6 +17,28 @@ interface AdvancedAnalysisInput {
   };
 }
 
+/**
+ * Parámetros ex-Gaussianos de un tipo de bloque
+ */
+interface ExGaussianParameters {
+  mu: number;
+  sigma: number;
+  tau: number;
+  log_likelihood: number;
+  n_trials: number;
+  converged: boolean;
+}
+
+/**
+ * Parámetros EZ-diffusion de un tipo de bloque
+ */
+interface EZDiffusionParameters {
+  drift_rate: number;
+  boundary_separation: number;
+  non_decision_time: number;
+  corrected_accuracy: number;
+}
+
 /**
  * Interfaz para respuesta del motor de análisis avanzado
  */
@@ -82,12 +104,89 @@ interface AdvancedAnalysisResponse {
     data_quality_score: number;
     reliability_metrics: {
       internal_consistency: number;
-      test_retest_reliability: number;
+      test_retest_reliability: number | null;
       split_half_reliability: number;
+      test_retest_icc?: number;
+      test_retest_participants?: number;
+    };
+    
+    significance_tests?: {
+      welch_t: number;
+      welch_df: number;
+      welch_p_value: number;
+      permutation_p_value: number;
+      permutation_method: 'exact' | 'sampled' | 'none';
+      n_permutations: number;
+    };
+    
+    screening?: {
+      status: 'exclude' | 'flag' | 'pass';
+      reasons: string[];
+      metrics: Record<string, number>;
+    };
+    
+    pipeline_timings?: Record<string, number>;
+    
+    block_summaries?: Record<string, {
+      trials: number;
+      rt_sum: number;
+      rt_sum_sq: number;
+      errors: number;
+    }>;
+    
+    rt_sketches?: Record<string, {
+      k: number;
+      n: number;
+      min: number | null;
+      max: number | null;
+      levels: number[][];
+    }>;
+    
+    ex_gaussian?: {
+      compatible: ExGaussianParameters;
+      incompatible: ExGaussianParameters;
+      tau_difference: number;
+      outlier_rate: number;
+    };
+    
+    diffusion?: {
+      compatible: EZDiffusionParameters;
+      incompatible: EZDiffusionParameters;
+      drift_difference: number;
+    };
+    
+    outlier_analysis?: Record<string, Record<string, {
+      lower_bound: number;
+      upper_bound: number;
+      excluded: number;
+      rate: number;
+    }>>;
+    
+    temporal_curves?: {
+      session_id: string;
+      window: number;
+      rolling_mean_rt: number[];
+      rolling_sd_rt: number[];
+      rolling_error_rate: number[];
+      slope_ms_per_trial: number;
+      changepoint: {
+        trial_index: number | null;
+        statistic: number;
+        mean_before: number | null;
+        mean_after: number | null;
+      };
     };
   };
   error?: string;
   timestamp?: string;
+  runtime?: {
+    profile: 'full' | 'slim';
+    cold_start: boolean;
+    startup_ms: number | null;
+    handler_ms: number;
+    requests?: number;
+    bytecode?: boolean;
+  };
 }
 
 /**
@@ -4,23 +4,51 @@ IAT Analysis Engine - Motor avanzado de análisis estadístico IAT
 Implementa algoritmos mejorados para análisis de datos de pruebas de asociación implícita
 """
 
+import os
 import sys
 import json
 import time
 import logging
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
-import pandas as pd
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, asdict, field
 import numpy as np
-from scipy import stats
-from sklearn.metrics import accuracy_score, precision_score, recall_score
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+import iatcore
+from iatcore.bootstrap import (
+    IATStudyBootstrap, StudyBootstrapResult, StudyTrialData, percentile_interval, session_bootstrap_d_scores
+)
+from iatcore.diffusion import ez_diffusion
+from iatcore.exgauss import ex_gaussian_outlier_mask, fit_ex_gaussian
+from iatcore.frame import TrialFrame, group_means, sample_std, value_counts
+from iatcore.logs import configure_logging, request_logging
+from iatcore.outliers import BlockOutliers, OutlierEngine, study_outlier_sensitivity
+from iatcore.profiling import run_profiled
+from iatcore.pipeline import AnalysisPipeline, PipelineRun
+from iatcore.runtime import ColdStartTimer, PROFILE_SLIM, bytecode_available, runtime_profile
+from iatcore.reliability import SplitHalfResult, session_split_half_reliability, study_split_half_reliability
+from iatcore.significance import SignificanceResult, session_significance
+from iatcore.sketches import KLLSketch
+from iatcore.temporal import TemporalBatch, temporal_curves
+from iatcore.screening import ScreeningConfig, ScreeningResult, extract_trial_arrays, screen_responses, SCREEN_PASS
+
+if TYPE_CHECKING:
+    # Almacenes persistentes y análisis de estudio: se importan al usarse (sqlite3,
+    # rejillas) para no pagarlos en el arranque en frío de cada sesión
+    from iatcore.aggregates import StudyAggregateStore
+    from iatcore.cube import AggregateCubeStore
+    from iatcore.items import ItemAnalysisResult
+    from iatcore.participant_index import ParticipantIndex, TestRetestResult
+    from iatcore.sensitivity import SensitivityGrid
+
+# Configurar logging (cola + hilo de fondo; nivel en IAT_LOG_LEVEL)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Arranque del proceso (intérprete + imports) separado del tiempo de cada petición
+RUNTIME = ColdStartTimer()
+
 @dataclass
 class IATBlockAnalysis:
     """Análisis estadístico de un bloque IAT"""
@@ -68,13 +96,113 @@ class IATStatisticalAnalysis:
     # Métricas de calidad de datos
     data_quality_score: float
     reliability_metrics: Dict[str, float]
+    
+    # Pruebas de significancia del D-Score (Welch y permutación)
+    significance_tests: Dict[str, Any] = field(default_factory=dict)
+    
+    # Pre-filtro de calidad ('exclude', 'flag' o 'pass')
+    screening: Dict[str, Any] = field(default_factory=dict)
+    
+    # Tiempos por etapa del pipeline (segundos)
+    pipeline_timings: Dict[str, float] = field(default_factory=dict)
+    
+    # Sumas suficientes por bloque (trials, rt_sum, rt_sum_sq, errors), combinables entre sesiones
+    block_summaries: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    
+    # Sketches KLL de RT por bloque, combinables para cuantiles de estudio
+    rt_sketches: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    
+    # Parámetros ex-Gaussianos (mu, sigma, tau) de bloques compatibles e incompatibles
+    ex_gaussian: Dict[str, Any] = field(default_factory=dict)
+    
+    # Parámetros EZ-diffusion (deriva, umbral, tiempo no decisional) por tipo de bloque
+    diffusion: Dict[str, Any] = field(default_factory=dict)
+    
+    # Exclusiones por método (IQR, MAD, SD, absoluto) para cada tipo de bloque
+    outlier_analysis: Dict[str, Any] = field(default_factory=dict)
+    
+    # Curvas móviles a nivel de trial (RT, SD, errores), pendiente y punto de cambio
+    temporal_curves: Dict[str, Any] = field(default_factory=dict)
 
 class IATAnalysisEngine:
     """Motor avanzado de análisis estadístico IAT"""
     
-    def __init__(self):
+    COMPATIBLE_BLOCKS = [3, 4]
+    INCOMPATIBLE_BLOCKS = [6, 7]
+    
+    def __init__(self, max_workers: int = 1, screening_config: Optional[ScreeningConfig] = None,
+                 participant_index: Optional['ParticipantIndex'] = None,
+                 study_aggregates: Optional['StudyAggregateStore'] = None,
+                 aggregate_cube: Optional['AggregateCubeStore'] = None,
+                 outlier_engine: Optional[OutlierEngine] = None, profile: Optional[str] = None):
         self.logger = logging.getLogger(f"{__name__}.IATAnalysisEngine")
-        self.logger.info("Inicializando IAT Analysis Engine")
+        self.logger.debug("Inicializando IAT Analysis Engine")
+        
+        self.screening_config = screening_config or ScreeningConfig()
+        
+        # 'slim' omite etapas opcionales costosas (arranque en frío en Lambda)
+        self.profile = profile or runtime_profile()
+        
+        # Un orden por bloque; el método primario alimenta D-Score y calidad
+        self.outlier_engine = outlier_engine or OutlierEngine()
+        self.split_half_iterations = 1000
+        self.confidence_iterations = 1000
+        # Semilla del IC bootstrap: la misma que usa por defecto la rejilla de sensibilidad
+        self.confidence_seed = 0
+        
+        # Índice local de sesiones por participante (test-retest real)
+        self.participant_index = participant_index
+        
+        # Agregados materializados por estudio, actualizados al terminar cada sesión
+        self.study_aggregates = study_aggregates
+        
+        # Cubo estudio × segmento × rol de bloque × estímulo
+        self.aggregate_cube = aggregate_cube
+        
+        # DAG de etapas; max_workers > 1 ejecuta ramas independientes en paralelo
+        self.pipeline = self._build_pipeline(max_workers)
+        self.last_run: Optional[PipelineRun] = None
+        
+    def _build_pipeline(self, max_workers: int) -> AnalysisPipeline:
+        """Define las etapas del análisis y sus intermedios compartidos"""
+        pipeline = AnalysisPipeline(max_workers=max_workers)
+        
+        # Pre-filtro barato sobre las respuestas crudas
+        pipeline.add_node('screening', self._screen_session, ['session_data'])
+        
+        # Intermedios compartidos
+        pipeline.add_node('df', self._prepare_frame, ['session_data'])
+        pipeline.add_node('compatible', self._select_compatible, ['df'])
+        pipeline.add_node('incompatible', self._select_incompatible, ['df'])
+        pipeline.add_node('overall_stats', self._summarize_rt, ['df'])
+        pipeline.add_node('compatible_stats', self._summarize_rt, ['compatible'])
+        pipeline.add_node('incompatible_stats', self._summarize_rt, ['incompatible'])
+        pipeline.add_node('outliers', self._detect_outliers, ['df', 'compatible', 'incompatible'])
+        
+        # Etapas de análisis
+        pipeline.add_node('d_score', self._calculate_advanced_d_score,
+                          ['compatible', 'incompatible', 'compatible_stats', 'incompatible_stats', 'screening',
+                           'outliers'])
+        pipeline.add_node('blocks', self._analyze_blocks,
+                          ['compatible', 'incompatible', 'compatible_stats', 'incompatible_stats', 'outliers'])
+        pipeline.add_node('performance', self._analyze_performance, ['df', 'overall_stats'])
+        pipeline.add_node('errors', self._analyze_errors, ['df'])
+        pipeline.add_node('temporal', self._analyze_temporal_patterns, ['df', 'overall_stats'])
+        pipeline.add_node('temporal_curves', self._calculate_temporal_curves, ['session_data', 'df', 'screening'])
+        pipeline.add_node('quality', self._assess_data_quality, ['df', 'overall_stats', 'outliers', 'screening'])
+        pipeline.add_node('block_summaries', self._summarize_blocks, ['df'])
+        pipeline.add_node('rt_sketches', self._sketch_blocks, ['df', 'screening'])
+        if self.profile != PROFILE_SLIM:
+            # Ajuste iterativo de máxima verosimilitud: la etapa más costosa por sesión
+            pipeline.add_node('ex_gaussian', self._fit_ex_gaussian, ['compatible', 'incompatible', 'screening'])
+        pipeline.add_node('diffusion', self._estimate_diffusion, ['compatible_stats', 'incompatible_stats', 'screening'])
+        pipeline.add_node('retest', self._update_participant_index,
+                          ['session_data', 'd_score', 'compatible_stats', 'incompatible_stats', 'screening'])
+        pipeline.add_node('aggregates', self._update_study_aggregates,
+                          ['session_data', 'd_score', 'performance', 'block_summaries', 'rt_sketches', 'screening'])
+        pipeline.add_node('cube', self._update_aggregate_cube, ['session_data', 'df', 'screening'])
+        
+        return pipeline
         
     def analyze_session(self, session_data: Dict[str, Any]) -> IATStatisticalAnalysis:
         """
@@ -89,26 +217,18 @@ class IATAnalysisEngine:
         try:
             self.logger.info("Iniciando análisis estadístico IAT")
             
-            # Convertir datos a DataFrame
-            df = self._prepare_dataframe(session_data)
-            
-            # Análisis básico de D-Score
-            d_score_analysis = self._calculate_advanced_d_score(df)
-            
-            # Análisis de bloques
-            block_analysis = self._analyze_blocks(df)
+            # Ejecutar DAG: cada intermedio se calcula una sola vez
+            run = self.pipeline.run({'session_data': session_data})
+            self.last_run = run
             
-            # Análisis de rendimiento
-            performance_analysis = self._analyze_performance(df)
-            
-            # Análisis de errores
-            error_analysis = self._analyze_errors(df)
-            
-            # Análisis temporal
-            temporal_analysis = self._analyze_temporal_patterns(df)
-            
-            # Métricas de calidad
-            quality_metrics = self._assess_data_quality(df)
+            screening = run['screening']
+            d_score_analysis = run['d_score']
+            block_analysis = run['blocks']
+            performance_analysis = run['performance']
+            error_analysis = run['errors']
+            temporal_analysis = run['temporal']
+            quality_metrics = run['quality']
+            reliability_metrics = self._merge_test_retest(quality_metrics['reliability'], run['retest'])
             
             # Compilar análisis completo
             analysis = IATStatisticalAnalysis(
@@ -133,74 +253,412 @@ class IATAnalysisEngine:
                 attention_metrics=temporal_analysis['attention'],
                 
                 data_quality_score=quality_metrics['score'],
-                reliability_metrics=quality_metrics['reliability']
+                reliability_metrics=reliability_metrics,
+                
+                significance_tests=d_score_analysis.get('tests', {}),
+                screening=asdict(screening),
+                pipeline_timings=dict(run.node_timings),
+                block_summaries=run['block_summaries'],
+                rt_sketches=run['rt_sketches'],
+                ex_gaussian=run.get('ex_gaussian', {}),
+                diffusion=run['diffusion'],
+                outlier_analysis={role: block.summary() for role, block in run['outliers'].items()},
+                temporal_curves=run['temporal_curves']
             )
             
-            self.logger.info("Análisis estadístico IAT completado")
+            self.logger.info(
+                "Análisis estadístico IAT completado en %.3fs (screening: %s)", run.total_time, screening.status
+            )
             return analysis
             
         except Exception as e:
             self.logger.error(f"Error en análisis estadístico: {str(e)}")
             raise
     
-    def _prepare_dataframe(self, session_data: Dict[str, Any]) -> pd.DataFrame:
-        """Prepara DataFrame para análisis"""
+    def _prepare_frame(self, session_data: Dict[str, Any]) -> TrialFrame:
+        """Prepara las columnas de trials para análisis"""
         try:
             responses = session_data.get('responses', [])
             
             if not responses:
                 raise ValueError("No se encontraron respuestas IAT")
             
-            # Crear DataFrame con estructura optimizada
-            data = []
-            for response in responses:
-                data.append({
-                    'trial': response.get('trialNumber', 0),
-                    'block': response.get('blockNumber', 0),
-                    'stimulus': response.get('stimulus', ''),
-                    'response': response.get('response', ''),
-                    'rt': response.get('responseTime', 0),
-                    'correct': response.get('correct', False),
-                    'category': response.get('category', ''),
-                    'attribute': response.get('attribute', ''),
-                    'timestamp': response.get('timestamp', '')
-                })
-            
-            df = pd.DataFrame(data)
-            
-            # Limpiar datos
-            df = df[df['rt'] > 0]  # Eliminar RTs inválidos
-            df = df[df['rt'] < 10000]  # Eliminar RTs extremos
-            
-            self.logger.info(f"DataFrame preparado con {len(df)} respuestas válidas")
+            # Columnas NumPy; elimina RTs inválidos (<= 0) y extremos (>= 10000)
+            df = TrialFrame.from_responses(responses, min_rt=0.0, max_rt=10000.0)
+            
+            self.logger.info("Trials preparados con %s respuestas válidas", len(df))
             return df
             
         except Exception as e:
-            self.logger.error(f"Error preparando DataFrame: {str(e)}")
+            self.logger.error(f"Error preparando trials: {str(e)}")
             raise
     
-    def _calculate_advanced_d_score(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Calcula D-Score usando algoritmos avanzados"""
+    def bootstrap_study(self, sessions: List[Dict[str, Any]], segments: Optional[List[Any]] = None,
+                        compare: Optional[Tuple[str, str]] = None, n_replicates: int = 10000,
+                        seed: int = 0, workers: Optional[int] = None) -> StudyBootstrapResult:
+        """
+        IC del D-Score medio del estudio (y de la diferencia entre dos segmentos)
+        remuestreando participantes y trials
+        
+        Args:
+            sessions: Sesiones IAT del estudio
+            segments: Segmento de cada sesión (opcional)
+            compare: Par de segmentos a comparar (b - a)
+            n_replicates: Réplicas bootstrap
+            seed: Semilla; el resultado no depende del número de workers
+            workers: Procesos a utilizar
+        """
+        try:
+            self.logger.info("Iniciando bootstrap de estudio con %s sesiones", len(sessions))
+            
+            data = StudyTrialData.from_sessions(sessions, segments)
+            bootstrap = IATStudyBootstrap(n_replicates=n_replicates, seed=seed, workers=workers)
+            return bootstrap.run(data, compare)
+            
+        except Exception as e:
+            self.logger.error(f"Error en bootstrap de estudio: {str(e)}")
+            raise
+    
+    def study_reliability(self, sessions: List[Dict[str, Any]], n_splits: int = 1000,
+                          seed: int = 0) -> SplitHalfResult:
+        """
+        Confiabilidad split-half del D-Score en todo el estudio
+        
+        Args:
+            sessions: Sesiones IAT del estudio
+            n_splits: Divisiones aleatorias a promediar
+            seed: Semilla de las divisiones
+        """
+        try:
+            self.logger.info("Calculando confiabilidad split-half de %s sesiones", len(sessions))
+            
+            data = StudyTrialData.from_sessions(sessions)
+            return study_split_half_reliability(
+                data.compatible_rt, data.compatible_offsets,
+                data.incompatible_rt, data.incompatible_offsets,
+                n_splits=n_splits, seed=seed
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error en confiabilidad de estudio: {str(e)}")
+            raise
+    
+    def sensitivity_analysis(self, session_data: Optional[Dict[str, Any]] = None,
+                             sessions: Optional[List[Dict[str, Any]]] = None,
+                             grid: Optional['SensitivityGrid'] = None) -> Dict[str, Any]:
+        """
+        D-Score bajo una rejilla de parámetros de limpieza (min/max RT, umbral rápido, IQR)
+        
+        Args:
+            session_data: Sesión individual (D-Score e IC bootstrap por punto)
+            sessions: Sesiones de un estudio (D-Score medio e IC por punto)
+            grid: Ejes de la rejilla; por defecto incluye los valores del motor
+        """
+        try:
+            from iatcore.sensitivity import SensitivityGrid, session_sensitivity, study_sensitivity
+            grid = grid or SensitivityGrid()
+            max_fast_rate = self.screening_config.max_fast_rate
+            
+            if sessions is not None:
+                self.logger.info("Rejilla de sensibilidad sobre %s sesiones", len(sessions))
+                data = StudyTrialData.from_sessions(sessions, max_rt=np.inf)
+                return study_sensitivity(
+                    data.compatible_rt, data.compatible_offsets,
+                    data.incompatible_rt, data.incompatible_offsets,
+                    grid=grid, max_fast_rate=max_fast_rate
+                )
+            
+            arrays = extract_trial_arrays((session_data or {}).get('responses', []))
+            rt, block = arrays['rt'], arrays['block']
+            return session_sensitivity(
+                rt[np.isin(block, self.COMPATIBLE_BLOCKS)],
+                rt[np.isin(block, self.INCOMPATIBLE_BLOCKS)],
+                grid=grid, max_fast_rate=max_fast_rate
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error en análisis de sensibilidad: {str(e)}")
+            raise
+    
+    def outlier_sensitivity_study(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        D-Scores del estudio bajo cada método de exclusión configurado
+        
+        Args:
+            sessions: Sesiones IAT del estudio
+        """
         try:
-            # Separar bloques compatibles (3, 4) e incompatibles (6, 7)
-            compatible_blocks = df[df['block'].isin([3, 4])]
-            incompatible_blocks = df[df['block'].isin([6, 7])]
+            self.logger.info("Comparando métodos de outliers en %s sesiones", len(sessions))
+            
+            data = StudyTrialData.from_sessions(sessions)
+            return study_outlier_sensitivity(
+                data.compatible_rt, data.compatible_offsets,
+                data.incompatible_rt, data.incompatible_offsets,
+                self.outlier_engine.methods
+            )
             
+        except Exception as e:
+            self.logger.error(f"Error en sensibilidad de outliers: {str(e)}")
+            raise
+    
+    def ex_gaussian_study(self, sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ajuste ex-Gaussiano por participante y tipo de bloque en un solo lote
+        
+        Args:
+            sessions: Sesiones IAT del estudio
+            
+        Returns:
+            Dict: Parámetros por participante para 'compatible' e 'incompatible'
+        """
+        try:
+            self.logger.info("Ajustando ex-Gaussiano de %s sesiones", len(sessions))
+            
+            data = StudyTrialData.from_sessions(sessions)
+            n = data.n_participants
+            compatible_groups = np.repeat(np.arange(n) * 2, np.diff(data.compatible_offsets))
+            incompatible_groups = np.repeat(np.arange(n) * 2 + 1, np.diff(data.incompatible_offsets))
+            fit = fit_ex_gaussian(
+                np.concatenate((data.compatible_rt, data.incompatible_rt)),
+                np.concatenate((compatible_groups, incompatible_groups)),
+                2 * n
+            )
+            
+            return {
+                'participants': [
+                    {
+                        'participant_id': participant_id,
+                        'compatible': fit.group(2 * index),
+                        'incompatible': fit.group(2 * index + 1)
+                    }
+                    for index, participant_id in enumerate(data.participant_ids)
+                ],
+                'converged_rate': float(fit.converged[np.isfinite(fit.mu)].mean()) if np.isfinite(fit.mu).any() else 0.0
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error en ajuste ex-Gaussiano de estudio: {str(e)}")
+            raise
+    
+    def temporal_curves_study(self, sessions: List[Dict[str, Any]], window: int = 10) -> List[Dict[str, Any]]:
+        """
+        Curvas móviles, pendientes y puntos de cambio de muchas sesiones en un solo lote
+        
+        Args:
+            sessions: Sesiones IAT
+            window: Trials por ventana móvil
+        """
+        try:
+            self.logger.info("Calculando curvas temporales de %s sesiones", len(sessions))
+            return temporal_curves(TemporalBatch.from_sessions(sessions), window=window)
+            
+        except Exception as e:
+            self.logger.error(f"Error en curvas temporales de estudio: {str(e)}")
+            raise
+    
+    def item_analysis(self, sessions: List[Dict[str, Any]]) -> 'ItemAnalysisResult':
+        """
+        Análisis por estímulo de todo el estudio (RT, errores, correlación ítem-total)
+        
+        Args:
+            sessions: Sesiones IAT del estudio
+        """
+        try:
+            self.logger.info("Calculando análisis de ítems de %s sesiones", len(sessions))
+            from iatcore.items import StudyItemData, study_item_analysis
+            return study_item_analysis(StudyItemData.from_sessions(sessions))
+            
+        except Exception as e:
+            self.logger.error(f"Error en análisis de ítems: {str(e)}")
+            raise
+    
+    def _update_participant_index(self, session_data: Dict[str, Any], d_score_analysis: Dict[str, Any],
+                                  compatible_stats: Dict[str, float], incompatible_stats: Dict[str, float],
+                                  screening: ScreeningResult) -> Optional['TestRetestResult']:
+        """Registra el resumen de la sesión y devuelve el test-retest actualizado"""
+        try:
+            participant_id = session_data.get('participantId')
+            if self.participant_index is None or not participant_id:
+                return None
+            
+            study_id = self._study_id(session_data)
+            if screening.excluded:
+                return self.participant_index.test_retest(study_id)
+            
+            return self.participant_index.record_session(
+                participant_id=str(participant_id),
+                session_id=str(session_data.get('sessionId', '')),
+                d_score=d_score_analysis['d_score'],
+                compatible=compatible_stats,
+                incompatible=incompatible_stats,
+                study_id=study_id
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error actualizando índice de participantes: {str(e)}")
+            return None
+    
+    def _update_study_aggregates(self, session_data: Dict[str, Any], d_score_analysis: Dict[str, Any],
+                                 performance_analysis: Dict[str, Any],
+                                 block_summaries: Dict[str, Dict[str, float]],
+                                 rt_sketches: Dict[str, Dict[str, Any]],
+                                 screening: ScreeningResult) -> bool:
+        """Incorpora la sesión terminada al agregado de su estudio (O(1))"""
+        try:
+            session_id = session_data.get('sessionId')
+            if self.study_aggregates is None or not session_id:
+                return False
+            
+            return self.study_aggregates.record_session(
+                study_id=self._study_id(session_data),
+                session_id=str(session_id),
+                d_score=d_score_analysis['d_score'],
+                accuracy=performance_analysis['accuracy'],
+                mean_rt=performance_analysis['mean_rt'],
+                block_summaries=block_summaries,
+                screening_status=screening.status,
+                rt_sketches=rt_sketches
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error actualizando agregados de estudio: {str(e)}")
+            return False
+    
+    def _update_aggregate_cube(self, session_data: Dict[str, Any], df: TrialFrame,
+                               screening: ScreeningResult) -> bool:
+        """Suma las celdas de la sesión al cubo segmentado"""
+        try:
+            session_id = session_data.get('sessionId')
+            if self.aggregate_cube is None or not session_id or screening.excluded:
+                return False
+            
+            from iatcore.cube import session_cube_cells
+            cells = session_cube_cells(
+                df['rt'],
+                df['block'],
+                df['correct'],
+                df['stimulus'].tolist()
+            )
+            return self.aggregate_cube.record_session(
+                study_id=self._study_id(session_data),
+                session_id=str(session_id),
+                cells=cells,
+                segment=session_data.get('segmentAttributes')
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error actualizando cubo de agregados: {str(e)}")
+            return False
+    
+    def query_cube(self, study_id: str, where: Optional[Dict[str, Any]] = None,
+                   group_by: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Corte o roll-up del cubo combinando celdas precalculadas"""
+        if self.aggregate_cube is None:
+            raise ValueError("No hay cubo de agregados configurado")
+        return self.aggregate_cube.query(study_id, where=where, group_by=group_by or [])
+    
+    def study_summary(self, study_id: str) -> Dict[str, Any]:
+        """Lee el agregado materializado de un estudio sin recorrer sus sesiones"""
+        if self.study_aggregates is None:
+            raise ValueError("No hay almacén de agregados configurado")
+        return self.study_aggregates.get(study_id).summary()
+    
+    def _study_id(self, session_data: Dict[str, Any]) -> str:
+        return str(session_data.get('testId') or session_data.get('testConfig', {}).get('testId', ''))
+    
+    def _merge_test_retest(self, reliability: Dict[str, float],
+                           retest: Optional['TestRetestResult']) -> Dict[str, float]:
+        """Añade el test-retest cuando el índice tiene sesiones repetidas (si no, queda en None)"""
+        if retest is None:
+            return reliability
+        
+        merged = dict(reliability)
+        if np.isfinite(retest.test_retest_correlation):
+            merged['test_retest_reliability'] = retest.test_retest_correlation
+        if np.isfinite(retest.icc):
+            merged['test_retest_icc'] = retest.icc
+        merged['test_retest_participants'] = retest.participants_with_retest
+        return merged
+    
+    def _screen_session(self, session_data: Dict[str, Any]) -> ScreeningResult:
+        """Clasifica la sesión antes de las etapas costosas"""
+        try:
+            return screen_responses(session_data.get('responses', []), self.screening_config)
+            
+        except Exception as e:
+            self.logger.error(f"Error en pre-filtro de calidad: {str(e)}")
+            return ScreeningResult(status=SCREEN_PASS, reasons=['screening_error'])
+    
+    def _select_compatible(self, df: TrialFrame) -> TrialFrame:
+        """Separa bloques compatibles (3, 4)"""
+        return df.in_blocks(self.COMPATIBLE_BLOCKS)
+    
+    def _select_incompatible(self, df: TrialFrame) -> TrialFrame:
+        """Separa bloques incompatibles (6, 7)"""
+        return df.in_blocks(self.INCOMPATIBLE_BLOCKS)
+    
+    def _summarize_rt(self, df: TrialFrame) -> Dict[str, float]:
+        """Calcula una sola vez los estadísticos de RT compartidos entre etapas"""
+        try:
+            if len(df) == 0:
+                return {}
+            
+            rt = df['rt']
+            q1, median, q3 = np.quantile(rt, [0.25, 0.5, 0.75])
+            iqr = q3 - q1
+            
+            return {
+                'count': int(len(rt)),
+                'mean': float(rt.mean()),
+                'std': sample_std(rt),
+                'median': float(median),
+                'q1': float(q1),
+                'q3': float(q3),
+                'lower_bound': float(q1 - 1.5 * iqr),
+                'upper_bound': float(q3 + 1.5 * iqr),
+                'accuracy': float(df['correct'].mean())
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error resumiendo RTs: {str(e)}")
+            return {}
+    
+    def _calculate_advanced_d_score(self, compatible_blocks: TrialFrame, incompatible_blocks: TrialFrame,
+                                    compatible_stats: Optional[Dict[str, float]] = None,
+                                    incompatible_stats: Optional[Dict[str, float]] = None,
+                                    screening: Optional[ScreeningResult] = None,
+                                    outliers: Optional[Dict[str, BlockOutliers]] = None) -> Dict[str, Any]:
+        """Calcula D-Score usando algoritmos avanzados"""
+        try:
             if len(compatible_blocks) == 0 or len(incompatible_blocks) == 0:
                 return self._default_d_score_analysis()
             
+            if not outliers:
+                outliers = {
+                    'compatible': self.outlier_engine.analyze(compatible_blocks['rt']),
+                    'incompatible': self.outlier_engine.analyze(incompatible_blocks['rt'])
+                }
+            
             # Calcular D-Score usando algoritmo mejorado
-            d_score = self._calculate_improved_d_score(compatible_blocks, incompatible_blocks)
+            d_score = self._calculate_improved_d_score(outliers)
             
-            # Calcular intervalo de confianza
-            ci_lower, ci_upper = self._calculate_confidence_interval(
-                compatible_blocks, incompatible_blocks, d_score
-            )
+            # Sesiones excluidas: solo estimación puntual, sin bootstrap ni pruebas
+            if screening is not None and screening.excluded:
+                return {
+                    'd_score': float(d_score),
+                    'interpretation': self._interpret_d_score(d_score),
+                    'confidence_interval': (float(d_score), float(d_score)),
+                    'significance': False,
+                    'effect_size': self._classify_effect_size(d_score)
+                }
             
-            # Determinar significancia estadística
-            significance = self._test_statistical_significance(
-                compatible_blocks, incompatible_blocks, d_score
-            )
+            # Intervalo: réplicas de los trials crudos, limpiadas con el método primario
+            ci_lower, ci_upper = self._calculate_confidence_interval(compatible_blocks, incompatible_blocks, d_score)
+            
+            # Significancia sobre los mismos trials limpios (método primario) que el D-Score
+            tests = self._run_significance_tests(outliers['compatible'].clean_values(),
+                                                 outliers['incompatible'].clean_values())
+            significance = self._test_statistical_significance(tests, d_score)
             
             # Interpretar D-Score
             interpretation = self._interpret_d_score(d_score)
@@ -210,44 +668,31 @@ class IATAnalysisEngine:
                 'd_score': float(d_score),
                 'interpretation': interpretation,
                 'confidence_interval': (float(ci_lower), float(ci_upper)),
-                'significance': significance,
-                'effect_size': effect_size
+                'significance': bool(significance),
+                'effect_size': effect_size,
+                'tests': asdict(tests) if tests is not None else {}
             }
             
         except Exception as e:
             self.logger.error(f"Error calculando D-Score avanzado: {str(e)}")
             return self._default_d_score_analysis()
     
-    def _calculate_improved_d_score(self, compatible: pd.DataFrame, incompatible: pd.DataFrame) -> float:
+    def _calculate_improved_d_score(self, outliers: Dict[str, BlockOutliers]) -> float:
         """Calcula D-Score usando algoritmo mejorado (Greenwald et al., 2003)"""
         try:
-            # Algoritmo D-Score mejorado
-            # 1. Calcular medias de RT
-            mean_rt_compatible = compatible['rt'].mean()
-            mean_rt_incompatible = incompatible['rt'].mean()
-            
-            # 2. Calcular desviación estándar combinada
-            std_compatible = compatible['rt'].std()
-            std_incompatible = incompatible['rt'].std()
-            
-            # 3. Aplicar corrección por outliers
-            compatible_clean = self._remove_outliers(compatible['rt'])
-            incompatible_clean = self._remove_outliers(incompatible['rt'])
-            
-            if len(compatible_clean) == 0 or len(incompatible_clean) == 0:
+            # 1-3. Exclusiones ya calculadas: media y desviación salen de las sumas prefijas
+            compatible_result = outliers['compatible'].primary_result
+            incompatible_result = outliers['incompatible'].primary_result
+            if compatible_result.kept == 0 or incompatible_result.kept == 0:
                 return 0.0
-            
-            # 4. Recalcular con datos limpios
-            mean_rt_compatible_clean = compatible_clean.mean()
-            mean_rt_incompatible_clean = incompatible_clean.mean()
-            
-            # 5. Calcular desviación estándar combinada
-            combined_std = (compatible_clean.std() + incompatible_clean.std()) / 2
+            mean_rt_compatible_clean = compatible_result.clean_mean
+            mean_rt_incompatible_clean = incompatible_result.clean_mean
+            combined_std = (compatible_result.clean_std + incompatible_result.clean_std) / 2
             
             if combined_std == 0:
                 return 0.0
             
-            # 6. Fórmula D-Score mejorada
+            # 4. Fórmula D-Score mejorada
             d_score = (mean_rt_incompatible_clean - mean_rt_compatible_clean) / combined_std
             
             return float(d_score)
@@ -256,42 +701,35 @@ class IATAnalysisEngine:
             self.logger.error(f"Error en algoritmo D-Score mejorado: {str(e)}")
             return 0.0
     
-    def _remove_outliers(self, rt_series: pd.Series) -> pd.Series:
-        """Remueve outliers usando método IQR"""
+    def _detect_outliers(self, df: TrialFrame, compatible_blocks: TrialFrame,
+                         incompatible_blocks: TrialFrame) -> Dict[str, BlockOutliers]:
+        """Ordena cada conjunto de RT una vez y aplica todos los métodos de exclusión"""
         try:
-            Q1 = rt_series.quantile(0.25)
-            Q3 = rt_series.quantile(0.75)
-            IQR = Q3 - Q1
-            
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            return rt_series[(rt_series >= lower_bound) & (rt_series <= upper_bound)]
+            return {
+                'overall': self.outlier_engine.analyze(df['rt']),
+                'compatible': self.outlier_engine.analyze(compatible_blocks['rt']),
+                'incompatible': self.outlier_engine.analyze(incompatible_blocks['rt'])
+            }
             
         except Exception as e:
-            self.logger.error(f"Error removiendo outliers: {str(e)}")
-            return rt_series
+            self.logger.error(f"Error detectando outliers: {str(e)}")
+            return {}
     
-    def _calculate_confidence_interval(self, compatible: pd.DataFrame, 
-                                      incompatible: pd.DataFrame, d_score: float) -> Tuple[float, float]:
+    def _calculate_confidence_interval(self, compatible: TrialFrame,
+                                      incompatible: TrialFrame, d_score: float) -> Tuple[float, float]:
         """Calcula intervalo de confianza para D-Score"""
         try:
-            # Bootstrap para intervalo de confianza
-            n_bootstrap = 1000
-            d_scores = []
-            
-            for _ in range(n_bootstrap):
-                # Muestreo con reemplazo
-                comp_sample = compatible.sample(n=len(compatible), replace=True)
-                incomp_sample = incompatible.sample(n=len(incompatible), replace=True)
-                
-                # Calcular D-Score para esta muestra
-                sample_d_score = self._calculate_improved_d_score(comp_sample, incomp_sample)
-                d_scores.append(sample_d_score)
+            # Bootstrap para intervalo de confianza: las 1000 réplicas en un solo lote,
+            # con la exclusión del método primario repetida en cada réplica
+            d_scores = session_bootstrap_d_scores(
+                compatible['rt'], incompatible['rt'], n_replicates=self.confidence_iterations,
+                rng=np.random.default_rng(self.confidence_seed), method=self.outlier_engine.primary
+            )
             
-            # Calcular percentiles
-            ci_lower = np.percentile(d_scores, 2.5)
-            ci_upper = np.percentile(d_scores, 97.5)
+            # Calcular percentiles (sin las réplicas sin datos suficientes)
+            ci_lower, ci_upper = percentile_interval(d_scores)
+            if not np.isfinite(ci_lower):
+                return float(d_score), float(d_score)
             
             return float(ci_lower), float(ci_upper)
             
@@ -299,15 +737,24 @@ class IATAnalysisEngine:
             self.logger.error(f"Error calculando intervalo de confianza: {str(e)}")
             return float(d_score - 0.1), float(d_score + 0.1)
     
-    def _test_statistical_significance(self, compatible: pd.DataFrame, 
-                                     incompatible: pd.DataFrame, d_score: float) -> bool:
+    def _run_significance_tests(self, compatible_clean: np.ndarray,
+                                incompatible_clean: np.ndarray) -> Optional[SignificanceResult]:
+        """Welch y permutación sobre los mismos trials limpios que el D-Score"""
+        try:
+            return session_significance(compatible_clean, incompatible_clean, clean=False)
+            
+        except Exception as e:
+            self.logger.error(f"Error en pruebas de significancia: {str(e)}")
+            return None
+    
+    def _test_statistical_significance(self, tests: Optional[SignificanceResult], d_score: float) -> bool:
         """Prueba significancia estadística del D-Score"""
         try:
-            # T-test para comparar medias
-            t_stat, p_value = stats.ttest_ind(incompatible['rt'], compatible['rt'])
+            if tests is None or np.isnan(tests.welch_p_value):
+                return abs(d_score) > 0.2
             
-            # Significancia si p < 0.05 y |d_score| > 0.2
-            return p_value < 0.05 and abs(d_score) > 0.2
+            # Significancia si p < 0.05 (Welch) y |d_score| > 0.2
+            return tests.welch_p_value < 0.05 and abs(d_score) > 0.2
             
         except Exception as e:
             self.logger.error(f"Error en prueba de significancia: {str(e)}")
@@ -339,15 +786,17 @@ class IATAnalysisEngine:
         else:
             return "large"
     
-    def _analyze_blocks(self, df: pd.DataFrame) -> Dict[str, IATBlockAnalysis]:
+    def _analyze_blocks(self, compatible_blocks: TrialFrame, incompatible_blocks: TrialFrame,
+                        compatible_stats: Optional[Dict[str, float]] = None,
+                        incompatible_stats: Optional[Dict[str, float]] = None,
+                        outliers: Optional[Dict[str, BlockOutliers]] = None) -> Dict[str, IATBlockAnalysis]:
         """Analiza cada bloque individualmente"""
         try:
-            # Separar bloques compatibles e incompatibles
-            compatible_blocks = df[df['block'].isin([3, 4])]
-            incompatible_blocks = df[df['block'].isin([6, 7])]
-            
-            compatible_analysis = self._analyze_single_block(compatible_blocks, "compatible")
-            incompatible_analysis = self._analyze_single_block(incompatible_blocks, "incompatible")
+            outliers = outliers or {}
+            compatible_analysis = self._analyze_single_block(compatible_blocks, "compatible", compatible_stats,
+                                                             outliers.get('compatible'))
+            incompatible_analysis = self._analyze_single_block(incompatible_blocks, "incompatible", incompatible_stats,
+                                                               outliers.get('incompatible'))
             
             return {
                 'compatible': compatible_analysis,
@@ -361,37 +810,45 @@ class IATAnalysisEngine:
                 'incompatible': self._default_block_analysis()
             }
     
-    def _analyze_single_block(self, block_df: pd.DataFrame, block_type: str) -> IATBlockAnalysis:
+    def _analyze_single_block(self, block_df: TrialFrame, block_type: str,
+                              rt_stats: Optional[Dict[str, float]] = None,
+                              outliers: Optional[BlockOutliers] = None) -> IATBlockAnalysis:
         """Analiza un bloque individual"""
         try:
             if len(block_df) == 0:
                 return self._default_block_analysis()
             
+            if not rt_stats:
+                rt_stats = self._summarize_rt(block_df)
+            
             # Métricas básicas
             trial_count = len(block_df)
-            mean_rt = block_df['rt'].mean()
-            median_rt = block_df['rt'].median()
-            std_rt = block_df['rt'].std()
+            mean_rt = rt_stats['mean']
+            median_rt = rt_stats['median']
+            std_rt = rt_stats['std']
             
             # Precisión
-            accuracy = block_df['correct'].mean()
+            accuracy = rt_stats['accuracy']
             error_rate = 1 - accuracy
             
             # Análisis de velocidad
-            fast_trials = len(block_df[block_df['rt'] < 300])
-            slow_trials = len(block_df[block_df['rt'] > 3000])
+            fast_trials = int((block_df['rt'] < 300).sum())
+            slow_trials = int((block_df['rt'] > 3000).sum())
             
             # Outliers
-            outlier_rate = self._calculate_outlier_rate(block_df['rt'])
+            if outliers is not None:
+                outlier_rate = outliers.primary_result.rate
+            else:
+                outlier_rate = self._calculate_outlier_rate(block_df['rt'], rt_stats)
             
             # Efecto de aprendizaje
             learning_effect = self._calculate_learning_effect(block_df)
             
             # Consistencia
-            consistency = self._calculate_consistency(block_df)
+            consistency = self._calculate_consistency(block_df, rt_stats)
             
             return IATBlockAnalysis(
-                block_number=block_df['block'].iloc[0] if len(block_df) > 0 else 0,
+                block_number=int(block_df['block'][0]) if len(block_df) > 0 else 0,
                 block_type=block_type,
                 trial_count=trial_count,
                 mean_rt=float(mean_rt),
@@ -410,15 +867,16 @@ class IATAnalysisEngine:
             self.logger.error(f"Error analizando bloque individual: {str(e)}")
             return self._default_block_analysis()
     
-    def _calculate_outlier_rate(self, rt_series: pd.Series) -> float:
-        """Calcula tasa de outliers en RTs"""
+    def _calculate_outlier_rate(self, rt_series: np.ndarray,
+                                rt_stats: Optional[Dict[str, float]] = None) -> float:
+        """Calcula tasa de outliers en RTs (límites IQR del resumen precalculado si existen)"""
         try:
-            Q1 = rt_series.quantile(0.25)
-            Q3 = rt_series.quantile(0.75)
-            IQR = Q3 - Q1
-            
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
+            if rt_stats and 'lower_bound' in rt_stats:
+                lower_bound, upper_bound = rt_stats['lower_bound'], rt_stats['upper_bound']
+            else:
+                Q1, Q3 = np.quantile(rt_series, [0.25, 0.75])
+                IQR = Q3 - Q1
+                lower_bound, upper_bound = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
             
             outliers = rt_series[(rt_series < lower_bound) | (rt_series > upper_bound)]
             return len(outliers) / len(rt_series)
@@ -427,7 +885,7 @@ class IATAnalysisEngine:
             self.logger.error(f"Error calculando outliers: {str(e)}")
             return 0.0
     
-    def _calculate_learning_effect(self, block_df: pd.DataFrame) -> float:
+    def _calculate_learning_effect(self, block_df: TrialFrame) -> float:
         """Calcula efecto de aprendizaje en el bloque"""
         try:
             if len(block_df) < 3:
@@ -435,8 +893,8 @@ class IATAnalysisEngine:
             
             # Dividir bloque en tercios
             third = len(block_df) // 3
-            first_third = block_df.iloc[:third]['rt'].mean()
-            last_third = block_df.iloc[-third:]['rt'].mean()
+            first_third = block_df['rt'][:third].mean()
+            last_third = block_df['rt'][-third:].mean()
             
             # Mejora en RT (negativo = mejora)
             learning_effect = (last_third - first_third) / first_third
@@ -446,15 +904,19 @@ class IATAnalysisEngine:
             self.logger.error(f"Error calculando efecto de aprendizaje: {str(e)}")
             return 0.0
     
-    def _calculate_consistency(self, block_df: pd.DataFrame) -> float:
+    def _calculate_consistency(self, block_df: TrialFrame,
+                               rt_stats: Optional[Dict[str, float]] = None) -> float:
         """Calcula consistencia en respuestas"""
         try:
             if len(block_df) < 2:
                 return 1.0
             
             # Calcular coeficiente de variación
-            mean_rt = block_df['rt'].mean()
-            std_rt = block_df['rt'].std()
+            if rt_stats:
+                mean_rt, std_rt = rt_stats['mean'], rt_stats['std']
+            else:
+                mean_rt = block_df['rt'].mean()
+                std_rt = sample_std(block_df['rt'])
             
             if mean_rt == 0:
                 return 1.0
@@ -467,15 +929,19 @@ class IATAnalysisEngine:
             self.logger.error(f"Error calculando consistencia: {str(e)}")
             return 1.0
     
-    def _analyze_performance(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_performance(self, df: TrialFrame,
+                             overall_stats: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         """Analiza rendimiento general"""
         try:
+            if not overall_stats:
+                overall_stats = self._summarize_rt(df)
+            
             # Métricas básicas
-            accuracy = df['correct'].mean()
-            mean_rt = df['rt'].mean()
+            accuracy = overall_stats['accuracy']
+            mean_rt = overall_stats['mean']
             
             # Consistencia general
-            consistency = self._calculate_consistency(df)
+            consistency = self._calculate_consistency(df, overall_stats)
             
             # Curva de aprendizaje
             learning_curve = self._calculate_learning_curve(df)
@@ -496,21 +962,111 @@ class IATAnalysisEngine:
                 'learning_curve': []
             }
     
-    def _calculate_learning_curve(self, df: pd.DataFrame) -> List[float]:
+    def _summarize_blocks(self, df: TrialFrame) -> Dict[str, Dict[str, float]]:
+        """Sumas suficientes por bloque para agregados de estudio"""
+        try:
+            rt = df['rt']
+            blocks, codes = df.group_indices('block')
+            trials = np.bincount(codes, minlength=blocks.size)
+            rt_sum = np.bincount(codes, weights=rt, minlength=blocks.size)
+            rt_sum_sq = np.bincount(codes, weights=rt * rt, minlength=blocks.size)
+            errors = np.bincount(codes, weights=~df['correct'], minlength=blocks.size)
+            
+            return {
+                str(block): {
+                    'trials': int(trials[index]),
+                    'rt_sum': float(rt_sum[index]),
+                    'rt_sum_sq': float(rt_sum_sq[index]),
+                    'errors': int(errors[index])
+                }
+                for index, block in enumerate(blocks.tolist())
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error resumiendo bloques: {str(e)}")
+            return {}
+    
+    def _fit_ex_gaussian(self, compatible_blocks: TrialFrame, incompatible_blocks: TrialFrame,
+                         screening: Optional[ScreeningResult] = None) -> Dict[str, Any]:
+        """Ajuste ex-Gaussiano de ambos tipos de bloque en un solo lote (omitido si el screening excluye)"""
+        try:
+            if screening is not None and screening.excluded:
+                return {}
+            
+            rt = np.concatenate((compatible_blocks['rt'],
+                                 incompatible_blocks['rt']))
+            groups = np.repeat([0, 1], [len(compatible_blocks), len(incompatible_blocks)])
+            fit = fit_ex_gaussian(rt, groups, 2)
+            outliers = ex_gaussian_outlier_mask(rt, groups, fit)
+            
+            return {
+                'compatible': fit.group(0),
+                'incompatible': fit.group(1),
+                'tau_difference': float(fit.tau[1] - fit.tau[0]),
+                'outlier_rate': float(outliers.mean()) if rt.size else 0.0
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error en ajuste ex-Gaussiano: {str(e)}")
+            return {}
+    
+    def _estimate_diffusion(self, compatible_stats: Dict[str, float],
+                            incompatible_stats: Dict[str, float],
+                            screening: Optional[ScreeningResult] = None) -> Dict[str, Any]:
+        """EZ-diffusion a partir de los estadísticos de bloque ya calculados (omitido si el screening excluye)"""
+        try:
+            if screening is not None and screening.excluded:
+                return {}
+            
+            stats = [compatible_stats or {}, incompatible_stats or {}]
+            result = ez_diffusion(
+                accuracy=[s.get('accuracy', np.nan) for s in stats],
+                rt_variance=[s.get('std', np.nan) ** 2 for s in stats],
+                mean_rt=[s.get('mean', np.nan) for s in stats],
+                n_trials=[s.get('count', 0) for s in stats]
+            )
+            
+            return {
+                'compatible': result.item(0),
+                'incompatible': result.item(1),
+                'drift_difference': float(result.drift_rate[0] - result.drift_rate[1])
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error estimando EZ-diffusion: {str(e)}")
+            return {}
+    
+    def _sketch_blocks(self, df: TrialFrame,
+                       screening: Optional[ScreeningResult] = None) -> Dict[str, Dict[str, Any]]:
+        """Sketch KLL de RT por bloque, serializado con el resultado (los agregados ignoran sesiones excluidas)"""
+        try:
+            if screening is not None and screening.excluded:
+                return {}
+            
+            return {
+                str(block): KLLSketch.from_values(block_df['rt']).to_dict()
+                for block, block_df in df.groups('block')
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error construyendo sketches de RT: {str(e)}")
+            return {}
+    
+    def _calculate_learning_curve(self, df: TrialFrame) -> List[float]:
         """Calcula curva de aprendizaje"""
         try:
             # Agrupar por bloques y calcular RT promedio
-            block_means = df.groupby('block')['rt'].mean().tolist()
+            _, block_means = group_means(df['rt'], df['block'])
             return [float(x) for x in block_means]
             
         except Exception as e:
             self.logger.error(f"Error calculando curva de aprendizaje: {str(e)}")
             return []
     
-    def _analyze_errors(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_errors(self, df: TrialFrame) -> Dict[str, Any]:
         """Analiza patrones de errores"""
         try:
-            error_df = df[df['correct'] == False]
+            error_df = df.take(~df['correct'])
             
             if len(error_df) == 0:
                 return {
@@ -535,7 +1091,7 @@ class IATAnalysisEngine:
                 'details': {
                     'total_errors': total_errors,
                     'error_rate': float(error_rate),
-                    'error_blocks': error_df['block'].value_counts().to_dict()
+                    'error_blocks': value_counts(error_df['block'])
                 }
             }
             
@@ -546,14 +1102,15 @@ class IATAnalysisEngine:
                 'details': {'total_errors': 0, 'error_rate': 0.0}
             }
     
-    def _analyze_temporal_patterns(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_temporal_patterns(self, df: TrialFrame,
+                                   overall_stats: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         """Analiza patrones temporales"""
         try:
             # Efecto de fatiga
             fatigue_effect = self._calculate_fatigue_effect(df)
             
             # Métricas de atención
-            attention_metrics = self._calculate_attention_metrics(df)
+            attention_metrics = self._calculate_attention_metrics(df, overall_stats)
             
             return {
                 'fatigue': float(fatigue_effect),
@@ -567,7 +1124,25 @@ class IATAnalysisEngine:
                 'attention': {'focus': 0.0, 'stability': 0.0}
             }
     
-    def _calculate_fatigue_effect(self, df: pd.DataFrame) -> float:
+    def _calculate_temporal_curves(self, session_data: Dict[str, Any], df: TrialFrame,
+                                   screening: Optional[ScreeningResult] = None) -> Dict[str, Any]:
+        """Curvas móviles de la sesión (lote de uno del módulo temporal; omitidas si el screening excluye)"""
+        try:
+            if screening is not None and screening.excluded:
+                return {}
+            
+            batch = TemporalBatch.from_arrays(
+                [df['rt']],
+                [~df['correct']],
+                [str(session_data.get('sessionId', ''))]
+            )
+            return temporal_curves(batch)[0]
+            
+        except Exception as e:
+            self.logger.error(f"Error calculando curvas temporales: {str(e)}")
+            return {}
+    
+    def _calculate_fatigue_effect(self, df: TrialFrame) -> float:
         """Calcula efecto de fatiga"""
         try:
             if len(df) < 10:
@@ -575,8 +1150,8 @@ class IATAnalysisEngine:
             
             # Dividir en mitades
             half = len(df) // 2
-            first_half = df.iloc[:half]['rt'].mean()
-            second_half = df.iloc[half:]['rt'].mean()
+            first_half = df['rt'][:half].mean()
+            second_half = df['rt'][half:].mean()
             
             # Aumento en RT (positivo = fatiga)
             fatigue = (second_half - first_half) / first_half
@@ -586,12 +1161,16 @@ class IATAnalysisEngine:
             self.logger.error(f"Error calculando fatiga: {str(e)}")
             return 0.0
     
-    def _calculate_attention_metrics(self, df: pd.DataFrame) -> Dict[str, float]:
+    def _calculate_attention_metrics(self, df: TrialFrame,
+                                     overall_stats: Optional[Dict[str, float]] = None) -> Dict[str, float]:
         """Calcula métricas de atención"""
         try:
+            if not overall_stats:
+                overall_stats = self._summarize_rt(df)
+            
             # Estabilidad de atención (inversa de variabilidad)
-            rt_std = df['rt'].std()
-            rt_mean = df['rt'].mean()
+            rt_std = overall_stats['std']
+            rt_mean = overall_stats['mean']
             
             if rt_mean == 0:
                 stability = 1.0
@@ -599,7 +1178,7 @@ class IATAnalysisEngine:
                 stability = 1.0 - min(rt_std / rt_mean, 1.0)
             
             # Enfoque (precisión general)
-            focus = df['correct'].mean()
+            focus = overall_stats['accuracy']
             
             return {
                 'focus': float(focus),
@@ -610,33 +1189,43 @@ class IATAnalysisEngine:
             self.logger.error(f"Error calculando métricas de atención: {str(e)}")
             return {'focus': 0.0, 'stability': 0.0}
     
-    def _assess_data_quality(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Evalúa calidad de los datos"""
+    def _assess_data_quality(self, df: TrialFrame,
+                             overall_stats: Optional[Dict[str, float]] = None,
+                             outliers: Optional[Dict[str, BlockOutliers]] = None,
+                             screening: Optional[ScreeningResult] = None) -> Dict[str, Any]:
+        """Evalúa calidad de los datos (sin divisiones split-half si el screening excluye)"""
         try:
             # Puntuación de calidad (0-1)
             quality_score = 1.0
             
             # Penalizar por outliers
-            outlier_rate = self._calculate_outlier_rate(df['rt'])
+            if outliers and 'overall' in outliers:
+                outlier_rate = outliers['overall'].primary_result.rate
+            else:
+                outlier_rate = self._calculate_outlier_rate(df['rt'], overall_stats)
             quality_score -= outlier_rate * 0.3
             
             # Penalizar por respuestas muy rápidas
-            fast_responses = len(df[df['rt'] < 200]) / len(df)
+            fast_responses = (df['rt'] < 200).sum() / len(df)
             quality_score -= fast_responses * 0.2
             
             # Penalizar por respuestas muy lentas
-            slow_responses = len(df[df['rt'] > 5000]) / len(df)
+            slow_responses = (df['rt'] > 5000).sum() / len(df)
             quality_score -= slow_responses * 0.1
             
             # Asegurar que esté entre 0 y 1
             quality_score = max(0.0, min(1.0, quality_score))
             
-            # Métricas de confiabilidad
-            reliability = {
-                'internal_consistency': self._calculate_internal_consistency(df),
-                'test_retest_reliability': 0.8,  # Valor estimado
-                'split_half_reliability': self._calculate_split_half_reliability(df)
-            }
+            # Métricas de confiabilidad (una sola serie de divisiones aleatorias)
+            if screening is not None and screening.excluded:
+                reliability = {'internal_consistency': 0.0, 'test_retest_reliability': None, 'split_half_reliability': 0.0}
+            else:
+                split_half = self._calculate_split_half(df)
+                reliability = {
+                    'internal_consistency': self._calculate_internal_consistency(df, split_half),
+                    'test_retest_reliability': None,  # Solo con sesiones repetidas (_merge_test_retest)
+                    'split_half_reliability': self._calculate_split_half_reliability(df, split_half)
+                }
             
             return {
                 'score': float(quality_score),
@@ -647,32 +1236,38 @@ class IATAnalysisEngine:
             self.logger.error(f"Error evaluando calidad de datos: {str(e)}")
             return {
                 'score': 0.5,
-                'reliability': {'internal_consistency': 0.0, 'test_retest_reliability': 0.0, 'split_half_reliability': 0.0}
+                'reliability': {'internal_consistency': 0.0, 'test_retest_reliability': None, 'split_half_reliability': 0.0}
             }
     
-    def _calculate_internal_consistency(self, df: pd.DataFrame) -> float:
-        """Calcula consistencia interna"""
+    def _calculate_split_half(self, df: TrialFrame) -> Optional[SplitHalfResult]:
+        """Divisiones aleatorias de los trials de cada bloque en dos mitades"""
         try:
-            # Dividir en mitades y correlacionar
-            half = len(df) // 2
-            first_half = df.iloc[:half]['rt']
-            second_half = df.iloc[half:2*half]['rt']
-            
-            if len(first_half) != len(second_half):
-                return 0.0
+            return session_split_half_reliability(df['rt'], df['block'],
+                                                  n_splits=self.split_half_iterations)
             
-            correlation = first_half.corr(second_half)
-            return float(correlation) if not pd.isna(correlation) else 0.0
+        except Exception as e:
+            self.logger.error(f"Error calculando divisiones split-half: {str(e)}")
+            return None
+    
+    def _calculate_internal_consistency(self, df: TrialFrame,
+                                        split_half: Optional[SplitHalfResult] = None) -> float:
+        """Calcula consistencia interna (r medio entre mitades aleatorias, sin corregir)"""
+        try:
+            if split_half is None:
+                split_half = self._calculate_split_half(df)
+            return float(split_half.split_half_correlation) if split_half else 0.0
             
         except Exception as e:
             self.logger.error(f"Error calculando consistencia interna: {str(e)}")
             return 0.0
     
-    def _calculate_split_half_reliability(self, df: pd.DataFrame) -> float:
-        """Calcula confiabilidad split-half"""
+    def _calculate_split_half_reliability(self, df: TrialFrame,
+                                          split_half: Optional[SplitHalfResult] = None) -> float:
+        """Calcula confiabilidad split-half con corrección Spearman–Brown"""
         try:
-            # Implementación simplificada
-            return self._calculate_internal_consistency(df)
+            if split_half is None:
+                split_half = self._calculate_split_half(df)
+            return float(split_half.spearman_brown) if split_half else 0.0
             
         except Exception as e:
             self.logger.error(f"Error calculando confiabilidad split-half: {str(e)}")
@@ -682,8 +1277,10 @@ class IATAnalysisEngine:
         """Convierte objetos numpy a tipos Python nativos para serialización JSON"""
         if isinstance(obj, dict):
             return {key: self._make_serializable(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
+        elif isinstance(obj, (list, tuple)):
             return [self._make_serializable(item) for item in obj]
+        elif isinstance(obj, np.bool_):
+            return bool(obj)
         elif isinstance(obj, np.integer):
             return int(obj)
         elif isinstance(obj, np.floating):
@@ -723,13 +1320,120 @@ class IATAnalysisEngine:
             consistency=0.0
         )
 
-def main():
-    """Función principal para comunicación con Node.js"""
-    try:
-        # Leer datos desde stdin
-        input_data = json.loads(sys.stdin.read())
-        
-        engine = IATAnalysisEngine()
+def create_engine() -> IATAnalysisEngine:
+    """Motor configurado con los almacenes indicados en el entorno"""
+    from iatcore.aggregates import StudyAggregateStore
+    from iatcore.cube import AggregateCubeStore
+    from iatcore.participant_index import ParticipantIndex
+    index_path = os.environ.get('IAT_PARTICIPANT_INDEX_PATH')
+    aggregates_path = os.environ.get('IAT_STUDY_AGGREGATES_PATH')
+    cube_path = os.environ.get('IAT_AGGREGATE_CUBE_PATH')
+    return IATAnalysisEngine(
+        participant_index=ParticipantIndex(index_path) if index_path else None,
+        study_aggregates=StudyAggregateStore(aggregates_path) if aggregates_path else None,
+        aggregate_cube=AggregateCubeStore(cube_path) if cube_path else None
+    )
+
+def handle_request(input_data: Dict[str, Any], engine: Optional[IATAnalysisEngine] = None) -> Dict[str, Any]:
+    """
+    Atiende una petición ya decodificada; los errores se propagan al llamador
+    
+    Args:
+        input_data: Petición con la misma forma que la entrada por stdin; con
+            ``profile``, se perfila (ver ``iatcore.profiling``)
+        engine: Motor reutilizable entre peticiones del mismo proceso (y sus cachés)
+    """
+    engine = engine or create_engine()
+    return run_profiled(input_data, lambda: _handle_request(input_data, engine))
+
+def _handle_request(input_data: Dict[str, Any], engine: IATAnalysisEngine) -> Dict[str, Any]:
+    
+    if input_data.get('action') == 'bootstrap_study':
+        compare = input_data.get('compare')
+        study_result = engine.bootstrap_study(
+            input_data.get('sessions', []),
+            segments=input_data.get('segments'),
+            compare=tuple(compare) if compare else None,
+            n_replicates=int(input_data.get('n_replicates', 10000)),
+            seed=int(input_data.get('seed', 0)),
+            workers=input_data.get('workers')
+        )
+        result = {
+            'success': True,
+            'study_bootstrap': engine._make_serializable(asdict(study_result)),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'reliability_study':
+        reliability = engine.study_reliability(
+            input_data.get('sessions', []),
+            n_splits=int(input_data.get('n_splits', 1000)),
+            seed=int(input_data.get('seed', 0))
+        )
+        result = {
+            'success': True,
+            'study_reliability': engine._make_serializable(asdict(reliability)),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'sensitivity':
+        from iatcore.sensitivity import SensitivityGrid
+        sensitivity = engine.sensitivity_analysis(
+            session_data=input_data.get('session'),
+            sessions=input_data.get('sessions'),
+            grid=SensitivityGrid.from_dict(input_data.get('grid'))
+        )
+        result = {
+            'success': True,
+            'sensitivity': engine._make_serializable(sensitivity),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'outlier_sensitivity':
+        result = {
+            'success': True,
+            'outlier_sensitivity': engine._make_serializable(
+                engine.outlier_sensitivity_study(input_data.get('sessions', []))
+            ),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'ex_gaussian_study':
+        result = {
+            'success': True,
+            'ex_gaussian_study': engine._make_serializable(engine.ex_gaussian_study(input_data.get('sessions', []))),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'temporal_curves':
+        curves = engine.temporal_curves_study(
+            input_data.get('sessions', []),
+            window=int(input_data.get('window', 10))
+        )
+        result = {
+            'success': True,
+            'temporal_curves': engine._make_serializable(curves),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'item_analysis':
+        items = engine.item_analysis(input_data.get('sessions', []))
+        result = {
+            'success': True,
+            'item_analysis': engine._make_serializable(asdict(items)),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'study_aggregates':
+        result = {
+            'success': True,
+            'study_aggregates': engine._make_serializable(engine.study_summary(str(input_data.get('testId', '')))),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    elif input_data.get('action') == 'cube_query':
+        result = {
+            'success': True,
+            'cube': engine._make_serializable(engine.query_cube(
+                str(input_data.get('testId', '')),
+                where=input_data.get('where'),
+                group_by=input_data.get('groupBy')
+            )),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    else:
         analysis = engine.analyze_session(input_data)
         
         # Convertir a diccionario serializable
@@ -738,15 +1442,28 @@ def main():
             'analysis': engine._make_serializable(asdict(analysis)),
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
         }
+    
+    return result
+
+def main():
+    """Función principal para comunicación con Node.js"""
+    RUNTIME.start()
+    try:
+        # Leer datos desde stdin
+        input_data = json.loads(sys.stdin.read())
+        with request_logging(input_data.get('log_level')):
+            result = handle_request(input_data)
         
         # Enviar resultado a stdout
+        result['runtime'] = RUNTIME.finish(bytecode=bytecode_available(iatcore))
         print(json.dumps(result, ensure_ascii=False))
         
     except Exception as e:
         error_result = {
             'success': False,
             'error': f'Error en IAT Analysis Engine: {str(e)}',
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'runtime': RUNTIME.finish(bytecode=bytecode_available(iatcore))
         }
         print(json.dumps(error_result, ensure_ascii=False))
 
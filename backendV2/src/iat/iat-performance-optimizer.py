@@ -4,25 +4,33 @@ IAT Performance Optimizer - Optimizador de rendimiento para análisis IAT
 Implementa técnicas avanzadas de optimización para procesamiento rápido de datos
 """
 
+import os
 import sys
 import json
 import time
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
-import pandas as pd
 import numpy as np
-from scipy import stats
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+import iatcore
+from iatcore.dscore import d_score_kernel
+from iatcore.frame import TrialFrame, group_means, sample_std, value_counts
+from iatcore.logs import configure_logging, request_logging, submit_in_context
+from iatcore.profiling import run_profiled
+from iatcore.runtime import ColdStartTimer, bytecode_available
+
+# Configurar logging (cola + hilo de fondo; nivel en IAT_LOG_LEVEL)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Arranque del proceso (intérprete + imports) separado del tiempo de cada petición
+RUNTIME = ColdStartTimer()
+
 @dataclass
 class PerformanceMetrics:
     """Métricas de rendimiento del análisis"""
@@ -38,10 +46,10 @@ class IATPerformanceOptimizer:
     
     def __init__(self):
         self.logger = logging.getLogger(f"{__name__}.IATPerformanceOptimizer")
-        self.logger.info("Inicializando IAT Performance Optimizer")
+        self.logger.debug("Inicializando IAT Performance Optimizer")
         
         # Configuración de optimización
-        self.max_workers = min(mp.cpu_count(), 8)  # Máximo 8 workers
+        self.max_workers = min(os.cpu_count() or 1, 8)  # Máximo 8 workers
         self.chunk_size = 1000  # Procesar en chunks
         self.cache_size = 128  # Cache LRU
         
@@ -65,18 +73,18 @@ class IATPerformanceOptimizer:
             self.logger.info("Iniciando análisis IAT optimizado")
             
             # Preparar datos optimizado
-            df = self._prepare_dataframe_optimized(session_data)
+            df = self._prepare_frame_optimized(session_data)
             
             # Análisis paralelo
             with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
                 # Ejecutar análisis en paralelo
                 futures = {
-                    'd_score': executor.submit(self._calculate_d_score_optimized, df),
-                    'blocks': executor.submit(self._analyze_blocks_optimized, df),
-                    'performance': executor.submit(self._analyze_performance_optimized, df),
-                    'errors': executor.submit(self._analyze_errors_optimized, df),
-                    'temporal': executor.submit(self._analyze_temporal_optimized, df),
-                    'quality': executor.submit(self._assess_quality_optimized, df)
+                    'd_score': submit_in_context(executor, self._calculate_d_score_optimized, df),
+                    'blocks': submit_in_context(executor, self._analyze_blocks_optimized, df),
+                    'performance': submit_in_context(executor, self._analyze_performance_optimized, df),
+                    'errors': submit_in_context(executor, self._analyze_errors_optimized, df),
+                    'temporal': submit_in_context(executor, self._analyze_temporal_optimized, df),
+                    'quality': submit_in_context(executor, self._assess_quality_optimized, df)
                 }
                 
                 # Recoger resultados
@@ -99,7 +107,7 @@ class IATPerformanceOptimizer:
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
             }
             
-            self.logger.info(f"Análisis optimizado completado en {processing_time:.3f}s")
+            self.logger.info("Análisis optimizado completado en %.3fs", processing_time)
             return result
             
         except Exception as e:
@@ -110,69 +118,41 @@ class IATPerformanceOptimizer:
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
             }
     
-    def _prepare_dataframe_optimized(self, session_data: Dict[str, Any]) -> pd.DataFrame:
-        """Prepara DataFrame con optimizaciones de memoria"""
+    def _prepare_frame_optimized(self, session_data: Dict[str, Any]) -> TrialFrame:
+        """Prepara columnas de trials con optimizaciones de memoria"""
         try:
             responses = session_data.get('responses', [])
             
             if not responses:
                 raise ValueError("No se encontraron respuestas IAT")
             
-            # Crear DataFrame optimizado
-            data = []
-            for response in responses:
-                data.append({
-                    'trial': int(response.get('trialNumber', 0)),
-                    'block': int(response.get('blockNumber', 0)),
-                    'stimulus': str(response.get('stimulus', '')),
-                    'response': str(response.get('response', '')),
-                    'rt': float(response.get('responseTime', 0)),
-                    'correct': bool(response.get('correct', False)),
-                    'category': str(response.get('category', '')),
-                    'attribute': str(response.get('attribute', ''))
-                })
-            
-            df = pd.DataFrame(data)
+            # Columnas NumPy; limpia RTs fuera de (0, 10000) de forma optimizada
+            df = TrialFrame.from_responses(responses, min_rt=0.0, max_rt=10000.0)
             
             # Optimizaciones de memoria
-            df['trial'] = df['trial'].astype('int32')
-            df['block'] = df['block'].astype('int32')
-            df['rt'] = df['rt'].astype('float32')
-            df['correct'] = df['correct'].astype('bool')
-            
-            # Limpiar datos de forma optimizada
-            df = df[(df['rt'] > 0) & (df['rt'] < 10000)]
+            df.columns['trial'] = df['trial'].astype(np.int32)
+            df.columns['block'] = df['block'].astype(np.int32)
+            df.columns['rt'] = df['rt'].astype(np.float32)
             
-            self.logger.info(f"DataFrame optimizado preparado con {len(df)} respuestas")
+            self.logger.info("Trials optimizados preparados con %s respuestas", len(df))
             return df
             
         except Exception as e:
-            self.logger.error(f"Error preparando DataFrame optimizado: {str(e)}")
+            self.logger.error(f"Error preparando trials optimizados: {str(e)}")
             raise
     
-    def _calculate_d_score_optimized(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _calculate_d_score_optimized(self, df: TrialFrame) -> Dict[str, Any]:
         """Calcula D-Score con cache y optimizaciones"""
         try:
             # Separar bloques compatibles e incompatibles
-            compatible_blocks = df[df['block'].isin([3, 4])]
-            incompatible_blocks = df[df['block'].isin([6, 7])]
+            compatible_blocks = df.in_blocks([3, 4])
+            incompatible_blocks = df.in_blocks([6, 7])
             
             if len(compatible_blocks) == 0 or len(incompatible_blocks) == 0:
                 return self._default_d_score_analysis()
             
-            # Cálculo D-Score optimizado
-            mean_rt_compatible = compatible_blocks['rt'].mean()
-            mean_rt_incompatible = incompatible_blocks['rt'].mean()
-            
-            # Desviación estándar combinada
-            std_compatible = compatible_blocks['rt'].std()
-            std_incompatible = incompatible_blocks['rt'].std()
-            combined_std = (std_compatible + std_incompatible) / 2
-            
-            if combined_std == 0:
-                d_score = 0.0
-            else:
-                d_score = (mean_rt_incompatible - mean_rt_compatible) / combined_std
+            # Kernel compartido: limpieza IQR y desviación combinada
+            d_score = d_score_kernel(compatible_blocks['rt'], incompatible_blocks['rt'])
             
             # Interpretación
             abs_d_score = abs(d_score)
@@ -202,18 +182,12 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error calculando D-Score optimizado: {str(e)}")
             return self._default_d_score_analysis()
     
-    def _analyze_blocks_optimized(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_blocks_optimized(self, df: TrialFrame) -> Dict[str, Any]:
         """Análisis de bloques optimizado"""
         try:
-            # Análisis vectorizado
-            block_stats = df.groupby('block').agg({
-                'rt': ['mean', 'median', 'std'],
-                'correct': ['mean', 'sum', 'count']
-            }).round(3)
-            
             # Calcular métricas optimizadas
-            compatible_blocks = df[df['block'].isin([3, 4])]
-            incompatible_blocks = df[df['block'].isin([6, 7])]
+            compatible_blocks = df.in_blocks([3, 4])
+            incompatible_blocks = df.in_blocks([6, 7])
             
             compatible_analysis = self._analyze_single_block_optimized(compatible_blocks)
             incompatible_analysis = self._analyze_single_block_optimized(incompatible_blocks)
@@ -227,24 +201,24 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error analizando bloques optimizado: {str(e)}")
             return {'compatible': {}, 'incompatible': {}}
     
-    def _analyze_single_block_optimized(self, block_df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_single_block_optimized(self, block_df: TrialFrame) -> Dict[str, Any]:
         """Análisis de bloque individual optimizado"""
         try:
             if len(block_df) == 0:
                 return self._default_block_analysis()
             
             # Cálculos vectorizados
-            rt_stats = block_df['rt'].describe()
+            rt = block_df['rt']
             accuracy = block_df['correct'].mean()
             
             # Métricas optimizadas
             return {
-                'block_number': int(block_df['block'].iloc[0]) if len(block_df) > 0 else 0,
-                'block_type': 'compatible' if block_df['block'].iloc[0] in [3, 4] else 'incompatible',
+                'block_number': int(block_df['block'][0]) if len(block_df) > 0 else 0,
+                'block_type': 'compatible' if block_df['block'][0] in [3, 4] else 'incompatible',
                 'trial_count': len(block_df),
-                'mean_rt': float(rt_stats['mean']),
-                'median_rt': float(rt_stats['50%']),
-                'std_rt': float(rt_stats['std']),
+                'mean_rt': float(rt.mean()),
+                'median_rt': float(np.median(rt)),
+                'std_rt': sample_std(rt),
                 'accuracy': float(accuracy),
                 'error_rate': float(1 - accuracy),
                 'fast_trials': int((block_df['rt'] < 300).sum()),
@@ -258,11 +232,11 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error analizando bloque optimizado: {str(e)}")
             return self._default_block_analysis()
     
-    def _calculate_outlier_rate_optimized(self, rt_series: pd.Series) -> float:
+    def _calculate_outlier_rate_optimized(self, rt_series: np.ndarray) -> float:
         """Calcula outliers de forma optimizada"""
         try:
             # Usar percentiles para detección rápida de outliers
-            q1, q3 = rt_series.quantile([0.25, 0.75])
+            q1, q3 = np.quantile(rt_series, [0.25, 0.75])
             iqr = q3 - q1
             
             lower_bound = q1 - 1.5 * iqr
@@ -275,7 +249,7 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error calculando outliers optimizado: {str(e)}")
             return 0.0
     
-    def _calculate_learning_effect_optimized(self, block_df: pd.DataFrame) -> float:
+    def _calculate_learning_effect_optimized(self, block_df: TrialFrame) -> float:
         """Calcula efecto de aprendizaje optimizado"""
         try:
             if len(block_df) < 3:
@@ -283,7 +257,7 @@ class IATPerformanceOptimizer:
             
             # Usar regresión lineal simple para efecto de aprendizaje
             x = np.arange(len(block_df))
-            y = block_df['rt'].values
+            y = block_df['rt']
             
             if len(x) != len(y):
                 return 0.0
@@ -296,14 +270,14 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error calculando aprendizaje optimizado: {str(e)}")
             return 0.0
     
-    def _calculate_consistency_optimized(self, block_df: pd.DataFrame) -> float:
+    def _calculate_consistency_optimized(self, block_df: TrialFrame) -> float:
         """Calcula consistencia optimizada"""
         try:
             if len(block_df) < 2:
                 return 1.0
             
             rt_mean = block_df['rt'].mean()
-            rt_std = block_df['rt'].std()
+            rt_std = sample_std(block_df['rt'])
             
             if rt_mean == 0:
                 return 1.0
@@ -315,7 +289,7 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error calculando consistencia optimizada: {str(e)}")
             return 1.0
     
-    def _analyze_performance_optimized(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_performance_optimized(self, df: TrialFrame) -> Dict[str, Any]:
         """Análisis de rendimiento optimizado"""
         try:
             # Cálculos vectorizados
@@ -324,7 +298,7 @@ class IATPerformanceOptimizer:
             consistency = self._calculate_consistency_optimized(df)
             
             # Curva de aprendizaje optimizada
-            learning_curve = df.groupby('block')['rt'].mean().tolist()
+            _, learning_curve = group_means(df['rt'], df['block'])
             
             return {
                 'accuracy': float(accuracy),
@@ -337,10 +311,10 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error analizando rendimiento optimizado: {str(e)}")
             return {'accuracy': 0.0, 'mean_rt': 0.0, 'consistency': 0.0, 'learning_curve': []}
     
-    def _analyze_errors_optimized(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_errors_optimized(self, df: TrialFrame) -> Dict[str, Any]:
         """Análisis de errores optimizado"""
         try:
-            error_df = df[df['correct'] == False]
+            error_df = df.take(~df['correct'])
             
             if len(error_df) == 0:
                 return {
@@ -364,7 +338,7 @@ class IATPerformanceOptimizer:
                 'details': {
                     'total_errors': total_errors,
                     'error_rate': float(error_rate),
-                    'error_blocks': error_df['block'].value_counts().to_dict()
+                    'error_blocks': value_counts(error_df['block'])
                 }
             }
             
@@ -372,7 +346,7 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error analizando errores optimizado: {str(e)}")
             return {'pattern': 'unknown', 'details': {'total_errors': 0, 'error_rate': 0.0}}
     
-    def _analyze_temporal_optimized(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_temporal_optimized(self, df: TrialFrame) -> Dict[str, Any]:
         """Análisis temporal optimizado"""
         try:
             # Efecto de fatiga optimizado
@@ -380,12 +354,12 @@ class IATPerformanceOptimizer:
                 fatigue_effect = 0.0
             else:
                 half = len(df) // 2
-                first_half = df.iloc[:half]['rt'].mean()
-                second_half = df.iloc[half:]['rt'].mean()
+                first_half = df['rt'][:half].mean()
+                second_half = df['rt'][half:].mean()
                 fatigue_effect = (second_half - first_half) / first_half if first_half != 0 else 0.0
             
             # Métricas de atención optimizadas
-            rt_std = df['rt'].std()
+            rt_std = sample_std(df['rt'])
             rt_mean = df['rt'].mean()
             
             stability = 1.0 - min(rt_std / rt_mean, 1.0) if rt_mean != 0 else 1.0
@@ -403,7 +377,7 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error analizando temporal optimizado: {str(e)}")
             return {'fatigue': 0.0, 'attention': {'focus': 0.0, 'stability': 0.0}}
     
-    def _assess_quality_optimized(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _assess_quality_optimized(self, df: TrialFrame) -> Dict[str, Any]:
         """Evaluación de calidad optimizada"""
         try:
             # Puntuación de calidad optimizada
@@ -438,7 +412,7 @@ class IATPerformanceOptimizer:
             self.logger.error(f"Error evaluando calidad optimizada: {str(e)}")
             return {'score': 0.5, 'reliability': {'internal_consistency': 0.0, 'test_retest_reliability': 0.0, 'split_half_reliability': 0.0}}
     
-    def _calculate_internal_consistency_optimized(self, df: pd.DataFrame) -> float:
+    def _calculate_internal_consistency_optimized(self, df: TrialFrame) -> float:
         """Consistencia interna optimizada"""
         try:
             if len(df) < 4:
@@ -446,20 +420,22 @@ class IATPerformanceOptimizer:
             
             # Dividir en mitades y correlacionar
             half = len(df) // 2
-            first_half = df.iloc[:half]['rt']
-            second_half = df.iloc[half:2*half]['rt']
+            first_half = df['rt'][:half]
+            second_half = df['rt'][half:2*half]
             
             if len(first_half) != len(second_half):
                 return 0.0
             
-            correlation = first_half.corr(second_half)
-            return float(correlation) if not pd.isna(correlation) else 0.0
+            # Correlación por posición (la de pandas alineaba índices disjuntos y daba NaN)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                correlation = np.corrcoef(first_half, second_half)[0, 1]
+            return float(correlation) if np.isfinite(correlation) else 0.0
             
         except Exception as e:
             self.logger.error(f"Error calculando consistencia interna optimizada: {str(e)}")
             return 0.0
     
-    def _calculate_split_half_reliability_optimized(self, df: pd.DataFrame) -> float:
+    def _calculate_split_half_reliability_optimized(self, df: TrialFrame) -> float:
         """Confiabilidad split-half optimizada"""
         try:
             return self._calculate_internal_consistency_optimized(df)
@@ -560,23 +536,31 @@ class IATPerformanceOptimizer:
         else:
             return obj
 
+def handle_request(input_data: Dict[str, Any],
+                   optimizer: Optional[IATPerformanceOptimizer] = None) -> Dict[str, Any]:
+    """Atiende una petición ya decodificada reutilizando el optimizador si se recibe (``profile``: perfilado)"""
+    optimizer = optimizer or IATPerformanceOptimizer()
+    return run_profiled(input_data, lambda: optimizer._make_serializable(optimizer.optimize_analysis(input_data)))
+
 def main():
     """Función principal optimizada"""
+    RUNTIME.start()
     try:
         # Leer datos desde stdin
         input_data = json.loads(sys.stdin.read())
-        
-        optimizer = IATPerformanceOptimizer()
-        result = optimizer.optimize_analysis(input_data)
+        with request_logging(input_data.get('log_level')):
+            result = handle_request(input_data)
         
         # Enviar resultado optimizado
-        print(json.dumps(optimizer._make_serializable(result), ensure_ascii=False))
+        result['runtime'] = RUNTIME.finish(bytecode=bytecode_available(iatcore))
+        print(json.dumps(result, ensure_ascii=False))
         
     except Exception as e:
         error_result = {
             'success': False,
             'error': f'Error en IAT Performance Optimizer: {str(e)}',
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'runtime': RUNTIME.finish(bytecode=bytecode_available(iatcore))
         }
         print(json.dumps(error_result, ensure_ascii=False))
 
@@ -16,6 +16,8 @@ interface PerformanceOptimizedInput {
     totalTrials: number;
     optimizationLevel: string;
   };
+  request_id?: string;
+  profile?: boolean | 'cprofile' | 'sampling' | { mode?: 'cprofile' | 'sampling'; top?: number; interval_ms?: number };
 }
 
 /**
@@ -31,6 +33,26 @@ interface PerformanceOptimizedAnalysis {
   [key: string]: unknown;
 }
 
+/**
+ * Perfil de una petición (opción `profile` o IAT_PROFILE_SAMPLE_EVERY)
+ */
+interface RequestProfile {
+  mode: 'cprofile' | 'sampling';
+  sampled: boolean;
+  wall_ms: number;
+  path: string | null;
+  top: Array<{
+    function: string;
+    calls?: number;
+    self_samples?: number;
+    total_samples?: number;
+    self_ms: number;
+    total_ms: number;
+  }>;
+  samples?: number;
+  interval_ms?: number;
+}
+
 interface PerformanceOptimizedResponse {
   success: boolean;
   analysis?: PerformanceOptimizedAnalysis;
@@ -41,6 +63,7 @@ interface PerformanceOptimizedResponse {
     cache_hits: number;
     parallel_tasks: number;
     optimization_level: string;
+    profile?: RequestProfile;
   };
   optimization_applied?: boolean;
   error?: string;
@@ -4,21 +4,62 @@ IAT Test Engine - Motor completo de ejecución de pruebas IAT
 Implementa la lógica completa de pruebas de asociación implícita
 """
 
+import os
 import sys
 import json
 import time
 import random
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field, asdict
 from enum import Enum
-import pandas as pd
 import numpy as np
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+from iatcore.dscore import d_score_kernel
+from iatcore.frame import SESSION_RESPONSE_FIELDS, TrialFrame, sample_std
+from iatcore.plans import (
+    CompiledPlan, PlanBank, PlanCache, SessionPlan, PLAN_BANK_SUFFIX, config_hash, generate_plan_bank, plan_seed
+)
+from iatcore.logs import TRIAL_SAMPLE_EVERY, configure_logging, log_event, request_logging
+from iatcore.runtime import ColdStartTimer
+
+# Configurar logging (cola + hilo de fondo; nivel en IAT_LOG_LEVEL)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Arranque del proceso (intérprete + imports) separado del tiempo de cada petición
+RUNTIME = ColdStartTimer()
+
+# Sesiones en vivo por proceso (IATSessionManager)
+DEFAULT_IDLE_TIMEOUT = 1800.0  # segundos sin actividad antes de expulsar la sesión
+DEFAULT_MAX_SESSIONS = 20000
+EVICTION_INTERVAL = 256  # operaciones entre barridos de sesiones inactivas
+
+# Planes de estímulos compilados, compartidos por todas las sesiones del proceso.
+# Sin semilla explícita, cada participante recibe uno de PLAN_POOL_SIZE planes
+PLAN_CACHE = PlanCache()
+PLAN_POOL_SIZE = int(os.environ.get('IAT_PLAN_POOL_SIZE', '256'))
+
+# Bancos pregenerados (<dir>/<config_hash>.iatplan); con banco, start_session no aleatoriza
+PLAN_BANK_DIR = os.environ.get('IAT_PLAN_BANK_DIR')
+PLAN_BANKS: Dict[str, Optional[PlanBank]] = {}
+
+# Órdenes de presentación contrabalanceados (números de bloque): emparejamiento
+# compatible primero o incompatible primero
+COUNTERBALANCED_BLOCK_ORDERS = (
+    (1, 2, 3, 4, 5, 6, 7),
+    (5, 2, 6, 7, 1, 3, 4),
+)
+
+# Formatos de respuesta de start_session. 'compact': diccionario de estímulos una
+# sola vez y, por bloque, arrays de ids de estímulo y lados correctos
+PAYLOAD_FULL = 'full'
+PAYLOAD_COMPACT = 'compact'
+PAYLOAD_FORMATS = (PAYLOAD_FULL, PAYLOAD_COMPACT)
+SIDE_LABELS = ('left', 'right')  # valor de correct_sides -> lado
+
 class IATBlockType(Enum):
     """Tipos de bloques IAT"""
     PRACTICE_CATEGORIES = "practice_categories"
@@ -90,6 +131,12 @@ class IATTestEngine:
         self.current_session: Optional[str] = None
         self.responses: List[IATResponse] = []
         self.start_time: Optional[float] = None
+        self.plan: Optional[SessionPlan] = None
+        # Cursor sobre el plan: siguiente posición de presentación y respuesta por posición
+        self.cursor = 0
+        self.answered = 0
+        self._response_index: Optional[np.ndarray] = None
+        self._unplanned_index: Dict[Tuple[int, int], int] = {}
         
     def create_test_config(self, config_data: Dict[str, Any]) -> IATTestConfig:
         """Crea una configuración de prueba IAT"""
@@ -115,48 +162,72 @@ class IATTestEngine:
             )
             
             self.current_test = config
-            self.logger.info(f"Configuración IAT creada: {config.test_id}")
+            self.logger.info("Configuración IAT creada: %s", config.test_id)
             return config
             
         except Exception as e:
             self.logger.error(f"Error creando configuración IAT: {str(e)}")
             raise
     
-    def start_session(self, session_id: str, participant_id: str) -> Dict[str, Any]:
-        """Inicia una nueva sesión de prueba IAT"""
+    def start_session(self, session_id: str, participant_id: str, seed: Optional[int] = None,
+                      plan_index: Optional[int] = None, payload_format: str = PAYLOAD_FULL,
+                      known_config_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Inicia una nueva sesión de prueba IAT
+        
+        Args:
+            seed: Semilla del plan de estímulos; por defecto, una estable derivada
+                del participante dentro de un conjunto de PLAN_POOL_SIZE planes
+            plan_index: Fila del banco pregenerado (si hay banco y no se da ``seed``);
+                por defecto, la siguiente en la rotación persistida junto al banco
+                (``PlanBank.next_index``), válida con un proceso por petición
+            payload_format: 'full' (un dict por trial) o 'compact' (ver ``_compact_payload``)
+            known_config_hash: En formato compacto, hash de plan cuyo diccionario de
+                estímulos ya tiene el cliente; si coincide, no se reenvía
+        """
         try:
             if not self.current_test:
                 raise ValueError("No hay configuración de prueba cargada")
+            if payload_format not in PAYLOAD_FORMATS:
+                raise ValueError(f"Formato de respuesta no soportado: {payload_format}")
             
             self.current_session = session_id
             self.responses = []
             self.start_time = time.time()
             
-            # Generar bloques de la prueba
-            blocks = self._generate_test_blocks()
+            # Plan de bloques: fila del banco pregenerado, o caché + permutación por semilla
+            bank = self._plan_bank() if seed is None else None
+            if bank is not None:
+                if plan_index is None:
+                    plan_index = bank.next_index(participant_id or session_id)
+                self.plan = bank.session_plan(plan_index)
+            else:
+                if seed is None:
+                    seed = plan_seed(participant_id or session_id, PLAN_POOL_SIZE)
+                self.plan = self.session_plan(seed)
+            self._reset_cursor()
+            
+            self.logger.info("Sesión IAT iniciada: %s", session_id)
             
-            self.logger.info(f"Sesión IAT iniciada: {session_id}")
+            if payload_format == PAYLOAD_COMPACT:
+                return self._compact_payload(session_id, participant_id, known_config_hash)
             
-            # Convertir bloques a diccionarios serializables
+            # Convertir bloques a diccionarios serializables (en orden de presentación)
+            compiled = self.plan.compiled
+            stimuli = self.plan.stimulus_table()
             serializable_blocks = []
-            for block in blocks:
+            for index in self.plan.presentation_order():
+                block = compiled.blocks[index]
                 block_dict = {
-                    'block_number': block.block_number,
-                    'block_type': block.block_type.value,
-                    'instructions': block.instructions,
+                    'block_number': block['block_number'],
+                    'block_type': block['block_type'],
+                    'instructions': block['instructions'],
                     'stimuli': [
-                        {
-                            'text': stimulus.text,
-                            'category': stimulus.category,
-                            'attribute': stimulus.attribute,
-                            'correct_response': stimulus.correct_response,
-                            'stimulus_type': stimulus.stimulus_type.value,
-                            'block_number': stimulus.block_number,
-                            'trial_number': stimulus.trial_number
-                        } for stimulus in block.stimuli
+                        dict(stimuli[stimulus_id], block_number=block['block_number'], trial_number=trial + 1)
+                        for trial, stimulus_id in enumerate(self.plan.block(index).tolist())
                     ],
-                    'is_practice': block.is_practice,
-                    'is_reverse': block.is_reverse
+                    'is_practice': block['is_practice'],
+                    'is_reverse': block['is_reverse']
                 }
                 serializable_blocks.append(block_dict)
             
@@ -165,7 +236,8 @@ class IATTestEngine:
                 'participant_id': participant_id,
                 'test_config': asdict(self.current_test),
                 'blocks': serializable_blocks,
-                'total_blocks': len(blocks),
+                'total_blocks': len(serializable_blocks),
+                'plan': self.plan.describe(),
                 'start_time': time.time()
             }
             
@@ -173,6 +245,53 @@ class IATTestEngine:
             self.logger.error(f"Error iniciando sesión IAT: {str(e)}")
             raise
     
+    def _compact_payload(self, session_id: str, participant_id: str,
+                         known_config_hash: Optional[str]) -> Dict[str, Any]:
+        """
+        Sesión con el plan como enteros
+        
+        ``stimuli`` es el diccionario de estímulos de la configuración (sin
+        intercambio de lados), indexado por id. Cada bloque lleva
+        ``stimulus_ids`` en orden de presentación y ``correct_sides``
+        (índices de ``sides``) ya contrabalanceados, que prevalecen sobre el
+        ``correct_response`` del diccionario. El trial ``i`` del bloque es
+        ``stimulus_ids[i - 1]``.
+        """
+        compiled = self.plan.compiled
+        sides = self.plan.correct_sides()
+        blocks = []
+        for index in self.plan.presentation_order():
+            block = compiled.blocks[index]
+            start, end = int(compiled.offsets[index]), int(compiled.offsets[index + 1])
+            blocks.append({
+                'block_number': block['block_number'],
+                'block_type': block['block_type'],
+                'instructions': block['instructions'],
+                'is_practice': block['is_practice'],
+                'is_reverse': block['is_reverse'],
+                'stimulus_ids': self.plan.stimulus_ids[start:end].tolist(),
+                'correct_sides': sides[start:end].tolist()
+            })
+        
+        # Bloques y estímulos ya van en el plan y el diccionario
+        test_config = {key: value for key, value in asdict(self.current_test).items()
+                       if key not in ('categories', 'attributes', 'blocks_config')}
+        stimuli_known = known_config_hash is not None and known_config_hash == compiled.config_hash
+        return {
+            'session_id': session_id,
+            'participant_id': participant_id,
+            'format': PAYLOAD_COMPACT,
+            'config_hash': compiled.config_hash,
+            'test_config': test_config,
+            'stimuli': None if stimuli_known else compiled.stimuli,
+            'sides': list(SIDE_LABELS),
+            'blocks': blocks,
+            'total_blocks': len(blocks),
+            'total_trials': compiled.n_trials,
+            'plan': self.plan.describe(),
+            'start_time': time.time()
+        }
+    
     def process_response(self, response_data: Dict[str, Any]) -> Dict[str, Any]:
         """Procesa una respuesta del participante"""
         try:
@@ -182,6 +301,20 @@ class IATTestEngine:
                 if field not in response_data:
                     raise ValueError(f"Campo requerido faltante en respuesta: {field}")
             
+            # Posición en el plan: duplicados y desorden se detectan por índice
+            position = self.plan.position(response_data['block_number'], response_data['trial_number']) if self.plan else None
+            previous = self._previous_response(position, response_data)
+            if previous is not None:
+                log_event(self.logger, logging.WARNING, 'duplicate_response', "Respuesta duplicada: Trial %s, Block %s",
+                          response_data['trial_number'], response_data['block_number'], sample_every=TRIAL_SAMPLE_EVERY,
+                          session_id=self.current_session)
+                return self._response_result(previous, duplicate=True, out_of_order=False, position=position)
+            
+            correct = response_data.get('correct')
+            if correct is None:
+                # Sin corrección del cliente, se evalúa contra el lado correcto del plan
+                correct = position is not None and response_data['response'] == self._expected_response(position)
+            
             # Crear objeto de respuesta
             response = IATResponse(
                 trial_number=response_data['trial_number'],
@@ -189,25 +322,21 @@ class IATTestEngine:
                 stimulus=response_data['stimulus'],
                 response=response_data['response'],
                 response_time=response_data['response_time'],
-                correct=response_data.get('correct', False),
+                correct=bool(correct),
                 timestamp=time.strftime('%Y-%m-%d %H:%M:%S')
             )
             
             # Agregar a la lista de respuestas
             self.responses.append(response)
+            out_of_order = self._advance_cursor(position, response_data, len(self.responses) - 1)
             
-            # Determinar si es la última respuesta
-            is_last_response = self._is_last_response(response)
-            
-            self.logger.info(f"Respuesta procesada: Trial {response.trial_number}, Block {response.block_number}")
+            # Evento por trial: muestreado para no pesar en la latencia de cada respuesta
+            log_event(self.logger, logging.INFO, 'process_response', "Respuesta procesada: Trial %s, Block %s",
+                      response.trial_number, response.block_number, sample_every=TRIAL_SAMPLE_EVERY,
+                      session_id=self.current_session, position=position)
             
-            return {
-                'response_id': len(self.responses),
-                'correct': response.correct,
-                'is_last_response': is_last_response,
-                'progress': self._calculate_progress(),
-                'next_stimulus': self._get_next_stimulus() if not is_last_response else None
-            }
+            return self._response_result(len(self.responses) - 1, duplicate=False,
+                                         out_of_order=out_of_order, position=position)
             
         except Exception as e:
             self.logger.error(f"Error procesando respuesta: {str(e)}")
@@ -219,28 +348,30 @@ class IATTestEngine:
             if not self.responses:
                 return {'error': 'No hay respuestas en la sesión'}
             
-            # Convertir respuestas a DataFrame para análisis
-            df = pd.DataFrame([asdict(r) for r in self.responses])
+            # Convertir respuestas a columnas NumPy para análisis (sin filtro de RT)
+            raw_responses = [asdict(r) for r in self.responses]
+            df = TrialFrame.from_responses(raw_responses, min_rt=-np.inf, max_rt=np.inf,
+                                           fields=SESSION_RESPONSE_FIELDS)
             
             # Calcular estadísticas básicas
             total_responses = len(df)
-            correct_responses = len(df[df['correct'] == True])
+            correct_responses = int(df['correct'].sum())
             accuracy = (correct_responses / total_responses) * 100 if total_responses > 0 else 0
             
             # Calcular tiempos de respuesta promedio
-            mean_rt = df['response_time'].mean()
-            median_rt = df['response_time'].median()
-            std_rt = df['response_time'].std()
+            mean_rt = df['rt'].mean()
+            median_rt = np.median(df['rt'])
+            std_rt = sample_std(df['rt'])
             
-            # Separar por bloques
+            # Separar por bloques (en orden de aparición)
             block_stats = {}
-            for block_num in df['block_number'].unique():
-                block_data = df[df['block_number'] == block_num]
+            for block_num in dict.fromkeys(df['block'].tolist()):
+                block_data = df.take(df['block'] == block_num)
                 block_stats[f'block_{block_num}'] = {
                     'count': len(block_data),
-                    'accuracy': (len(block_data[block_data['correct'] == True]) / len(block_data)) * 100,
-                    'mean_rt': float(block_data['response_time'].mean()),
-                    'std_rt': float(block_data['response_time'].std())
+                    'accuracy': (int(block_data['correct'].sum()) / len(block_data)) * 100,
+                    'mean_rt': float(block_data['rt'].mean()),
+                    'std_rt': sample_std(block_data['rt'])
                 }
             
             # Calcular D-Score básico
@@ -255,17 +386,104 @@ class IATTestEngine:
                 'std_response_time': float(std_rt),
                 'd_score': float(d_score),
                 'block_statistics': block_stats,
-                'raw_responses': [asdict(r) for r in self.responses],
+                'raw_responses': raw_responses,
                 'session_duration': time.time() - self.start_time if self.start_time else 0
             }
             
-            self.logger.info(f"Resultados calculados para sesión: {self.current_session}")
+            self.logger.info("Resultados calculados para sesión: %s", self.current_session)
             return results
             
         except Exception as e:
             self.logger.error(f"Error calculando resultados: {str(e)}")
             raise
     
+    def session_plan(self, seed: int) -> SessionPlan:
+        """Plan de estímulos de ``seed`` para la configuración actual (cacheado por proceso)"""
+        if not self.current_test:
+            raise ValueError("No hay configuración de prueba")
+        return PLAN_CACHE.get(self._plan_hash(), seed, self.compile_plan)
+    
+    def compile_plan(self) -> CompiledPlan:
+        """
+        Compila la configuración actual en diccionario de estímulos + plantilla
+        
+        Parte de ``_generate_test_blocks``: los bloques combinados se barajan por
+        semilla y el resto conserva su orden, como en la generación original.
+        """
+        blocks = []
+        for block in self._generate_test_blocks():
+            meta = {
+                'block_number': block.block_number,
+                'block_type': block.block_type.value,
+                'instructions': block.instructions,
+                'is_practice': block.is_practice,
+                'is_reverse': block.is_reverse
+            }
+            stimuli = [
+                {
+                    'text': stimulus.text,
+                    'category': stimulus.category,
+                    'attribute': stimulus.attribute,
+                    'correct_response': stimulus.correct_response,
+                    'stimulus_type': stimulus.stimulus_type.value
+                } for stimulus in block.stimuli
+            ]
+            shuffle = block.block_type in (IATBlockType.PRACTICE_COMBINED, IATBlockType.TEST_COMBINED)
+            blocks.append((meta, stimuli, shuffle))
+        return CompiledPlan.from_blocks(self._plan_hash(), blocks)
+    
+    def generate_plan_bank(self, n_plans: int, path: Optional[str] = None, seed: int = 0,
+                           max_run: Optional[int] = None, swap_sides: bool = True) -> Dict[str, Any]:
+        """
+        Pregenera ``n_plans`` planes contrabalanceados de la configuración actual
+        
+        Args:
+            path: Archivo de salida; por defecto ``IAT_PLAN_BANK_DIR/<config_hash>.iatplan``
+            max_run: Máximo de respuestas correctas seguidas del mismo lado en bloques barajados
+            swap_sides: Contrabalancear también izquierda/derecha
+        """
+        if not self.current_test:
+            raise ValueError("No hay configuración de prueba")
+        compiled = PLAN_CACHE.compiled(self._plan_hash(), self.compile_plan)
+        if path is None:
+            if not PLAN_BANK_DIR:
+                raise ValueError("Falta la ruta del banco de planes (path o IAT_PLAN_BANK_DIR)")
+            path = os.path.join(PLAN_BANK_DIR, compiled.config_hash + PLAN_BANK_SUFFIX)
+        
+        block_orders = [[compiled.block_index(number) for number in order] for order in COUNTERBALANCED_BLOCK_ORDERS]
+        started = time.time()
+        summary = generate_plan_bank(path, compiled, int(n_plans), block_orders,
+                                     swap_sides=swap_sides, seed=seed, max_run=max_run)
+        PLAN_BANKS.pop(compiled.config_hash, None)
+        summary['config_hash'] = compiled.config_hash
+        summary['generation_time'] = time.time() - started
+        self.logger.info("Banco de planes generado: %s planes en %s", summary['n_plans'], path)
+        return summary
+    
+    def _plan_bank(self) -> Optional[PlanBank]:
+        """Banco pregenerado de la configuración actual, abierto una vez por proceso"""
+        if not PLAN_BANK_DIR:
+            return None
+        plan_hash = self._plan_hash()
+        if plan_hash not in PLAN_BANKS:
+            path = os.path.join(PLAN_BANK_DIR, plan_hash + PLAN_BANK_SUFFIX)
+            try:
+                PLAN_BANKS[plan_hash] = PlanBank(path) if os.path.exists(path) else None
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Error abriendo banco de planes {path}: {str(e)}")
+                PLAN_BANKS[plan_hash] = None
+        return PLAN_BANKS[plan_hash]
+    
+    def _plan_hash(self) -> str:
+        # El plan depende solo de categorías y atributos; se memoriza por configuración
+        if getattr(self, '_hashed_config', None) is not self.current_test:
+            self._hashed_config = self.current_test
+            self._plan_hash_value = config_hash({
+                'categories': self.current_test.categories,
+                'attributes': self.current_test.attributes
+            })
+        return self._plan_hash_value
+    
     def _generate_test_blocks(self) -> List[IATBlock]:
         """Genera los bloques de la prueba IAT"""
         if not self.current_test:
@@ -444,51 +662,93 @@ class IATTestEngine:
             is_reverse=(compatibility == 'incompatible')
         )
     
+    def _reset_cursor(self) -> None:
+        self.cursor = 0
+        self.answered = 0
+        self._response_index = np.full(self.plan.n_trials, -1, dtype=np.int32) if self.plan else None
+        self._unplanned_index = {}
+    
+    def _previous_response(self, position: Optional[int], response_data: Dict[str, Any]) -> Optional[int]:
+        """Índice de la respuesta ya registrada para el mismo trial, si existe"""
+        if position is not None:
+            previous = int(self._response_index[position])
+            return previous if previous >= 0 else None
+        return self._unplanned_index.get((response_data['block_number'], response_data['trial_number']))
+    
+    def _advance_cursor(self, position: Optional[int], response_data: Dict[str, Any], response_index: int) -> bool:
+        """
+        Registra la respuesta en el índice y avanza el cursor; True si llegó fuera de orden
+        
+        El cursor salta las posiciones ya respondidas, de modo que el coste
+        total de avanzarlo en una sesión es lineal en el número de trials.
+        """
+        if position is None:
+            self._unplanned_index[(response_data['block_number'], response_data['trial_number'])] = response_index
+            return self.plan is not None
+        self._response_index[position] = response_index
+        self.answered += 1
+        out_of_order = position != self.cursor
+        if position >= self.cursor:
+            self.cursor = position + 1
+            while self.cursor < self.plan.n_trials and self._response_index[self.cursor] >= 0:
+                self.cursor += 1
+        return out_of_order
+    
+    def _expected_response(self, position: int) -> str:
+        _, _, stimulus_id = self.plan.trial_at(position)
+        return self.plan.stimulus_table()[stimulus_id]['correct_response']
+    
+    def _response_result(self, response_index: int, duplicate: bool, out_of_order: bool,
+                         position: Optional[int]) -> Dict[str, Any]:
+        is_last_response = self._is_last_response(self.responses[response_index])
+        return {
+            'response_id': response_index + 1,
+            'correct': self.responses[response_index].correct,
+            'is_last_response': is_last_response,
+            'progress': self._calculate_progress(),
+            'next_stimulus': self._get_next_stimulus() if not is_last_response else None,
+            'duplicate': duplicate,
+            'out_of_order': out_of_order,
+            'position': position
+        }
+    
     def _is_last_response(self, response: IATResponse) -> bool:
         """Determina si es la última respuesta de la prueba"""
-        # Lógica simple: si es el último bloque y último trial
+        if self.plan is not None:
+            # El cursor ha recorrido todo el plan
+            return self.cursor >= self.plan.n_trials
+        # Sin plan: si es el último bloque y último trial
         return response.block_number == 7 and response.trial_number >= 20
     
     def _calculate_progress(self) -> float:
         """Calcula el progreso de la prueba (0.0 a 1.0)"""
+        if self.plan is not None:
+            return self.answered / self.plan.n_trials if self.plan.n_trials else 1.0
         if not self.responses:
             return 0.0
         
-        # Estimación basada en respuestas recibidas
+        # Sin plan: estimación basada en respuestas recibidas
         total_expected = 7 * 20  # 7 bloques, ~20 trials cada uno
         return min(len(self.responses) / total_expected, 1.0)
     
     def _get_next_stimulus(self) -> Optional[Dict[str, Any]]:
-        """Obtiene el siguiente estímulo a mostrar"""
-        # Lógica simplificada - en implementación real sería más compleja
-        return None
+        """Obtiene el siguiente estímulo a mostrar (posición del cursor en el plan)"""
+        if self.plan is None or self.cursor >= self.plan.n_trials:
+            return None
+        block, trial_number, stimulus_id = self.plan.trial_at(self.cursor)
+        block_meta = self.plan.compiled.blocks[block]
+        return dict(
+            self.plan.stimulus_table()[stimulus_id],
+            block_number=block_meta['block_number'],
+            trial_number=trial_number,
+            position=self.cursor
+        )
     
-    def _calculate_d_score(self, df: pd.DataFrame) -> float:
-        """Calcula el D-Score usando la fórmula estándar"""
+    def _calculate_d_score(self, df: TrialFrame) -> float:
+        """Calcula el D-Score con el kernel compartido (limpieza IQR, Greenwald et al., 2003)"""
         try:
             # Separar bloques compatibles (3, 4) e incompatibles (6, 7)
-            compatible_blocks = df[df['block_number'].isin([3, 4])]
-            incompatible_blocks = df[df['block_number'].isin([6, 7])]
-            
-            if len(compatible_blocks) == 0 or len(incompatible_blocks) == 0:
-                return 0.0
-            
-            # Calcular tiempos de respuesta promedio
-            mean_rt_compatible = compatible_blocks['response_time'].mean()
-            mean_rt_incompatible = incompatible_blocks['response_time'].mean()
-            
-            # Calcular desviación estándar combinada
-            std_compatible = compatible_blocks['response_time'].std()
-            std_incompatible = incompatible_blocks['response_time'].std()
-            combined_std = (std_compatible + std_incompatible) / 2
-            
-            if combined_std == 0:
-                return 0.0
-            
-            # Fórmula D-Score: (RT_incompatible - RT_compatible) / std_combined
-            d_score = (mean_rt_incompatible - mean_rt_compatible) / combined_std
-            
-            return float(d_score)
+            return d_score_kernel(df.in_blocks([3, 4])['rt'], df.in_blocks([6, 7])['rt'])
             
         except Exception as e:
             self.logger.error(f"Error calculando D-Score: {str(e)}")
@@ -525,49 +785,299 @@ class IATTestEngine:
             {'type': 'reverse_test', 'trials': 40, 'is_practice': False}
         ]
 
+def _deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Tamaño aproximado en bytes de ``obj`` y de los objetos que contiene (sin loggers compartidos)"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, logging.Logger):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, (type, Enum)):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+@dataclass
+class IATLiveSession:
+    """Sesión en curso: un ``IATTestEngine`` ligado a una configuración compartida"""
+    session_id: str
+    participant_id: str
+    test_id: str
+    engine: IATTestEngine
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    last_access: float = field(default_factory=time.monotonic)
+    memory_bytes: int = 0
+
+class IATSessionManager:
+    """
+    Sesiones IAT concurrentes de un proceso, indexadas por session_id
+    
+    Las configuraciones se registran una vez por test_id y se comparten en solo
+    lectura entre sesiones. Cada sesión tiene su propio lock; el del gestor solo
+    protege el índice. Las sesiones se mantienen en orden LRU: las inactivas más
+    de ``idle_timeout`` se expulsan cada ``EVICTION_INTERVAL`` operaciones (o con
+    ``evict_idle``) y, por encima de ``max_sessions``, se expulsa la más antigua.
+    """
+    
+    def __init__(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.logger = logging.getLogger(f"{__name__}.IATSessionManager")
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.evicted = 0
+        self._configs: Dict[str, IATTestConfig] = {}
+        self._config_hashes: Dict[str, str] = {}
+        self._config_bytes: Dict[str, int] = {}
+        self._sessions: 'OrderedDict[str, IATLiveSession]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._operations = 0
+        # Solo valida y construye configuraciones; nunca tiene sesión propia
+        self._config_engine = IATTestEngine()
+    
+    def register_config(self, config_data: Dict[str, Any]) -> IATTestConfig:
+        """
+        Registra la configuración de ``test_id``, o devuelve la registrada si el contenido no cambió
+        
+        Si el contenido cambió (prueba editada), la nueva sustituye a la anterior
+        para las sesiones que se inicien después; las sesiones en curso conservan
+        la suya.
+        """
+        content_hash = config_hash(config_data)
+        test_id = config_data.get('test_id')
+        with self._lock:
+            config = self._configs.get(test_id)
+            if config is None or self._config_hashes.get(test_id) != content_hash:
+                replaced = config is not None
+                config = self._config_engine.create_test_config(config_data)
+                self._configs[config.test_id] = config
+                self._config_hashes[config.test_id] = content_hash
+                self._config_bytes[config.test_id] = _deep_sizeof(config)
+                if replaced:
+                    self.logger.info("Configuración IAT actualizada: %s", config.test_id)
+            return config
+    
+    def start_session(self, session_id: str, participant_id: str, test_id: Optional[str] = None,
+                      config_data: Optional[Dict[str, Any]] = None, seed: Optional[int] = None,
+                      plan_index: Optional[int] = None, payload_format: str = PAYLOAD_FULL,
+                      known_config_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Inicia (o reinicia) ``session_id`` con una configuración registrada o nueva"""
+        if config_data:
+            config = self.register_config(config_data)
+        else:
+            with self._lock:
+                config = self._configs.get(test_id)
+            if config is None:
+                raise ValueError(f"Configuración de prueba no registrada: {test_id}")
+        
+        engine = IATTestEngine()
+        engine.current_test = config
+        session = IATLiveSession(session_id=session_id, participant_id=participant_id,
+                                 test_id=config.test_id, engine=engine)
+        with session.lock:
+            payload = engine.start_session(session_id, participant_id, seed=seed, plan_index=plan_index,
+                                           payload_format=payload_format, known_config_hash=known_config_hash)
+            # Configuración y plan se comparten: no cuentan como memoria de la sesión
+            session.memory_bytes = _deep_sizeof(session, seen={id(config), id(engine.plan)})
+        
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                self.evicted += 1
+                self.logger.warning("Límite de sesiones alcanzado, expulsada: %s", evicted_id)
+        self._tick()
+        return payload
+    
+    def process_response(self, session_id: str, response_data: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._get(session_id)
+        with session.lock:
+            result = session.engine.process_response(response_data)
+            # Un duplicado devuelve la respuesta ya guardada sin añadir ninguna
+            if not result['duplicate']:
+                session.memory_bytes += _deep_sizeof(session.engine.responses[-1])
+        self._tick()
+        return result
+    
+    def get_results(self, session_id: str) -> Dict[str, Any]:
+        session = self._get(session_id)
+        with session.lock:
+            return session.engine.get_session_results()
+    
+    def end_session(self, session_id: str) -> Dict[str, Any]:
+        """Resultados finales de la sesión, que deja de ocupar memoria"""
+        session = self._get(session_id)
+        with session.lock:
+            results = session.engine.get_session_results()
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        return results
+    
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Expulsa las sesiones sin actividad en ``idle_timeout``; devuelve sus ids"""
+        cutoff = (time.monotonic() if now is None else now) - self.idle_timeout
+        evicted = []
+        with self._lock:
+            # Orden LRU: basta recorrer desde la menos reciente hasta la primera activa
+            while self._sessions:
+                session_id, session = next(iter(self._sessions.items()))
+                if session.last_access >= cutoff:
+                    break
+                self._sessions.popitem(last=False)
+                evicted.append(session_id)
+            self.evicted += len(evicted)
+        if evicted:
+            self.logger.info("Sesiones inactivas expulsadas: %s", len(evicted))
+        return evicted
+    
+    def stats(self) -> Dict[str, Any]:
+        """Sesiones, configuraciones y memoria estimada (bytes)"""
+        with self._lock:
+            session_bytes = sum(session.memory_bytes for session in self._sessions.values())
+            config_bytes = sum(self._config_bytes.values())
+            return {
+                'sessions': len(self._sessions),
+                'configs': len(self._configs),
+                'memory_bytes': session_bytes + config_bytes,
+                'session_memory_bytes': session_bytes,
+                'config_memory_bytes': config_bytes,
+                'evicted': self.evicted,
+                'idle_timeout': self.idle_timeout,
+                'max_sessions': self.max_sessions
+            }
+    
+    def _get(self, session_id: Optional[str]) -> IATLiveSession:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise ValueError(f"Sesión no encontrada: {session_id}")
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+    
+    def _tick(self) -> None:
+        self._operations += 1
+        if self._operations % EVICTION_INTERVAL == 0:
+            self.evict_idle()
+
+def _generate_plan_bank(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Acción generate_plan_bank: independiente de cualquier sesión en curso"""
+    engine = IATTestEngine()
+    engine.create_test_config(input_data.get('config') or input_data.get('test_config') or {})
+    max_run = input_data.get('max_run')
+    summary = engine.generate_plan_bank(
+        int(input_data.get('n_plans', 1000)),
+        path=input_data.get('path'),
+        seed=int(input_data.get('seed', 0)),
+        max_run=int(max_run) if max_run is not None else None,
+        swap_sides=bool(input_data.get('swap_sides', True))
+    )
+    return {'success': True, 'plan_bank': summary}
+
+def _handle_managed_request(input_data: Dict[str, Any], sessions: IATSessionManager) -> Dict[str, Any]:
+    """Acciones sobre sesiones del gestor, identificadas por ``session_id``"""
+    action = input_data.get('action')
+    session_id = input_data.get('session_id')
+    
+    if action == 'create_config':
+        config = sessions.register_config(input_data.get('config', {}))
+        return {'success': True, 'config': asdict(config)}
+    if action == 'start_session':
+        session_data = sessions.start_session(
+            session_id or '',
+            input_data.get('participant_id', ''),
+            test_id=input_data.get('test_id'),
+            config_data=input_data.get('test_config'),
+            seed=input_data.get('seed'),
+            plan_index=input_data.get('plan_index'),
+            payload_format=input_data.get('payload_format', PAYLOAD_FULL),
+            known_config_hash=input_data.get('known_config_hash')
+        )
+        return {'success': True, 'session': session_data}
+    if action == 'process_response':
+        return {'success': True, 'result': sessions.process_response(session_id, input_data.get('response', {}))}
+    if action == 'get_results':
+        return {'success': True, 'results': sessions.get_results(session_id)}
+    if action == 'end_session':
+        return {'success': True, 'results': sessions.end_session(session_id)}
+    if action == 'session_stats':
+        return {'success': True, 'stats': sessions.stats()}
+    if action == 'generate_plan_bank':
+        return _generate_plan_bank(input_data)
+    return {'success': False, 'error': f'Acción no reconocida: {action}'}
+
+def handle_request(input_data: Dict[str, Any], engine: Optional[IATTestEngine] = None,
+                   sessions: Optional[IATSessionManager] = None) -> Dict[str, Any]:
+    """
+    Atiende una acción ya decodificada; los errores se propagan al llamador
+    
+    Con un ``engine`` persistente, la sesión sigue viva entre peticiones del
+    mismo proceso (start_session -> process_response -> get_results). Con
+    ``sessions``, cada petición indica su ``session_id`` y un mismo proceso
+    atiende muchas sesiones a la vez.
+    """
+    if sessions is not None:
+        return _handle_managed_request(input_data, sessions)
+    
+    action = input_data.get('action')
+    engine = engine or IATTestEngine()
+    
+    if action == 'create_config':
+        config = engine.create_test_config(input_data.get('config', {}))
+        result = {'success': True, 'config': asdict(config)}
+        
+    elif action == 'start_session':
+        # Crear configuración si no existe
+        if not engine.current_test:
+            config = engine.create_test_config(input_data.get('test_config', {}))
+        
+        session_data = engine.start_session(
+            input_data.get('session_id', ''),
+            input_data.get('participant_id', ''),
+            seed=input_data.get('seed'),
+            plan_index=input_data.get('plan_index'),
+            payload_format=input_data.get('payload_format', PAYLOAD_FULL),
+            known_config_hash=input_data.get('known_config_hash')
+        )
+        result = {'success': True, 'session': session_data}
+        
+    elif action == 'process_response':
+        response_result = engine.process_response(input_data.get('response', {}))
+        result = {'success': True, 'result': response_result}
+        
+    elif action == 'get_results':
+        results = engine.get_session_results()
+        result = {'success': True, 'results': results}
+        
+    elif action == 'generate_plan_bank':
+        result = _generate_plan_bank(input_data)
+        
+    else:
+        result = {'success': False, 'error': f'Acción no reconocida: {action}'}
+    
+    return result
+
 def main():
     """Función principal para comunicación con Node.js"""
+    RUNTIME.start()
     try:
         # Leer datos desde stdin
         input_data = json.loads(sys.stdin.read())
-        action = input_data.get('action')
-        
-        engine = IATTestEngine()
-        
-        if action == 'create_config':
-            config = engine.create_test_config(input_data.get('config', {}))
-            result = {'success': True, 'config': asdict(config)}
-            
-        elif action == 'start_session':
-            # Crear configuración si no existe
-            if not engine.current_test:
-                config = engine.create_test_config(input_data.get('test_config', {}))
-            
-            session_data = engine.start_session(
-                input_data.get('session_id', ''),
-                input_data.get('participant_id', '')
-            )
-            result = {'success': True, 'session': session_data}
-            
-        elif action == 'process_response':
-            response_result = engine.process_response(input_data.get('response', {}))
-            result = {'success': True, 'result': response_result}
-            
-        elif action == 'get_results':
-            results = engine.get_session_results()
-            result = {'success': True, 'results': results}
-            
-        else:
-            result = {'success': False, 'error': f'Acción no reconocida: {action}'}
+        with request_logging(input_data.get('log_level')):
+            result = handle_request(input_data)
         
         # Enviar resultado a stdout
+        result['runtime'] = RUNTIME.finish()
         print(json.dumps(result, ensure_ascii=False))
         
     except Exception as e:
         error_result = {
             'success': False,
             'error': f'Error en IAT Test Engine: {str(e)}',
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'runtime': RUNTIME.finish()
         }
         print(json.dumps(error_result, ensure_ascii=False))
 
@@ -0,0 +1,93 @@
+"""
+IAT Core - Componentes compartidos por los motores Python IAT
+Los scripts ejecutables de ``src/iat`` importan este paquete directamente.
+Los nombres públicos se cargan al primer acceso (PEP 562): ``from iatcore.frame
+import ...`` no arrastra sqlite3, el servidor ni el resto de submódulos
+"""
+
+import importlib
+from typing import Any, List
+
+# Nombre público -> submódulo que lo define
+_EXPORTS = {
+    'BlockSums': 'aggregates',
+    'FixedHistogram': 'aggregates',
+    'RunningMoments': 'aggregates',
+    'StudyAggregate': 'aggregates',
+    'StudyAggregateStore': 'aggregates',
+    'IATStudyBootstrap': 'bootstrap',
+    'StudyBootstrapResult': 'bootstrap',
+    'StudyTrialData': 'bootstrap',
+    'session_bootstrap_d_scores': 'bootstrap',
+    'AggregateCubeStore': 'cube',
+    'CubeCell': 'cube',
+    'session_cube_cells': 'cube',
+    'EZDiffusionResult': 'diffusion',
+    'ez_diffusion': 'diffusion',
+    'd_score_kernel': 'dscore',
+    'grouped_d_scores': 'dscore',
+    'ExGaussianFit': 'exgauss',
+    'ex_gaussian_outlier_mask': 'exgauss',
+    'fit_ex_gaussian': 'exgauss',
+    'TrialFrame': 'frame',
+    'group_means': 'frame',
+    'sample_std': 'frame',
+    'value_counts': 'frame',
+    'ItemAnalysisResult': 'items',
+    'ItemStatistics': 'items',
+    'StudyItemData': 'items',
+    'study_item_analysis': 'items',
+    'BlockOutliers': 'outliers',
+    'OutlierEngine': 'outliers',
+    'OutlierMethod': 'outliers',
+    'OutlierResult': 'outliers',
+    'SortedRT': 'outliers',
+    'study_outlier_sensitivity': 'outliers',
+    'DEFAULT_OUTLIER_METHODS': 'outliers',
+    'ParticipantIndex': 'participant_index',
+    'TestRetestResult': 'participant_index',
+    'AnalysisPipeline': 'pipeline',
+    'PipelineNode': 'pipeline',
+    'PipelineRun': 'pipeline',
+    'ScreeningConfig': 'screening',
+    'ScreeningResult': 'screening',
+    'screen_responses': 'screening',
+    'screen_trials': 'screening',
+    'SCREEN_EXCLUDE': 'screening',
+    'SCREEN_FLAG': 'screening',
+    'SCREEN_PASS': 'screening',
+    'SplitHalfResult': 'reliability',
+    'session_split_half_reliability': 'reliability',
+    'spearman_brown': 'reliability',
+    'study_split_half_reliability': 'reliability',
+    'KLLSketch': 'sketches',
+    'merge_sketches': 'sketches',
+    'SensitivityGrid': 'sensitivity',
+    'session_sensitivity': 'sensitivity',
+    'study_sensitivity': 'sensitivity',
+    'TemporalBatch': 'temporal',
+    'linear_slopes': 'temporal',
+    'mean_changepoints': 'temporal',
+    'rolling_series': 'temporal',
+    'temporal_curves': 'temporal',
+    'SignificanceResult': 'significance',
+    'batch_significance': 'significance',
+    'permutation_test': 'significance',
+    'permutation_test_batch': 'significance',
+    'session_significance': 'significance',
+    'welch_test': 'significance',
+    'welch_test_batch': 'significance',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,359 @@
+"""
+IAT Study Aggregates - Agregados materializados por estudio, combinables
+Se actualizan en O(1) al completar cada sesión y se leen en tiempo constante
+"""
+
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass, field
+import numpy as np
+
+from .sketches import KLLSketch, merge_sketches
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RunningMoments:
+    """Momentos de Welford combinables (Chan et al.)"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+
+    def add(self, value: float) -> None:
+        if value is None or not math.isfinite(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: 'RunningMoments') -> None:
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'min': self.minimum if self.count else None,
+            'max': self.maximum if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RunningMoments':
+        return cls(
+            count=int(data.get('count', 0)),
+            mean=float(data.get('mean', 0.0)),
+            m2=float(data.get('m2', 0.0)),
+            minimum=math.inf if data.get('min') is None else float(data['min']),
+            maximum=-math.inf if data.get('max') is None else float(data['max']),
+        )
+
+@dataclass
+class FixedHistogram:
+    """Histograma de bordes fijos; combinable sumando conteos"""
+    low: float
+    high: float
+    bins: int
+    counts: List[int] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * (self.bins + 2)  # + desbordes inferior y superior
+
+    def add(self, value: float) -> None:
+        if value is None or not math.isfinite(value):
+            return
+        if value < self.low:
+            index = 0
+        elif value >= self.high:
+            index = self.bins + 1
+        else:
+            index = 1 + int((value - self.low) / (self.high - self.low) * self.bins)
+        self.counts[index] += 1
+
+    def merge(self, other: 'FixedHistogram') -> None:
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("Histogramas con bordes distintos no son combinables")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def edges(self) -> List[float]:
+        return np.linspace(self.low, self.high, self.bins + 1).tolist()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'low': self.low, 'high': self.high, 'bins': self.bins, 'counts': list(self.counts)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FixedHistogram':
+        return cls(low=float(data['low']), high=float(data['high']), bins=int(data['bins']),
+                   counts=[int(c) for c in data['counts']])
+
+def _d_score_histogram() -> FixedHistogram:
+    return FixedHistogram(low=-2.0, high=2.0, bins=40)
+
+def _accuracy_histogram() -> FixedHistogram:
+    return FixedHistogram(low=0.0, high=1.0000001, bins=20)
+
+def _mean_rt_histogram() -> FixedHistogram:
+    return FixedHistogram(low=0.0, high=3000.0, bins=30)
+
+@dataclass
+class BlockSums:
+    """Sumas suficientes por bloque"""
+    trials: int = 0
+    rt_sum: float = 0.0
+    rt_sum_sq: float = 0.0
+    errors: int = 0
+
+    def merge(self, other: 'BlockSums') -> None:
+        self.trials += other.trials
+        self.rt_sum += other.rt_sum
+        self.rt_sum_sq += other.rt_sum_sq
+        self.errors += other.errors
+
+    def summary(self) -> Dict[str, float]:
+        if self.trials == 0:
+            return {'trials': 0, 'mean_rt': 0.0, 'std_rt': 0.0, 'error_rate': 0.0}
+        mean = self.rt_sum / self.trials
+        variance = (self.rt_sum_sq - self.trials * mean * mean) / (self.trials - 1) if self.trials > 1 else 0.0
+        return {
+            'trials': self.trials,
+            'mean_rt': mean,
+            'std_rt': math.sqrt(max(variance, 0.0)),
+            'error_rate': self.errors / self.trials,
+        }
+
+@dataclass
+class StudyAggregate:
+    """Agregado combinable de todas las sesiones de un estudio"""
+    sessions: int = 0
+    excluded_sessions: int = 0
+    flagged_sessions: int = 0
+    d_score: RunningMoments = field(default_factory=RunningMoments)
+    accuracy: RunningMoments = field(default_factory=RunningMoments)
+    mean_rt: RunningMoments = field(default_factory=RunningMoments)
+    blocks: Dict[str, BlockSums] = field(default_factory=dict)
+    d_score_histogram: FixedHistogram = field(default_factory=_d_score_histogram)
+    accuracy_histogram: FixedHistogram = field(default_factory=_accuracy_histogram)
+    mean_rt_histogram: FixedHistogram = field(default_factory=_mean_rt_histogram)
+    d_score_sketch: KLLSketch = field(default_factory=KLLSketch)
+    rt_sketches: Dict[str, KLLSketch] = field(default_factory=dict)
+
+    def add_session(self, d_score: float, accuracy: float, mean_rt: float,
+                    block_summaries: Dict[str, Dict[str, float]], screening_status: str = 'pass',
+                    rt_sketches: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """
+        Incorpora una sesión terminada en O(1)
+
+        Las sesiones excluidas por el pre-filtro solo se cuentan; no entran
+        en los momentos ni en los histogramas.
+        """
+        self.sessions += 1
+        if screening_status == 'exclude':
+            self.excluded_sessions += 1
+            return
+        if screening_status == 'flag':
+            self.flagged_sessions += 1
+
+        self.d_score.add(d_score)
+        self.accuracy.add(accuracy)
+        self.mean_rt.add(mean_rt)
+        self.d_score_histogram.add(d_score)
+        self.accuracy_histogram.add(accuracy)
+        self.mean_rt_histogram.add(mean_rt)
+        self.d_score_sketch.update([d_score])
+
+        for block, sketch in (rt_sketches or {}).items():
+            self.rt_sketches.setdefault(str(block), KLLSketch()).merge(KLLSketch.from_dict(sketch))
+
+        for block, sums in block_summaries.items():
+            self.blocks.setdefault(str(block), BlockSums()).merge(BlockSums(
+                trials=int(sums.get('trials', 0)),
+                rt_sum=float(sums.get('rt_sum', 0.0)),
+                rt_sum_sq=float(sums.get('rt_sum_sq', 0.0)),
+                errors=int(sums.get('errors', 0)),
+            ))
+
+    def merge(self, other: 'StudyAggregate') -> None:
+        """Combina otro agregado (otro worker u otra partición)"""
+        self.sessions += other.sessions
+        self.excluded_sessions += other.excluded_sessions
+        self.flagged_sessions += other.flagged_sessions
+        self.d_score.merge(other.d_score)
+        self.accuracy.merge(other.accuracy)
+        self.mean_rt.merge(other.mean_rt)
+        self.d_score_histogram.merge(other.d_score_histogram)
+        self.accuracy_histogram.merge(other.accuracy_histogram)
+        self.mean_rt_histogram.merge(other.mean_rt_histogram)
+        self.d_score_sketch.merge(other.d_score_sketch)
+        for block, sums in other.blocks.items():
+            self.blocks.setdefault(block, BlockSums()).merge(sums)
+        for block, sketch in other.rt_sketches.items():
+            self.rt_sketches.setdefault(block, KLLSketch()).merge(sketch)
+
+    def summary(self) -> Dict[str, Any]:
+        """Vista para dashboards"""
+        def moments(m: RunningMoments) -> Dict[str, Any]:
+            return {'count': m.count, 'mean': m.mean, 'std': m.std,
+                    'min': m.minimum if m.count else None, 'max': m.maximum if m.count else None}
+
+        return {
+            'sessions': self.sessions,
+            'excluded_sessions': self.excluded_sessions,
+            'flagged_sessions': self.flagged_sessions,
+            'd_score': moments(self.d_score),
+            'accuracy': moments(self.accuracy),
+            'mean_rt': moments(self.mean_rt),
+            'blocks': {block: sums.summary() for block, sums in sorted(self.blocks.items())},
+            'histograms': {
+                'd_score': self.d_score_histogram.to_dict(),
+                'accuracy': self.accuracy_histogram.to_dict(),
+                'mean_rt': self.mean_rt_histogram.to_dict(),
+            },
+            'quantiles': {
+                'd_score': self.d_score_sketch.summary(),
+                'rt': {
+                    **{block: sketch.summary() for block, sketch in sorted(self.rt_sketches.items())},
+                    'all': merge_sketches(self.rt_sketches.values()).summary(),
+                },
+            },
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'sessions': self.sessions,
+            'excluded_sessions': self.excluded_sessions,
+            'flagged_sessions': self.flagged_sessions,
+            'd_score': self.d_score.to_dict(),
+            'accuracy': self.accuracy.to_dict(),
+            'mean_rt': self.mean_rt.to_dict(),
+            'blocks': {block: vars(sums) for block, sums in self.blocks.items()},
+            'd_score_histogram': self.d_score_histogram.to_dict(),
+            'accuracy_histogram': self.accuracy_histogram.to_dict(),
+            'mean_rt_histogram': self.mean_rt_histogram.to_dict(),
+            'd_score_sketch': self.d_score_sketch.to_dict(),
+            'rt_sketches': {block: sketch.to_dict() for block, sketch in self.rt_sketches.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StudyAggregate':
+        return cls(
+            sessions=int(data.get('sessions', 0)),
+            excluded_sessions=int(data.get('excluded_sessions', 0)),
+            flagged_sessions=int(data.get('flagged_sessions', 0)),
+            d_score=RunningMoments.from_dict(data.get('d_score', {})),
+            accuracy=RunningMoments.from_dict(data.get('accuracy', {})),
+            mean_rt=RunningMoments.from_dict(data.get('mean_rt', {})),
+            blocks={block: BlockSums(**sums) for block, sums in data.get('blocks', {}).items()},
+            d_score_histogram=FixedHistogram.from_dict(data['d_score_histogram'])
+            if 'd_score_histogram' in data else _d_score_histogram(),
+            accuracy_histogram=FixedHistogram.from_dict(data['accuracy_histogram'])
+            if 'accuracy_histogram' in data else _accuracy_histogram(),
+            mean_rt_histogram=FixedHistogram.from_dict(data['mean_rt_histogram'])
+            if 'mean_rt_histogram' in data else _mean_rt_histogram(),
+            d_score_sketch=KLLSketch.from_dict(data['d_score_sketch'])
+            if 'd_score_sketch' in data else KLLSketch(),
+            rt_sketches={block: KLLSketch.from_dict(sketch) for block, sketch in data.get('rt_sketches', {}).items()},
+        )
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS study_aggregates (
+    study_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregated_sessions (
+    study_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (study_id, session_id)
+);
+"""
+
+class StudyAggregateStore:
+    """Almacén SQLite local de agregados por estudio (una fila por estudio)"""
+
+    def __init__(self, path: str = ':memory:'):
+        self.logger = logging.getLogger(f"{__name__}.StudyAggregateStore")
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def record_session(self, study_id: str, session_id: str, d_score: float, accuracy: float,
+                       mean_rt: float, block_summaries: Dict[str, Dict[str, float]],
+                       screening_status: str = 'pass',
+                       rt_sketches: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
+        """
+        Incorpora una sesión terminada al agregado del estudio
+
+        Returns:
+            bool: False si la sesión ya estaba agregada (reanálisis)
+        """
+        with self._lock, self._connection:
+            inserted = self._connection.execute(
+                "INSERT OR IGNORE INTO aggregated_sessions (study_id, session_id) VALUES (?, ?)",
+                (study_id, session_id)
+            ).rowcount
+            if not inserted:
+                return False
+
+            aggregate = self._load(study_id)
+            aggregate.add_session(d_score, accuracy, mean_rt, block_summaries, screening_status, rt_sketches)
+            self._save(study_id, aggregate)
+            return True
+
+    def merge(self, study_id: str, other: StudyAggregate) -> None:
+        """Combina un agregado parcial calculado fuera (otro worker)"""
+        with self._lock, self._connection:
+            aggregate = self._load(study_id)
+            aggregate.merge(other)
+            self._save(study_id, aggregate)
+
+    def get(self, study_id: str) -> StudyAggregate:
+        with self._lock:
+            return self._load(study_id)
+
+    def _load(self, study_id: str) -> StudyAggregate:
+        row = self._connection.execute(
+            "SELECT payload FROM study_aggregates WHERE study_id = ?", (study_id,)
+        ).fetchone()
+        return StudyAggregate.from_dict(json.loads(row[0])) if row else StudyAggregate()
+
+    def _save(self, study_id: str, aggregate: StudyAggregate) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO study_aggregates (study_id, payload, updated_at) VALUES (?, ?, ?)",
+            (study_id, json.dumps(aggregate.to_dict()), time.time())
+        )
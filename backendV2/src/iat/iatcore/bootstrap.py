@@ -0,0 +1,386 @@
+"""
+IAT Study Bootstrap - Bootstrap en dos etapas (participantes y trials) a nivel de estudio
+Los arrays de trials se publican en ``multiprocessing.shared_memory`` y las réplicas
+se reparten entre procesos sin serializar los datos
+"""
+
+import os
+import time
+import logging
+import warnings
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+import numpy as np
+
+from .dscore import grouped_d_scores, grouped_moments, IQR_MULTIPLIER
+from .outliers import DEFAULT_OUTLIER_METHOD, OutlierMethod, grouped_outlier_mask
+from .screening import extract_trial_arrays
+
+logger = logging.getLogger(__name__)
+
+COMPATIBLE_BLOCKS = (3, 4)
+INCOMPATIBLE_BLOCKS = (6, 7)
+# Tamaño fijo de lote: las semillas dependen del lote, no del número de workers
+REPLICATES_PER_CHUNK = 250
+
+@dataclass
+class StudyTrialData:
+    """Trials de un estudio empaquetados por participante (RT ordenados dentro de cada uno)"""
+    compatible_rt: np.ndarray
+    compatible_offsets: np.ndarray    # n_participants + 1
+    incompatible_rt: np.ndarray
+    incompatible_offsets: np.ndarray  # n_participants + 1
+    segments: np.ndarray              # código de segmento por participante
+    segment_labels: List[str] = field(default_factory=list)
+    participant_ids: List[str] = field(default_factory=list)
+
+    @property
+    def n_participants(self) -> int:
+        return int(self.segments.size)
+
+    @classmethod
+    def from_sessions(cls, sessions: Sequence[Dict[str, Any]],
+                      segments: Optional[Sequence[Any]] = None,
+                      max_rt: float = 10000.0) -> 'StudyTrialData':
+        """
+        Empaqueta sesiones crudas (``responses`` como en ``analyze_session``)
+
+        Args:
+            sessions: Lista de sesiones IAT
+            segments: Segmento de cada sesión (opcional, por ejemplo grupo demográfico)
+            max_rt: Mismo filtro ``0 < rt < max_rt`` de ``_prepare_dataframe``
+        """
+        compatible_parts: List[np.ndarray] = []
+        incompatible_parts: List[np.ndarray] = []
+        participant_ids: List[str] = []
+
+        for index, session in enumerate(sessions):
+            arrays = extract_trial_arrays(session.get('responses', []))
+            rt, block = arrays['rt'], arrays['block']
+            valid = (rt > 0) & (rt < max_rt)
+            compatible_parts.append(np.sort(rt[valid & np.isin(block, COMPATIBLE_BLOCKS)]))
+            incompatible_parts.append(np.sort(rt[valid & np.isin(block, INCOMPATIBLE_BLOCKS)]))
+            participant_ids.append(str(session.get('participantId', session.get('sessionId', index))))
+
+        if segments is None:
+            segment_labels = ['all']
+            segment_codes = np.zeros(len(sessions), dtype=np.int32)
+        else:
+            if len(segments) != len(sessions):
+                raise ValueError("segments debe tener un valor por sesión")
+            segment_labels = sorted({str(s) for s in segments})
+            lookup = {label: code for code, label in enumerate(segment_labels)}
+            segment_codes = np.array([lookup[str(s)] for s in segments], dtype=np.int32)
+
+        return cls(
+            compatible_rt=_concat(compatible_parts),
+            compatible_offsets=_offsets(compatible_parts),
+            incompatible_rt=_concat(incompatible_parts),
+            incompatible_offsets=_offsets(incompatible_parts),
+            segments=segment_codes,
+            segment_labels=segment_labels,
+            participant_ids=participant_ids
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'compatible_rt': self.compatible_rt,
+            'compatible_offsets': self.compatible_offsets,
+            'incompatible_rt': self.incompatible_rt,
+            'incompatible_offsets': self.incompatible_offsets,
+            'segments': self.segments,
+        }
+
+@dataclass
+class StudyBootstrapResult:
+    """Intervalos de confianza a nivel de estudio"""
+    mean_d_score: float
+    confidence_interval: Tuple[float, float]
+    segment_means: Dict[str, float]
+    segment_confidence_intervals: Dict[str, Tuple[float, float]]
+    segment_difference: Optional[float]
+    segment_difference_confidence_interval: Optional[Tuple[float, float]]
+    n_participants: int
+    n_replicates: int
+    seed: int
+    workers: int
+    processing_time: float
+
+def _concat(parts: List[np.ndarray]) -> np.ndarray:
+    return np.concatenate(parts).astype(np.float64) if parts else np.zeros(0, dtype=np.float64)
+
+def _offsets(parts: List[np.ndarray]) -> np.ndarray:
+    return np.concatenate(([0], np.cumsum([p.size for p in parts]))).astype(np.int64)
+
+class SharedTrialArrays:
+    """Publica arrays NumPy en memoria compartida; los workers los adjuntan por nombre"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        from multiprocessing import shared_memory
+        self._blocks: List['shared_memory.SharedMemory'] = []
+        self.descriptor: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.descriptor[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> 'SharedTrialArrays':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# Estado por proceso worker (adjuntado una sola vez en el initializer)
+_worker_blocks: List[Any] = []
+_worker_arrays: Dict[str, np.ndarray] = {}
+
+def _attach_shared_arrays(descriptor: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> None:
+    from multiprocessing import shared_memory
+    for name, (block_name, shape, dtype) in descriptor.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        _worker_arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def _run_chunk_in_worker(task: Tuple[int, int, int, float]) -> np.ndarray:
+    chunk_index, n_replicates, seed, iqr_multiplier = task
+    return run_replicate_chunk(_worker_arrays, chunk_index, n_replicates, seed, iqr_multiplier)
+
+def run_replicate_chunk(arrays: Dict[str, np.ndarray], chunk_index: int, n_replicates: int,
+                        seed: int, iqr_multiplier: float = IQR_MULTIPLIER) -> np.ndarray:
+    """
+    Ejecuta un lote de réplicas del bootstrap en dos etapas
+
+    Cada réplica remuestrea participantes dentro de su segmento y luego los
+    trials de cada participante. La semilla depende solo de (seed, chunk_index).
+
+    Returns:
+        np.ndarray: (n_replicates, n_segments + 1) con el D-Score medio por
+                    segmento y, en la última columna, el medio global
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+    segments = arrays['segments']
+    n_segments = int(segments.max()) + 1 if segments.size else 0
+    members = [np.flatnonzero(segments == s) for s in range(n_segments)]
+
+    results = np.full((n_replicates, n_segments + 1), np.nan)
+    for replicate in range(n_replicates):
+        # Etapa 1: participantes con reemplazo, estratificado por segmento
+        sampled = np.concatenate([rng.choice(m, size=m.size, replace=True) for m in members if m.size])
+        sampled_segments = segments[sampled]
+
+        # Etapa 2: trials con reemplazo dentro de cada participante
+        d_scores = _resampled_d_scores(arrays, sampled, rng, iqr_multiplier)
+
+        valid = np.isfinite(d_scores)
+        sums = np.bincount(sampled_segments[valid], weights=d_scores[valid], minlength=n_segments)
+        counts = np.bincount(sampled_segments[valid], minlength=n_segments)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results[replicate, :n_segments] = sums / counts
+        if valid.any():
+            results[replicate, n_segments] = d_scores[valid].mean()
+
+    return results
+
+def _resampled_d_scores(arrays: Dict[str, np.ndarray], sampled: np.ndarray,
+                        rng: np.random.Generator, iqr_multiplier: float) -> np.ndarray:
+    n_groups = sampled.size
+    compatible = resample_sorted(arrays['compatible_rt'], arrays['compatible_offsets'], sampled, rng)
+    incompatible = resample_sorted(arrays['incompatible_rt'], arrays['incompatible_offsets'], sampled, rng)
+    return grouped_d_scores(compatible[0], compatible[1], incompatible[0], incompatible[1],
+                            n_groups, iqr_multiplier)
+
+def resample_session(compatible_rt: np.ndarray, incompatible_rt: np.ndarray, n_replicates: int,
+                     rng: np.random.Generator) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Réplicas bootstrap de los trials crudos de una sesión, una réplica por grupo
+
+    Devuelve, para compatibles e incompatibles, los RT remuestreados (ordenados
+    dentro de cada réplica) y los offsets de las réplicas. La limpieza se aplica
+    después, dentro de cada réplica: así la usan el IC del motor y la rejilla de
+    sensibilidad, que con la misma semilla dan el mismo IC en el punto que
+    coincide con la limpieza del motor.
+    """
+    replicates = np.zeros(n_replicates, dtype=np.int64)
+    resampled = []
+    for rt in (compatible_rt, incompatible_rt):
+        rt = np.sort(np.asarray(rt, dtype=np.float64))
+        values, groups = resample_sorted(rt, np.array([0, rt.size]), replicates, rng)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(groups, minlength=n_replicates))))
+        resampled.append((values, offsets))
+    return resampled
+
+def session_bootstrap_d_scores(compatible_rt: np.ndarray, incompatible_rt: np.ndarray,
+                               n_replicates: int = 1000, rng: Optional[np.random.Generator] = None,
+                               method: OutlierMethod = DEFAULT_OUTLIER_METHOD) -> np.ndarray:
+    """
+    Réplicas bootstrap del D-Score de una sesión, todas en un solo lote
+
+    Remuestrea los RT sin limpiar y aplica ``method`` dentro de cada réplica,
+    de modo que el IC incluye la variabilidad de la exclusión. Réplicas sin
+    datos suficientes devuelven NaN.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    moments = []
+    for values, offsets in resample_session(compatible_rt, incompatible_rt, n_replicates, rng):
+        if values.size == 0:
+            moments.append((np.full(n_replicates, np.nan), np.full(n_replicates, np.nan)))
+            continue
+        keep = grouped_outlier_mask(values, offsets, method)
+        group_ids = np.repeat(np.arange(n_replicates), np.diff(offsets))
+        moments.append(grouped_moments(values, group_ids, n_replicates, keep)[:2])
+
+    (mean_c, std_c), (mean_i, std_i) = moments
+    combined_std = (std_c + std_i) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_scores = (mean_i - mean_c) / combined_std
+    d_scores[combined_std == 0] = 0.0
+    return d_scores
+
+def percentile_interval(replicates: np.ndarray, axis: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """IC percentil del 95% ignorando réplicas NaN; NaN donde no queda ninguna"""
+    with warnings.catch_warnings():
+        # Celdas sin réplicas válidas: NaN en lugar de aviso
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lower, upper = np.nanpercentile(replicates, [2.5, 97.5], axis=axis)
+    return lower, upper
+
+def resample_sorted(values: np.ndarray, offsets: np.ndarray, sampled: np.ndarray,
+                    rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Remuestrea los trials de cada participante conservando el orden por grupo
+
+    Los RT ya están ordenados por participante, así que ordenar la clave
+    entera (grupo, índice local) deja los valores ordenados dentro de cada grupo.
+    """
+    starts = offsets[sampled]
+    lengths = offsets[sampled + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+
+    group_ids = np.repeat(np.arange(sampled.size, dtype=np.int64), lengths)
+    local = np.floor(rng.random(total) * lengths[group_ids]).astype(np.int64)
+    width = int(lengths.max())
+    keys = np.sort(group_ids * width + local)
+    group_ids = keys // width
+    local = keys - group_ids * width
+    return values[starts[group_ids] + local], group_ids
+
+class IATStudyBootstrap:
+    """Bootstrap en dos etapas del D-Score medio de un estudio"""
+
+    def __init__(self, n_replicates: int = 10000, seed: int = 0, workers: Optional[int] = None,
+                 confidence: float = 0.95, iqr_multiplier: float = IQR_MULTIPLIER):
+        self.logger = logging.getLogger(f"{__name__}.IATStudyBootstrap")
+        self.n_replicates = n_replicates
+        self.seed = seed
+        self.workers = workers if workers is not None else min(os.cpu_count() or 1, 8)
+        self.confidence = confidence
+        self.iqr_multiplier = iqr_multiplier
+
+    def run(self, data: StudyTrialData, compare: Optional[Tuple[str, str]] = None) -> StudyBootstrapResult:
+        """
+        Calcula IC del D-Score medio, por segmento y de la diferencia entre dos segmentos
+
+        Args:
+            data: Trials empaquetados del estudio
+            compare: Par (segmento_a, segmento_b); la diferencia es b - a
+        """
+        start_time = time.time()
+        if data.n_participants == 0:
+            raise ValueError("El estudio no tiene participantes")
+
+        replicates = self._run_replicates(data)
+        point_segments, point_all = self._point_estimates(data)
+
+        overall = replicates[:, -1]
+
+        segment_means = {label: float(point_segments[i]) for i, label in enumerate(data.segment_labels)}
+        segment_cis = {
+            label: self._percentile_interval(replicates[:, i])
+            for i, label in enumerate(data.segment_labels)
+        }
+
+        difference, difference_ci = None, None
+        if compare is not None:
+            index_a = data.segment_labels.index(str(compare[0]))
+            index_b = data.segment_labels.index(str(compare[1]))
+            difference = float(point_segments[index_b] - point_segments[index_a])
+            difference_ci = self._percentile_interval(replicates[:, index_b] - replicates[:, index_a])
+
+        processing_time = time.time() - start_time
+        self.logger.info(f"Bootstrap de estudio completado: {self.n_replicates} réplicas en {processing_time:.3f}s")
+
+        return StudyBootstrapResult(
+            mean_d_score=float(point_all),
+            confidence_interval=self._percentile_interval(overall),
+            segment_means=segment_means,
+            segment_confidence_intervals=segment_cis,
+            segment_difference=difference,
+            segment_difference_confidence_interval=difference_ci,
+            n_participants=data.n_participants,
+            n_replicates=self.n_replicates,
+            seed=self.seed,
+            workers=self.workers,
+            processing_time=processing_time
+        )
+
+    def _chunks(self) -> List[Tuple[int, int]]:
+        full, rest = divmod(self.n_replicates, REPLICATES_PER_CHUNK)
+        sizes = [REPLICATES_PER_CHUNK] * full + ([rest] if rest else [])
+        return list(enumerate(sizes))
+
+    def _run_replicates(self, data: StudyTrialData) -> np.ndarray:
+        chunks = self._chunks()
+
+        if self.workers <= 1 or len(chunks) == 1:
+            arrays = data.arrays()
+            parts = [run_replicate_chunk(arrays, index, size, self.seed, self.iqr_multiplier)
+                     for index, size in chunks]
+            return np.vstack(parts)
+
+        # Import diferido: el arranque en frío de una sesión no necesita procesos
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Solo viajan nombres de bloques compartidos y parámetros del lote
+        with SharedTrialArrays(data.arrays()) as shared:
+            with ProcessPoolExecutor(max_workers=self.workers,
+                                     initializer=_attach_shared_arrays,
+                                     initargs=(shared.descriptor,)) as executor:
+                tasks = [(index, size, self.seed, self.iqr_multiplier) for index, size in chunks]
+                parts = list(executor.map(_run_chunk_in_worker, tasks))
+        return np.vstack(parts)
+
+    def _point_estimates(self, data: StudyTrialData) -> Tuple[np.ndarray, float]:
+        """D-Score medio observado por segmento y global"""
+        n = data.n_participants
+        participants = np.arange(n)
+        compatible_groups = np.repeat(participants, np.diff(data.compatible_offsets))
+        incompatible_groups = np.repeat(participants, np.diff(data.incompatible_offsets))
+        d_scores = grouped_d_scores(data.compatible_rt, compatible_groups,
+                                    data.incompatible_rt, incompatible_groups, n, self.iqr_multiplier)
+
+        valid = np.isfinite(d_scores)
+        n_segments = len(data.segment_labels)
+        sums = np.bincount(data.segments[valid], weights=d_scores[valid], minlength=n_segments)
+        counts = np.bincount(data.segments[valid], minlength=n_segments)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            segment_means = sums / counts
+        overall = float(d_scores[valid].mean()) if valid.any() else float('nan')
+        return segment_means, overall
+
+    def _percentile_interval(self, values: np.ndarray) -> Tuple[float, float]:
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return (float('nan'), float('nan'))
+        alpha = (1 - self.confidence) / 2 * 100
+        lower, upper = np.percentile(values, [alpha, 100 - alpha])
+        return (float(lower), float(upper))
@@ -0,0 +1,215 @@
+"""
+IAT Aggregate Cube - Cubo de agregados por estudio × segmento × rol de bloque × estímulo
+Cualquier corte o roll-up se responde combinando celdas, sin leer trials
+"""
+
+import json
+import math
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+import numpy as np
+
+from .sketches import KLLSketch
+
+logger = logging.getLogger(__name__)
+
+# Las celdas por estímulo tienen pocos trials; un k menor mantiene las filas pequeñas
+CUBE_SKETCH_K = 64
+
+DEFAULT_BLOCK_ROLES = {
+    1: 'practice', 2: 'practice', 5: 'practice',
+    3: 'compatible', 4: 'compatible',
+    6: 'incompatible', 7: 'incompatible',
+}
+
+CUBE_DIMENSIONS = ('block_role', 'stimulus')
+
+@dataclass
+class CubeCell:
+    """Medidas combinables de una celda del cubo"""
+    count: int = 0
+    rt_sum: float = 0.0
+    rt_sum_sq: float = 0.0
+    errors: int = 0
+    sketch: KLLSketch = field(default_factory=lambda: KLLSketch(CUBE_SKETCH_K))
+
+    def merge(self, other: 'CubeCell') -> 'CubeCell':
+        self.count += other.count
+        self.rt_sum += other.rt_sum
+        self.rt_sum_sq += other.rt_sum_sq
+        self.errors += other.errors
+        self.sketch.merge(other.sketch)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        if self.count == 0:
+            return {'count': 0, 'mean_rt': 0.0, 'std_rt': 0.0, 'error_rate': 0.0, 'median_rt': None}
+        mean = self.rt_sum / self.count
+        variance = (self.rt_sum_sq - self.count * mean * mean) / (self.count - 1) if self.count > 1 else 0.0
+        return {
+            'count': self.count,
+            'mean_rt': mean,
+            'std_rt': math.sqrt(max(variance, 0.0)),
+            'error_rate': self.errors / self.count,
+            'median_rt': self.sketch.quantile(0.5) if self.sketch.n else None,
+        }
+
+def session_cube_cells(rt: np.ndarray, blocks: np.ndarray, correct: np.ndarray, stimuli: Sequence[Any],
+                       block_roles: Optional[Dict[int, str]] = None) -> Dict[Tuple[str, str], CubeCell]:
+    """
+    Celdas (rol de bloque, estímulo) de una sesión en unas pocas reducciones
+
+    Returns:
+        Dict: {(rol, estímulo): CubeCell}
+    """
+    block_roles = block_roles or DEFAULT_BLOCK_ROLES
+    rt = np.asarray(rt, dtype=np.float64)
+    if rt.size == 0:
+        return {}
+
+    role_labels = sorted(set(block_roles.values()) | {'other'})
+    role_lookup = {role: code for code, role in enumerate(role_labels)}
+    block_values, block_codes = np.unique(np.asarray(blocks), return_inverse=True)
+    role_codes = np.array([role_lookup[block_roles.get(int(b), 'other')] for b in block_values])[block_codes]
+    stimulus_labels, stimulus_codes = np.unique(np.asarray([str(s) for s in stimuli]), return_inverse=True)
+
+    keys = role_codes * stimulus_labels.size + stimulus_codes
+    cell_keys, cell_ids = np.unique(keys, return_inverse=True)
+    n_cells = cell_keys.size
+    counts = np.bincount(cell_ids, minlength=n_cells)
+    sums = np.bincount(cell_ids, weights=rt, minlength=n_cells)
+    sums_sq = np.bincount(cell_ids, weights=rt * rt, minlength=n_cells)
+    errors = np.bincount(cell_ids, weights=~np.asarray(correct, dtype=bool), minlength=n_cells)
+
+    order = np.argsort(cell_ids, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    cells = {}
+    for cell, key in enumerate(cell_keys):
+        role = role_labels[key // stimulus_labels.size]
+        stimulus = str(stimulus_labels[key % stimulus_labels.size])
+        cells[(role, stimulus)] = CubeCell(
+            count=int(counts[cell]),
+            rt_sum=float(sums[cell]),
+            rt_sum_sq=float(sums_sq[cell]),
+            errors=int(errors[cell]),
+            sketch=KLLSketch.from_values(rt[order[bounds[cell]:bounds[cell + 1]]], CUBE_SKETCH_K)
+        )
+    return cells
+
+def _segment_key(segment: Optional[Dict[str, Any]]) -> str:
+    return json.dumps({str(k): str(v) for k, v in (segment or {}).items()}, sort_keys=True)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cube_cells (
+    study_id TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    block_role TEXT NOT NULL,
+    stimulus TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    rt_sum REAL NOT NULL,
+    rt_sum_sq REAL NOT NULL,
+    errors INTEGER NOT NULL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (study_id, segment, block_role, stimulus)
+);
+CREATE TABLE IF NOT EXISTS cube_sessions (
+    study_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (study_id, session_id)
+);
+"""
+
+class AggregateCubeStore:
+    """Cubo persistido en SQLite; una fila por celda (estudio, segmento, rol, estímulo)"""
+
+    def __init__(self, path: str = ':memory:'):
+        self.logger = logging.getLogger(f"{__name__}.AggregateCubeStore")
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def record_session(self, study_id: str, session_id: str, cells: Dict[Tuple[str, str], CubeCell],
+                       segment: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Suma las celdas de una sesión al cubo
+
+        Returns:
+            bool: False si la sesión ya estaba incorporada
+        """
+        segment_key = _segment_key(segment)
+        with self._lock, self._connection:
+            inserted = self._connection.execute(
+                "INSERT OR IGNORE INTO cube_sessions (study_id, session_id) VALUES (?, ?)",
+                (study_id, session_id)
+            ).rowcount
+            if not inserted:
+                return False
+
+            for (block_role, stimulus), cell in cells.items():
+                row = self._connection.execute(
+                    "SELECT sketch FROM cube_cells WHERE study_id = ? AND segment = ? AND block_role = ? AND stimulus = ?",
+                    (study_id, segment_key, block_role, stimulus)
+                ).fetchone()
+                sketch = KLLSketch.from_dict(json.loads(row[0])) if row else KLLSketch(CUBE_SKETCH_K)
+                sketch.merge(cell.sketch)
+                self._connection.execute(
+                    """
+                    INSERT INTO cube_cells (study_id, segment, block_role, stimulus,
+                                            count, rt_sum, rt_sum_sq, errors, sketch)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (study_id, segment, block_role, stimulus) DO UPDATE SET
+                        count = count + excluded.count,
+                        rt_sum = rt_sum + excluded.rt_sum,
+                        rt_sum_sq = rt_sum_sq + excluded.rt_sum_sq,
+                        errors = errors + excluded.errors,
+                        sketch = excluded.sketch
+                    """,
+                    (study_id, segment_key, block_role, stimulus, cell.count, cell.rt_sum,
+                     cell.rt_sum_sq, cell.errors, json.dumps(sketch.to_dict()))
+                )
+            return True
+
+    def query(self, study_id: str, where: Optional[Dict[str, Any]] = None,
+              group_by: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Corte y roll-up del cubo
+
+        Args:
+            where: Filtros por dimensión ('block_role', 'stimulus') o atributo de segmento
+            group_by: Dimensiones o atributos de segmento que se conservan; el resto se agrega
+
+        Returns:
+            List[Dict]: Una entrada por grupo con sus dimensiones y medidas
+        """
+        where = {str(k): str(v) for k, v in (where or {}).items()}
+        sql = "SELECT segment, block_role, stimulus, count, rt_sum, rt_sum_sq, errors, sketch FROM cube_cells WHERE study_id = ?"
+        params: List[Any] = [study_id]
+        for dimension in CUBE_DIMENSIONS:
+            if dimension in where:
+                sql += f" AND {dimension} = ?"
+                params.append(where[dimension])
+        segment_filters = {k: v for k, v in where.items() if k not in CUBE_DIMENSIONS}
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+
+        groups: Dict[Tuple[str, ...], CubeCell] = {}
+        for segment_json, block_role, stimulus, count, rt_sum, rt_sum_sq, errors, sketch in rows:
+            coordinates = dict(json.loads(segment_json), block_role=block_role, stimulus=stimulus)
+            if any(coordinates.get(k) != v for k, v in segment_filters.items()):
+                continue
+            key = tuple(coordinates.get(dimension, '') for dimension in group_by)
+            groups.setdefault(key, CubeCell()).merge(CubeCell(
+                count=count, rt_sum=rt_sum, rt_sum_sq=rt_sum_sq, errors=errors,
+                sketch=KLLSketch.from_dict(json.loads(sketch))
+            ))
+
+        return [dict(zip(group_by, key), **cell.summary()) for key, cell in sorted(groups.items())]
@@ -0,0 +1,234 @@
+"""
+IAT Dispatcher - Punto de entrada único para los motores IAT
+Carga una sola vez los scripts (motor de análisis, optimizador, motor de pruebas
+y bridge) y reparte las acciones entre instancias persistentes, de modo que un
+flujo "process_response -> get_results -> analyze" no cruza procesos
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import importlib.util
+from types import ModuleType
+from typing import Dict, List, Any, Optional
+from dataclasses import asdict, is_dataclass
+
+from . import profiling
+from .logs import configure_logging, request_logging
+from .runtime import ColdStartTimer
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRIDGE_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'bridge')
+
+# Destino -> (nombre de módulo importable, ruta del script con guiones)
+SCRIPTS = {
+    'analysis': ('iat_analysis_engine', os.path.join(SCRIPT_DIR, 'iat-analysis-engine.py')),
+    'optimizer': ('iat_performance_optimizer', os.path.join(SCRIPT_DIR, 'iat-performance-optimizer.py')),
+    'test': ('iat_test_engine', os.path.join(SCRIPT_DIR, 'iat-test-engine.py')),
+    'bridge': ('python_iat_bridge', os.path.join(BRIDGE_DIR, 'python-iat-bridge.py')),
+}
+
+ERROR_PREFIXES = {
+    'analysis': 'Error en IAT Analysis Engine',
+    'optimizer': 'Error en IAT Performance Optimizer',
+    'test': 'Error en IAT Test Engine',
+    'bridge': 'Error en bridge Python',
+}
+
+ANALYSIS_ACTIONS = (
+    'analyze', 'bootstrap_study', 'reliability_study', 'sensitivity', 'outlier_sensitivity',
+    'ex_gaussian_study', 'temporal_curves', 'item_analysis', 'study_aggregates', 'cube_query',
+)
+TEST_ACTIONS = ('create_config', 'start_session', 'process_response', 'get_results', 'end_session', 'session_stats')
+
+ACTION_TARGETS = dict(
+    [(action, 'analysis') for action in ANALYSIS_ACTIONS]
+    + [(action, 'test') for action in TEST_ACTIONS]
+    + [('optimize', 'optimizer'), ('bridge', 'bridge'), ('generate_plan_bank', 'test')]
+)
+
+_load_lock = threading.RLock()
+
+def load_script(target: str) -> ModuleType:
+    """Importa (una vez por proceso) el script de ``target`` bajo un nombre válido"""
+    name, path = SCRIPTS[target]
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _load_lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.spec_from_file_location(name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"No se pudo cargar {path}")
+        module = importlib.util.module_from_spec(spec)
+        # Registrado antes de ejecutar: los dataclasses resuelven su módulo en sys.modules
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[name]
+            raise
+    return module
+
+def test_results_to_session(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultados de ``IATTestEngine.get_session_results`` en el formato de sesión del motor de análisis"""
+    return {
+        'sessionId': results.get('session_id', ''),
+        'responses': [
+            {
+                'trialNumber': response.get('trial_number', 0),
+                'blockNumber': response.get('block_number', 0),
+                'stimulus': response.get('stimulus', ''),
+                'response': response.get('response', ''),
+                'responseTime': response.get('response_time', 0),
+                'correct': response.get('correct', False),
+                'timestamp': response.get('timestamp', ''),
+            }
+            for response in results.get('raw_responses', [])
+        ],
+    }
+
+class IATDispatcher:
+    """
+    Despachador de acciones con una instancia persistente por motor
+
+    Acciones:
+        analyze (o ``session``), bootstrap_study, ..., cube_query -> motor de análisis
+        optimize -> optimizador; bridge -> bridge Python
+        create_config, start_session, process_response, get_results, end_session,
+        session_stats -> gestor de sesiones del motor de pruebas (por ``session_id``)
+        generate_plan_bank -> banco de planes pregenerados del motor de pruebas
+        analyze_results -> resultados de ``session_id`` analizados en el mismo proceso
+        pipeline -> ``steps`` en orden, deteniéndose en el primer error
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(f"{__name__}.IATDispatcher")
+        self.runtime = ColdStartTimer()
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def instance(self, target: str) -> Any:
+        """Instancia del motor de ``target``, creada en la primera petición"""
+        if target in self._instances:
+            return self._instances[target]
+        with self._lock:
+            if target in self._instances:
+                return self._instances[target]
+            module = load_script(target)
+            if target == 'analysis':
+                self._instances[target] = module.create_engine()
+            elif target == 'optimizer':
+                self._instances[target] = module.IATPerformanceOptimizer()
+            elif target == 'test':
+                self._instances[target] = module.IATSessionManager()
+            else:
+                self._instances[target] = module.IATPythonBridge()
+        return self._instances[target]
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Atiende una petición; nunca lanza, los errores vuelven como ``success: False``
+
+        ``log_level`` en la petición fija el nivel de log solo mientras se atiende.
+        """
+        try:
+            with request_logging(request.get('log_level')):
+                return self._dispatch(request)
+        except ValueError as e:
+            # Nivel de log no válido
+            return {'success': False, 'error': str(e)}
+
+    def _dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        action = request.get('action', 'analyze')
+        if action == 'pipeline':
+            return self._run_pipeline(request.get('steps', []))
+        if action == 'analyze_results':
+            target = 'analysis'
+        else:
+            target = ACTION_TARGETS.get(action)
+            if target is None:
+                return {'success': False, 'error': f'Acción no reconocida: {action}'}
+
+        try:
+            return self._handle(target, action, request)
+        except Exception as e:
+            self.logger.error(f"Error en acción {action}: {str(e)}")
+            return {
+                'success': False,
+                'error': f'{ERROR_PREFIXES[target]}: {str(e)}',
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+
+    def _handle(self, target: str, action: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        module = load_script(target)
+        if action == 'analyze_results':
+            results = load_script('test').handle_request(
+                {'action': 'get_results', 'session_id': request.get('session_id')}, sessions=self.instance('test')
+            )
+            if not results.get('success') or 'error' in results.get('results', {}):
+                raise ValueError(results.get('error') or results['results']['error'])
+            session = test_results_to_session(results['results'])
+            return module.handle_request(session, self.instance(target))
+        if action == 'analyze':
+            # Sin 'session', la propia petición es la sesión (como la entrada por stdin)
+            session = request.get('session', request)
+            if session is not request and (request.get('profile') or profiling.SAMPLE_EVERY):
+                # El perfilado lee sus opciones y el id de la propia sesión
+                session = dict(session, profile=request.get('profile'),
+                               request_id=request.get('request_id', request.get('id')))
+            return module.handle_request(session, self.instance(target))
+
+        if target == 'test':
+            return module.handle_request(request, sessions=self.instance(target))
+        result = module.handle_request(request, self.instance(target))
+        return asdict(result) if is_dataclass(result) else result
+
+    def _run_pipeline(self, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+        results = []
+        for step in steps:
+            result = self.dispatch(step)
+            results.append(result)
+            if not result.get('success', False):
+                break
+        return {
+            'success': len(results) == len(steps) and all(r.get('success', False) for r in results),
+            'results': results,
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+_default_dispatcher: Optional[IATDispatcher] = None
+
+def get_dispatcher() -> IATDispatcher:
+    """Despachador compartido por todo el proceso"""
+    global _default_dispatcher
+    if _default_dispatcher is None:
+        _default_dispatcher = IATDispatcher()
+    return _default_dispatcher
+
+def main() -> None:
+    """``python -m iatcore.dispatcher``: una petición JSON por stdin, respuesta por stdout"""
+    configure_logging()
+    dispatcher = get_dispatcher()
+    dispatcher.runtime.start()
+    try:
+        request = json.loads(sys.stdin.read())
+        result = dispatcher.dispatch(request)
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': f'Error en IAT Dispatcher: {str(e)}',
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+    result['runtime'] = dispatcher.runtime.finish()
+    print(json.dumps(result, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
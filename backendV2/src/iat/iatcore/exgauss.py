@@ -0,0 +1,232 @@
+"""
+IAT Ex-Gaussian - Ajuste ex-Gaussiano (mu, sigma, tau) por lotes
+Arranque por método de momentos y refinamiento de máxima verosimilitud con
+Nelder–Mead vectorizado: todos los grupos (participante × bloque) avanzan a la vez
+"""
+
+from typing import Dict, Any, Tuple
+from dataclasses import dataclass
+import numpy as np
+
+MIN_TRIALS = 10
+MAX_ITERATIONS = 400
+TOLERANCE = 1e-7
+
+_LOG_HALF = np.log(0.5)
+_SQRT2 = np.sqrt(2.0)
+# Coeficientes de erfc (Numerical Recipes, error relativo < 1.2e-7)
+_ERFC_COEFFICIENTS = (
+    -1.26551223, 1.00002368, 0.37409196, 0.09678418, -0.18628806,
+    0.27886807, -1.13520398, 1.48851587, -0.82215223, 0.17087277,
+)
+
+@dataclass
+class ExGaussianFit:
+    """Parámetros ex-Gaussianos por grupo (NaN si no hay trials suficientes)"""
+    mu: np.ndarray
+    sigma: np.ndarray
+    tau: np.ndarray
+    log_likelihood: np.ndarray
+    n_trials: np.ndarray
+    converged: np.ndarray
+
+    def group(self, index: int) -> Dict[str, Any]:
+        return {
+            'mu': float(self.mu[index]),
+            'sigma': float(self.sigma[index]),
+            'tau': float(self.tau[index]),
+            'log_likelihood': float(self.log_likelihood[index]),
+            'n_trials': int(self.n_trials[index]),
+            'converged': bool(self.converged[index]),
+        }
+
+def log_erfc(x: np.ndarray) -> np.ndarray:
+    """log(erfc(x)) estable también en la cola (x grande)"""
+    x = np.asarray(x, dtype=np.float64)
+    ax = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * ax)
+    poly = np.zeros_like(t)
+    for coefficient in reversed(_ERFC_COEFFICIENTS):
+        poly = poly * t + coefficient
+    log_tail = np.log(t) - ax * ax + poly
+    # erfc(-|x|) = 2 - erfc(|x|)
+    return np.where(x >= 0, log_tail, np.log(2.0 - np.exp(log_tail)))
+
+def log_normal_cdf(z: np.ndarray) -> np.ndarray:
+    """log Phi(z)"""
+    return _LOG_HALF + log_erfc(-np.asarray(z, dtype=np.float64) / _SQRT2)
+
+def ex_gaussian_logpdf(x: np.ndarray, mu: np.ndarray, sigma: np.ndarray, tau: np.ndarray) -> np.ndarray:
+    """Log-densidad ex-Gaussiana elemento a elemento"""
+    return (-np.log(tau) + (mu - x) / tau + sigma * sigma / (2 * tau * tau)
+            + log_normal_cdf((x - mu) / sigma - sigma / tau))
+
+def ex_gaussian_cdf(x: np.ndarray, mu: np.ndarray, sigma: np.ndarray, tau: np.ndarray) -> np.ndarray:
+    """Función de distribución ex-Gaussiana"""
+    z = (x - mu) / sigma
+    log_tail = -(x - mu) / tau + sigma * sigma / (2 * tau * tau) + log_normal_cdf(z - sigma / tau)
+    return np.clip(np.exp(log_normal_cdf(z)) - np.exp(log_tail), 0.0, 1.0)
+
+def ex_gaussian_moments(values: np.ndarray, group_ids: np.ndarray,
+                        n_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Arranque por método de momentos
+
+    tau = sd·(asimetría/2)^(1/3), mu = media - tau, sigma² = var - tau²;
+    la asimetría se acota a (0, 2) para que sigma sea siempre positiva.
+
+    Returns:
+        Tuple: (mu, sigma, tau, n) por grupo
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = np.bincount(group_ids, minlength=n_groups).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(group_ids, weights=values, minlength=n_groups) / n
+        deviation = values - mean[group_ids]
+        m2 = np.bincount(group_ids, weights=deviation ** 2, minlength=n_groups) / n
+        m3 = np.bincount(group_ids, weights=deviation ** 3, minlength=n_groups) / n
+        skew = np.clip(m3 / m2 ** 1.5, 0.1, 1.9)
+        sd = np.sqrt(m2)
+        tau = sd * np.cbrt(skew / 2)
+        sigma = np.sqrt(np.maximum(m2 - tau * tau, 1e-12))
+    return mean - tau, sigma, tau, n
+
+def _negative_log_likelihood(z: np.ndarray, group_ids: np.ndarray, theta: np.ndarray,
+                             n_groups: int) -> np.ndarray:
+    """NLL por grupo para theta = (mu, log sigma, log tau) en escala estandarizada"""
+    mu, sigma, tau = theta[:, 0], np.exp(theta[:, 1]), np.exp(theta[:, 2])
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        logpdf = ex_gaussian_logpdf(z, mu[group_ids], sigma[group_ids], tau[group_ids])
+        # Sin trials (ningún grupo ajustable) bincount devuelve enteros
+        nll = -np.bincount(group_ids, weights=logpdf, minlength=n_groups).astype(np.float64)
+    nll[~np.isfinite(nll)] = np.inf
+    return nll
+
+def fit_ex_gaussian(values: np.ndarray, group_ids: np.ndarray, n_groups: int,
+                    max_iterations: int = MAX_ITERATIONS, tolerance: float = TOLERANCE,
+                    min_trials: int = MIN_TRIALS) -> ExGaussianFit:
+    """
+    Ajuste de máxima verosimilitud para muchos grupos a la vez
+
+    Cada grupo se estandariza (media 0, sd 1) para que un mismo paso inicial
+    y una misma tolerancia sirvan a todos; los parámetros se devuelven en ms.
+
+    Args:
+        values: RT de todos los trials
+        group_ids: Grupo de cada trial (0..n_groups-1)
+        n_groups: Número de grupos
+
+    Los grupos con menos de ``min_trials`` trials quedan en NaN, aunque
+    no haya ninguno ajustable:
+
+    >>> fit = fit_ex_gaussian([500, 600, 700, 800], [0, 0, 1, 1], 2)
+    >>> bool(np.isnan(fit.mu).all()), fit.n_trials.tolist(), fit.converged.tolist()
+    (True, [2, 2], [False, False])
+    """
+    values = np.asarray(values, dtype=np.float64)
+    group_ids = np.asarray(group_ids, dtype=np.int64)
+
+    mu0, sigma0, tau0, n = ex_gaussian_moments(values, group_ids, n_groups)
+    usable = n >= min_trials
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center = np.bincount(group_ids, weights=values, minlength=n_groups) / n
+        scale = np.sqrt(np.bincount(group_ids, weights=(values - center[group_ids]) ** 2, minlength=n_groups) / n)
+    scale = np.where(usable & (scale > 0), scale, 1.0)
+    center = np.where(usable, center, 0.0)
+
+    # Solo los trials de grupos ajustables, en escala estandarizada
+    keep = usable[group_ids]
+    group_ids = group_ids[keep]
+    z = (values[keep] - center[group_ids]) / scale[group_ids]
+
+    start = np.column_stack((
+        np.where(usable, (mu0 - center) / scale, 0.0),
+        np.log(np.where(usable, sigma0 / scale, 1.0)),
+        np.log(np.where(usable, tau0 / scale, 1.0)),
+    ))
+
+    simplex = np.repeat(start[:, None, :], 4, axis=1)
+    simplex[:, 1:, :] += 0.2 * np.eye(3)[None, :, :]
+    scores = np.stack([_negative_log_likelihood(z, group_ids, simplex[:, v], n_groups) for v in range(4)], axis=1)
+    rows = np.arange(n_groups)
+    converged = ~usable
+
+    trial_z, trial_groups = z, group_ids
+    for _ in range(max_iterations):
+        order = np.argsort(scores, axis=1)
+        simplex = np.take_along_axis(simplex, order[:, :, None], axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+
+        with np.errstate(invalid='ignore'):
+            spread = scores[:, 3] - scores[:, 0]
+            converged |= spread <= tolerance * (1.0 + np.abs(scores[:, 0]))
+        if converged.all():
+            break
+        # Los grupos convergidos dejan de evaluarse
+        active_trials = ~converged[group_ids]
+        if active_trials.sum() < 0.75 * trial_z.size:
+            trial_z, trial_groups = z[active_trials], group_ids[active_trials]
+
+        best, second_worst, worst = scores[:, 0], scores[:, 2], scores[:, 3]
+        centroid = simplex[:, :3].mean(axis=1)
+        direction = centroid - simplex[:, 3]
+
+        reflected = centroid + direction
+        expanded = centroid + 2.0 * direction
+        outside = centroid + 0.5 * direction
+        inside = centroid - 0.5 * direction
+        f_reflected = _negative_log_likelihood(trial_z, trial_groups, reflected, n_groups)
+        f_expanded = _negative_log_likelihood(trial_z, trial_groups, expanded, n_groups)
+        f_outside = _negative_log_likelihood(trial_z, trial_groups, outside, n_groups)
+        f_inside = _negative_log_likelihood(trial_z, trial_groups, inside, n_groups)
+
+        use_expanded = (f_reflected < best) & (f_expanded < f_reflected)
+        use_reflected = ~use_expanded & (f_reflected < second_worst)
+        use_outside = ~use_expanded & ~use_reflected & (f_reflected < worst) & (f_outside <= f_reflected)
+        use_inside = ~use_expanded & ~use_reflected & (f_reflected >= worst) & (f_inside < worst)
+        shrink = ~(use_expanded | use_reflected | use_outside | use_inside) & ~converged
+
+        replacement = np.select(
+            [use_expanded[:, None], use_reflected[:, None], use_outside[:, None], use_inside[:, None]],
+            [expanded, reflected, outside, inside], default=simplex[:, 3]
+        )
+        replacement_score = np.select([use_expanded, use_reflected, use_outside, use_inside],
+                                      [f_expanded, f_reflected, f_outside, f_inside], default=worst)
+        active = ~converged
+        simplex[active, 3] = replacement[active]
+        scores[active, 3] = replacement_score[active]
+
+        if shrink.any():
+            shrunk = simplex[:, :1] + 0.5 * (simplex[:, 1:] - simplex[:, :1])
+            for v in range(3):
+                f_shrunk = _negative_log_likelihood(trial_z, trial_groups, shrunk[:, v], n_groups)
+                simplex[shrink, v + 1] = shrunk[shrink, v]
+                scores[shrink, v + 1] = f_shrunk[shrink]
+
+    best_index = np.argmin(scores, axis=1)
+    theta = simplex[rows, best_index]
+    nll = scores[rows, best_index]
+
+    nan = np.full(n_groups, np.nan)
+    return ExGaussianFit(
+        mu=np.where(usable, center + scale * theta[:, 0], nan),
+        sigma=np.where(usable, scale * np.exp(theta[:, 1]), nan),
+        tau=np.where(usable, scale * np.exp(theta[:, 2]), nan),
+        log_likelihood=np.where(usable, -(nll + n * np.log(scale)), nan),
+        n_trials=n.astype(np.int64),
+        converged=converged & usable
+    )
+
+def ex_gaussian_outlier_mask(values: np.ndarray, group_ids: np.ndarray, fit: ExGaussianFit,
+                             alpha: float = 0.001) -> np.ndarray:
+    """
+    Trials improbables bajo el ex-Gaussiano de su grupo (cola inferior o superior < alpha/2)
+
+    Los grupos sin ajuste no marcan ningún trial.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mu, sigma, tau = fit.mu[group_ids], fit.sigma[group_ids], fit.tau[group_ids]
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        cdf = ex_gaussian_cdf(values, mu, sigma, tau)
+    fitted = np.isfinite(mu)
+    return fitted & ((cdf < alpha / 2) | (cdf > 1 - alpha / 2))
@@ -0,0 +1,114 @@
+"""
+IAT Frame - Trials de una sesión como columnas NumPy
+Sustituto ligero de ``pandas.DataFrame`` para las operaciones que usan los
+motores (filtro por bloque, máscaras, agrupación por bloque), sin importar pandas
+"""
+
+from typing import Dict, List, Any, Iterator, Optional, Sequence, Tuple
+import numpy as np
+
+# Campo de la respuesta cruda -> (columna, tipo, valor por defecto)
+RESPONSE_FIELDS = (
+    ('trialNumber', 'trial', np.int64, 0),
+    ('blockNumber', 'block', np.int64, 0),
+    ('stimulus', 'stimulus', object, ''),
+    ('response', 'response', object, ''),
+    ('responseTime', 'rt', np.float64, 0),
+    ('correct', 'correct', bool, False),
+    ('category', 'category', object, ''),
+    ('attribute', 'attribute', object, ''),
+    ('timestamp', 'timestamp', object, ''),
+)
+
+# Mismas columnas desde las respuestas del motor de pruebas (``IATResponse``, snake_case)
+SESSION_RESPONSE_FIELDS = (
+    ('trial_number', 'trial', np.int64, 0),
+    ('block_number', 'block', np.int64, 0),
+    ('stimulus', 'stimulus', object, ''),
+    ('response', 'response', object, ''),
+    ('response_time', 'rt', np.float64, 0),
+    ('correct', 'correct', bool, False),
+    ('timestamp', 'timestamp', object, ''),
+)
+
+class TrialFrame:
+    """Columnas alineadas de igual longitud; las selecciones devuelven otro ``TrialFrame``"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    @classmethod
+    def from_responses(cls, responses: Sequence[Dict[str, Any]], min_rt: float = 0.0,
+                       max_rt: float = 10000.0,
+                       fields: Sequence[Tuple[str, str, Any, Any]] = RESPONSE_FIELDS) -> 'TrialFrame':
+        """Mismo filtro ``min_rt < rt < max_rt`` que el DataFrame original"""
+        n = len(responses)
+        columns = {}
+        for source, name, dtype, default in fields:
+            if dtype is object:
+                column = np.empty(n, dtype=object)
+                column[:] = [r.get(source, default) for r in responses]
+            else:
+                column = np.fromiter((r.get(source, default) or default for r in responses), dtype=dtype, count=n)
+            columns[name] = column
+        frame = cls(columns)
+        rt = columns['rt']
+        return frame.take((rt > min_rt) & (rt < max_rt))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def take(self, selector: Any) -> 'TrialFrame':
+        """Filas por máscara booleana, índices o ``slice`` (como ``df[mask]`` / ``df.iloc``)"""
+        return TrialFrame({name: column[selector] for name, column in self.columns.items()})
+
+    def in_blocks(self, blocks: Sequence[int]) -> 'TrialFrame':
+        return self.take(np.isin(self.columns['block'], blocks))
+
+    def group_indices(self, column: str = 'block') -> Tuple[np.ndarray, np.ndarray]:
+        """Claves ordenadas y código de grupo de cada fila (como ``groupby(sort=True)``)"""
+        return np.unique(self.columns[column], return_inverse=True)
+
+    def groups(self, column: str = 'block') -> Iterator[Tuple[Any, 'TrialFrame']]:
+        """Pares (clave, sub-frame) en orden de clave, conservando el orden de filas"""
+        keys, codes = self.group_indices(column)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=keys.size))))
+        for index, key in enumerate(keys):
+            yield key.item() if hasattr(key, 'item') else key, self.take(order[bounds[index]:bounds[index + 1]])
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        names = list(self.columns)
+        return [dict(zip(names, row)) for row in zip(*(self.columns[name].tolist() for name in names))]
+
+    def to_pandas(self) -> Any:
+        """DataFrame equivalente; requiere pandas instalado"""
+        import pandas as pd
+        return pd.DataFrame(self.columns)
+
+def sample_std(values: np.ndarray) -> float:
+    """Desviación estándar muestral (ddof=1, como pandas); NaN con menos de 2 valores"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < 2:
+        return float('nan')
+    return float(values.std(ddof=1))
+
+def group_means(values: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Media de ``values`` por clave ordenada (``groupby(keys).mean()``)"""
+    unique, codes = np.unique(keys, return_inverse=True)
+    counts = np.bincount(codes, minlength=unique.size)
+    sums = np.bincount(codes, weights=np.asarray(values, dtype=np.float64), minlength=unique.size)
+    return unique, sums / np.maximum(counts, 1)
+
+def value_counts(values: np.ndarray, limit: Optional[int] = None) -> Dict[Any, int]:
+    """Conteos por valor en orden descendente (``Series.value_counts().to_dict()``)"""
+    unique, counts = np.unique(values, return_counts=True)
+    order = np.argsort(-counts, kind='stable')[:limit]
+    return {unique[i].item() if hasattr(unique[i], 'item') else unique[i]: int(counts[i]) for i in order}
@@ -0,0 +1,196 @@
+"""
+IAT Item Analysis - Análisis por estímulo a nivel de estudio
+Estímulos codificados por diccionario y matriz participante × estímulo dispersa
+(solo celdas observadas), reducida con unas pocas llamadas a ``bincount``
+"""
+
+from typing import Dict, List, Any, Sequence
+from dataclasses import dataclass, field
+import numpy as np
+
+from .dscore import grouped_moments
+
+# Umbrales para marcar estímulos problemáticos
+HIGH_ERROR_RATE = 0.30
+LOW_ITEM_TOTAL = 0.20
+SLOW_ITEM_Z = 2.0
+MIN_PARTICIPANTS_FOR_CORRELATION = 10
+
+@dataclass
+class StudyItemData:
+    """Trials del estudio con estímulos y participantes codificados como enteros"""
+    rt: np.ndarray
+    correct: np.ndarray
+    stimulus_codes: np.ndarray
+    participant_codes: np.ndarray
+    stimuli: List[str]
+    categories: List[str]
+    attributes: List[str]
+    participant_ids: List[str]
+
+    @property
+    def n_participants(self) -> int:
+        return len(self.participant_ids)
+
+    @property
+    def n_stimuli(self) -> int:
+        return len(self.stimuli)
+
+    @classmethod
+    def from_sessions(cls, sessions: Sequence[Dict[str, Any]], max_rt: float = 10000.0) -> 'StudyItemData':
+        """
+        Codifica las respuestas de todas las sesiones
+
+        Aplica el mismo filtro ``0 < rt < max_rt`` de ``_prepare_dataframe``.
+        La categoría y el atributo de cada estímulo son los de su primera aparición.
+        """
+        lookup: Dict[str, int] = {}
+        categories: List[str] = []
+        attributes: List[str] = []
+        rt_parts, correct_parts, stimulus_parts, participant_parts = [], [], [], []
+        participant_ids: List[str] = []
+
+        for index, session in enumerate(sessions):
+            responses = session.get('responses', [])
+            n = len(responses)
+            codes = np.empty(n, dtype=np.int64)
+            for position, response in enumerate(responses):
+                stimulus = str(response.get('stimulus', ''))
+                code = lookup.get(stimulus)
+                if code is None:
+                    code = lookup[stimulus] = len(lookup)
+                    categories.append(str(response.get('category', '')))
+                    attributes.append(str(response.get('attribute', '')))
+                codes[position] = code
+
+            rt = np.fromiter((r.get('responseTime', 0) or 0 for r in responses), dtype=np.float64, count=n)
+            correct = np.fromiter((bool(r.get('correct', False)) for r in responses), dtype=bool, count=n)
+            valid = (rt > 0) & (rt < max_rt)
+
+            rt_parts.append(rt[valid])
+            correct_parts.append(correct[valid])
+            stimulus_parts.append(codes[valid])
+            participant_parts.append(np.full(int(valid.sum()), index, dtype=np.int64))
+            participant_ids.append(str(session.get('participantId', session.get('sessionId', index))))
+
+        def concat(parts, dtype):
+            return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+        return cls(
+            rt=concat(rt_parts, np.float64),
+            correct=concat(correct_parts, bool),
+            stimulus_codes=concat(stimulus_parts, np.int64),
+            participant_codes=concat(participant_parts, np.int64),
+            stimuli=list(lookup),
+            categories=categories,
+            attributes=attributes,
+            participant_ids=participant_ids
+        )
+
+@dataclass
+class ItemStatistics:
+    """Estadísticos de un estímulo"""
+    stimulus: str
+    category: str
+    attribute: str
+    n_trials: int
+    n_participants: int
+    mean_rt: float
+    std_rt: float
+    error_rate: float
+    item_total_rt: float     # r entre RT medio del ítem y RT medio del resto, entre participantes
+    item_total_error: float  # igual con la tasa de error
+    flags: List[str] = field(default_factory=list)
+
+@dataclass
+class ItemAnalysisResult:
+    """Análisis de ítems de un estudio"""
+    items: List[ItemStatistics]
+    n_participants: int
+    n_stimuli: int
+    matrix_density: float  # fracción de celdas participante × estímulo observadas
+
+def _item_rest_correlation(values: np.ndarray, cell_participant: np.ndarray, cell_stimulus: np.ndarray,
+                           n_participants: int, n_stimuli: int) -> np.ndarray:
+    """
+    Correlación ítem-resto corregida, para todos los ítems a la vez
+
+    ``values`` es la medida de cada celda observada; el "resto" de una celda
+    es la media del participante sobre sus demás ítems.
+    """
+    totals = np.bincount(cell_participant, weights=values, minlength=n_participants)
+    items_seen = np.bincount(cell_participant, minlength=n_participants)
+    others = items_seen[cell_participant] - 1
+    valid = others > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rest = (totals[cell_participant] - values) / others
+
+    x, y, owner = values[valid], rest[valid], cell_stimulus[valid]
+    n = np.bincount(owner, minlength=n_stimuli).astype(np.float64)
+    sx = np.bincount(owner, weights=x, minlength=n_stimuli)
+    sy = np.bincount(owner, weights=y, minlength=n_stimuli)
+    sxx = np.bincount(owner, weights=x * x, minlength=n_stimuli)
+    syy = np.bincount(owner, weights=y * y, minlength=n_stimuli)
+    sxy = np.bincount(owner, weights=x * y, minlength=n_stimuli)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = sxy - sx * sy / n
+        r = covariance / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+    r[n < MIN_PARTICIPANTS_FOR_CORRELATION] = np.nan
+    return r
+
+def study_item_analysis(data: StudyItemData) -> ItemAnalysisResult:
+    """Estadísticos por estímulo y correlaciones ítem-total de todo el estudio"""
+    n_participants, n_stimuli = data.n_participants, data.n_stimuli
+    if data.rt.size == 0 or n_stimuli == 0:
+        return ItemAnalysisResult(items=[], n_participants=n_participants, n_stimuli=n_stimuli, matrix_density=0.0)
+
+    errors = (~data.correct).astype(np.float64)
+
+    # Nivel trial
+    mean_rt, std_rt, n_trials = grouped_moments(data.rt, data.stimulus_codes, n_stimuli)
+    error_rate = np.bincount(data.stimulus_codes, weights=errors, minlength=n_stimuli) / np.maximum(n_trials, 1)
+
+    # Matriz participante × estímulo: solo celdas observadas
+    cells, cell_ids = np.unique(data.participant_codes * n_stimuli + data.stimulus_codes, return_inverse=True)
+    cell_participant, cell_stimulus = cells // n_stimuli, cells % n_stimuli
+    cell_counts = np.bincount(cell_ids, minlength=cells.size)
+    cell_rt = np.bincount(cell_ids, weights=data.rt, minlength=cells.size) / cell_counts
+    cell_error = np.bincount(cell_ids, weights=errors, minlength=cells.size) / cell_counts
+
+    item_total_rt = _item_rest_correlation(cell_rt, cell_participant, cell_stimulus, n_participants, n_stimuli)
+    item_total_error = _item_rest_correlation(cell_error, cell_participant, cell_stimulus, n_participants, n_stimuli)
+    participants_per_item = np.bincount(cell_stimulus, minlength=n_stimuli)
+
+    finite_means = mean_rt[np.isfinite(mean_rt)]
+    spread = finite_means.std() if finite_means.size > 1 else 0.0
+    slow_z = (mean_rt - finite_means.mean()) / spread if spread > 0 else np.zeros(n_stimuli)
+
+    items = []
+    for code, stimulus in enumerate(data.stimuli):
+        flags = []
+        if error_rate[code] > HIGH_ERROR_RATE:
+            flags.append('high_error')
+        if np.isfinite(item_total_rt[code]) and item_total_rt[code] < LOW_ITEM_TOTAL:
+            flags.append('low_discrimination')
+        if slow_z[code] > SLOW_ITEM_Z:
+            flags.append('slow')
+        items.append(ItemStatistics(
+            stimulus=stimulus,
+            category=data.categories[code],
+            attribute=data.attributes[code],
+            n_trials=int(n_trials[code]),
+            n_participants=int(participants_per_item[code]),
+            mean_rt=float(mean_rt[code]),
+            std_rt=float(std_rt[code]),
+            error_rate=float(error_rate[code]),
+            item_total_rt=float(item_total_rt[code]),
+            item_total_error=float(item_total_error[code]),
+            flags=flags
+        ))
+
+    return ItemAnalysisResult(
+        items=items,
+        n_participants=n_participants,
+        n_stimuli=n_stimuli,
+        matrix_density=float(cells.size / max(n_participants * n_stimuli, 1))
+    )
@@ -0,0 +1,204 @@
+"""
+IAT Logs - Registro estructurado de los motores IAT fuera del camino crítico
+Los registros se encolan sin formatear (``QueueHandler``) y un hilo de fondo
+(``QueueListener``) los formatea y escribe en stderr. Los eventos por trial se
+muestrean (1 de cada N) y el nivel puede bajarse para una sola petición
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import itertools
+import threading
+import contextvars
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Callable, Iterator, Optional, Union
+
+LEVEL_ENV = 'IAT_LOG_LEVEL'
+FORMAT_ENV = 'IAT_LOG_FORMAT'
+SAMPLE_ENV = 'IAT_LOG_SAMPLE_EVERY'
+
+DEFAULT_LEVEL = 'INFO'
+# Un registro de cada TRIAL_SAMPLE_EVERY eventos por trial (process_response)
+TRIAL_SAMPLE_EVERY = max(1, int(os.environ.get(SAMPLE_ENV, '100')))
+
+# Atributos estándar de LogRecord; el resto viene de ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_request_level: ContextVar[Optional[int]] = ContextVar('iat_request_log_level', default=None)
+
+def parse_level(level: Union[int, str, None], default: int = logging.INFO) -> int:
+    """Nivel numérico a partir de un nombre ('debug', 'WARNING') o número"""
+    if level is None or level == '':
+        return default
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Nivel de log no válido: {level}")
+    return value
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por registro: tiempo, nivel, logger, mensaje, evento y campos de ``extra``"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    Encola el registro tal cual: el mensaje se formatea en el hilo del listener
+
+    ``QueueHandler.prepare`` formatea en el hilo que registra; aquí se omite.
+    Por eso los argumentos del mensaje deben ser valores que no cambien después
+    (números, cadenas), como ya ocurre en los motores.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class _RequestLevelFilter(logging.Filter):
+    """Aplica el nivel de la petición en curso o, si no hay, el nivel por defecto"""
+
+    def __init__(self, default_level: int):
+        super().__init__()
+        self.default_level = default_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = _request_level.get()
+        return record.levelno >= (self.default_level if level is None else level)
+
+class _LogState:
+    """Listener activo y niveles pedidos por las peticiones en curso"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listener: Optional[QueueListener] = None
+        self.filter: Optional[_RequestLevelFilter] = None
+        self.active_levels: Dict[int, int] = {}
+
+_state = _LogState()
+
+def configure_logging(level: Union[int, str, None] = None, fmt: Optional[str] = None,
+                      stream: Any = None) -> bool:
+    """
+    Instala el registro por cola en el logger raíz (idempotente)
+
+    Como ``logging.basicConfig``, no hace nada si el raíz ya tiene handlers
+    (la aplicación anfitriona configuró el suyo). ``IAT_LOG_LEVEL`` da el nivel
+    por defecto e ``IAT_LOG_FORMAT=json`` el formato estructurado; devuelve si
+    se instaló.
+    """
+    with _state.lock:
+        root = logging.getLogger()
+        if _state.listener is not None or root.handlers:
+            return False
+        default_level = parse_level(level if level is not None else os.environ.get(LEVEL_ENV), parse_level(DEFAULT_LEVEL))
+        fmt = (fmt or os.environ.get(FORMAT_ENV, 'text')).strip().lower()
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JSONFormatter() if fmt == 'json'
+                            else logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        handler = _LazyQueueHandler(records)
+        _state.filter = _RequestLevelFilter(default_level)
+        handler.addFilter(_state.filter)
+        root.addHandler(handler)
+        root.setLevel(default_level)
+
+        _state.listener = QueueListener(records, output, respect_handler_level=True)
+        _state.listener.start()
+        atexit.register(shutdown_logging)
+        return True
+
+def shutdown_logging() -> None:
+    """Vacía la cola y detiene el listener (al salir del proceso)"""
+    with _state.lock:
+        listener, _state.listener = _state.listener, None
+    if listener is not None:
+        listener.stop()
+
+def _update_root_level() -> None:
+    # El raíz descarta antes de crear el registro: debe admitir el nivel más bajo pedido
+    if _state.filter is None:
+        return
+    levels = [level for level, count in _state.active_levels.items() if count > 0]
+    logging.getLogger().setLevel(min([_state.filter.default_level] + levels))
+
+@contextmanager
+def request_logging(level: Union[int, str, None]) -> Iterator[None]:
+    """
+    Nivel de log para el código ejecutado dentro del bloque (una petición)
+
+    El nivel viaja en una ``ContextVar``: peticiones concurrentes en otros hilos
+    o tareas siguen filtradas por el nivel por defecto.
+    """
+    if level is None or level == '':
+        yield
+        return
+    value = parse_level(level)
+    token = _request_level.set(value)
+    with _state.lock:
+        _state.active_levels[value] = _state.active_levels.get(value, 0) + 1
+        _update_root_level()
+    try:
+        yield
+    finally:
+        _request_level.reset(token)
+        with _state.lock:
+            _state.active_levels[value] -= 1
+            if not _state.active_levels[value]:
+                del _state.active_levels[value]
+            _update_root_level()
+
+def submit_in_context(executor: Executor, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """
+    ``executor.submit`` con una copia del contexto actual
+
+    Los hilos del executor no heredan las ``ContextVar``: sin copiar el
+    contexto, las tareas ignorarían el nivel de log de la petición. Cada tarea
+    necesita su propia copia (un contexto no puede ejecutarse en dos hilos).
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+_counters: Dict[str, Iterator[int]] = {}
+
+def sample(event: str, every: int) -> bool:
+    """True para el primer evento ``event`` y luego uno de cada ``every``"""
+    if every <= 1:
+        return True
+    counter = _counters.get(event)
+    if counter is None:
+        counter = _counters.setdefault(event, itertools.count())
+    return next(counter) % every == 0
+
+def log_event(logger: logging.Logger, level: int, event: str, msg: str, *args: Any,
+              sample_every: int = 1, **fields: Any) -> None:
+    """
+    Registro estructurado y perezoso de ``event``
+
+    Si el nivel está deshabilitado no se evalúa nada más; con ``sample_every``
+    solo se registra uno de cada N eventos, indicando la tasa en ``sample_every``.
+    """
+    if not logger.isEnabledFor(level) or not sample(event, sample_every):
+        return
+    extra = dict(fields, event=event)
+    if sample_every > 1:
+        extra['sample_every'] = sample_every
+    logger.log(level, msg, *args, extra=extra, stacklevel=2)
@@ -0,0 +1,266 @@
+"""
+IAT Outliers - Motor de exclusión de outliers con varios métodos sobre un solo ordenamiento
+IQR, mediana/MAD, media ± k·SD y cortes absolutos se derivan del mismo array ordenado
+"""
+
+import math
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+from dataclasses import dataclass
+import numpy as np
+
+from .dscore import IQR_MULTIPLIER, grouped_moments, sorted_group_quantile
+
+# Escala para que el MAD estime la desviación estándar bajo normalidad
+MAD_SCALE = 1.4826
+
+OUTLIER_IQR = 'iqr'
+OUTLIER_MAD = 'mad'
+OUTLIER_SD = 'sd'
+OUTLIER_ABSOLUTE = 'absolute'
+
+@dataclass(frozen=True)
+class OutlierMethod:
+    """Método de exclusión: 'iqr', 'mad', 'sd' o 'absolute' (límites [low, high])"""
+    kind: str = OUTLIER_IQR
+    k: float = IQR_MULTIPLIER
+    low: float = 0.0
+    high: float = math.inf
+
+    @property
+    def label(self) -> str:
+        if self.kind == OUTLIER_ABSOLUTE:
+            return f"absolute_{self.low:g}_{self.high:g}"
+        return f"{self.kind}_{self.k:g}"
+
+DEFAULT_OUTLIER_METHOD = OutlierMethod(OUTLIER_IQR, IQR_MULTIPLIER)
+
+DEFAULT_OUTLIER_METHODS = (
+    DEFAULT_OUTLIER_METHOD,
+    OutlierMethod(OUTLIER_MAD, 3.0),
+    OutlierMethod(OUTLIER_SD, 2.5),
+    OutlierMethod(OUTLIER_ABSOLUTE, low=300.0, high=3000.0),
+)
+
+@dataclass
+class OutlierResult:
+    """Exclusiones de un método sobre un bloque"""
+    method: str
+    lower_bound: float
+    upper_bound: float
+    kept: int
+    excluded: int
+    rate: float
+    clean_mean: float
+    clean_std: float
+    start: int  # ventana [start, stop) conservada en el array ordenado
+    stop: int
+
+class SortedRT:
+    """RT de un bloque ordenados una sola vez, con sumas prefijas"""
+
+    def __init__(self, rt: Sequence[float]):
+        rt = np.asarray(rt, dtype=np.float64)
+        self.order = np.argsort(rt, kind='stable')
+        self.values = rt[self.order]
+        self.size = int(self.values.size)
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.values)))
+        self.prefix_sq = np.concatenate(([0.0], np.cumsum(self.values * self.values)))
+
+    def quantile(self, q: float) -> float:
+        """Cuantil con interpolación lineal (como pandas)"""
+        if self.size == 0:
+            return float('nan')
+        return float(sorted_group_quantile(self.values, np.array([0]), np.array([self.size]), q)[0])
+
+    def moments(self, start: int = 0, stop: Optional[int] = None) -> Tuple[float, float]:
+        """Media y desviación (ddof=1) de la ventana ordenada [start, stop)"""
+        stop = self.size if stop is None else stop
+        n = stop - start
+        if n <= 0:
+            return float('nan'), float('nan')
+        total = self.prefix[stop] - self.prefix[start]
+        mean = total / n
+        if n < 2:
+            return float(mean), float('nan')
+        variance = (self.prefix_sq[stop] - self.prefix_sq[start] - total * mean) / (n - 1)
+        return float(mean), float(math.sqrt(max(variance, 0.0)))
+
+    def mad(self) -> float:
+        """
+        Mediana de las desviaciones absolutas
+
+        Las desviaciones a cada lado de la mediana ya son dos tramos ordenados;
+        el ordenamiento estable (timsort) los combina en tiempo lineal.
+        """
+        if self.size == 0:
+            return float('nan')
+        median = self.quantile(0.5)
+        split = int(np.searchsorted(self.values, median))
+        deviations = np.concatenate(((median - self.values[:split])[::-1], self.values[split:] - median))
+        deviations = np.sort(deviations, kind='stable')
+        return float(sorted_group_quantile(deviations, np.array([0]), np.array([self.size]), 0.5)[0])
+
+    def bounds(self, method: OutlierMethod) -> Tuple[float, float]:
+        if method.kind == OUTLIER_IQR:
+            q1, q3 = self.quantile(0.25), self.quantile(0.75)
+            iqr = q3 - q1
+            return q1 - method.k * iqr, q3 + method.k * iqr
+        if method.kind == OUTLIER_MAD:
+            median, spread = self.quantile(0.5), MAD_SCALE * self.mad()
+            return median - method.k * spread, median + method.k * spread
+        if method.kind == OUTLIER_SD:
+            mean, std = self.moments()
+            std = 0.0 if not np.isfinite(std) else std
+            return mean - method.k * std, mean + method.k * std
+        if method.kind == OUTLIER_ABSOLUTE:
+            return method.low, method.high
+        raise ValueError(f"Método de outliers desconocido: {method.kind}")
+
+    def window(self, lower: float, upper: float) -> Tuple[int, int]:
+        """Ventana ordenada de valores dentro de [lower, upper]"""
+        start = int(np.searchsorted(self.values, lower, side='left'))
+        stop = int(np.searchsorted(self.values, upper, side='right'))
+        return start, max(start, stop)
+
+    def apply(self, method: OutlierMethod) -> OutlierResult:
+        if self.size == 0:
+            return OutlierResult(method.label, float('nan'), float('nan'), 0, 0, 0.0,
+                                 float('nan'), float('nan'), 0, 0)
+        lower, upper = self.bounds(method)
+        start, stop = self.window(lower, upper)
+        mean, std = self.moments(start, stop)
+        kept = stop - start
+        return OutlierResult(
+            method=method.label,
+            lower_bound=float(lower),
+            upper_bound=float(upper),
+            kept=kept,
+            excluded=self.size - kept,
+            rate=(self.size - kept) / self.size,
+            clean_mean=mean,
+            clean_std=std,
+            start=start,
+            stop=stop
+        )
+
+    def clean_values(self, result: OutlierResult) -> np.ndarray:
+        """Valores conservados (ordenados)"""
+        return self.values[result.start:result.stop]
+
+    def keep_mask(self, result: OutlierResult) -> np.ndarray:
+        """Máscara de trials conservados en el orden original"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.order[result.start:result.stop]] = True
+        return mask
+
+class OutlierEngine:
+    """Aplica varios métodos de exclusión a partir de un único ordenamiento por bloque"""
+
+    def __init__(self, primary: OutlierMethod = DEFAULT_OUTLIER_METHOD,
+                 methods: Sequence[OutlierMethod] = DEFAULT_OUTLIER_METHODS):
+        self.primary = primary
+        self.methods = list(methods) if primary in methods else [primary, *methods]
+
+    def analyze(self, rt: Sequence[float]) -> 'BlockOutliers':
+        block = SortedRT(rt)
+        return BlockOutliers(block, {method.label: block.apply(method) for method in self.methods},
+                             self.primary.label)
+
+class BlockOutliers:
+    """Resultado de todos los métodos sobre un bloque; ``primary`` alimenta el D-Score"""
+
+    def __init__(self, block: SortedRT, results: Dict[str, OutlierResult], primary: str):
+        self.block = block
+        self.results = results
+        self.primary = primary
+
+    @property
+    def primary_result(self) -> OutlierResult:
+        return self.results[self.primary]
+
+    def clean_values(self, method: Optional[str] = None) -> np.ndarray:
+        return self.block.clean_values(self.results[method or self.primary])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            label: {
+                'lower_bound': result.lower_bound,
+                'upper_bound': result.upper_bound,
+                'excluded': result.excluded,
+                'rate': result.rate,
+            }
+            for label, result in self.results.items()
+        }
+
+def grouped_outlier_bounds(sorted_values: np.ndarray, offsets: np.ndarray,
+                           method: OutlierMethod) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Límites por grupo sobre grupos contiguos ya ordenados (como ``StudyTrialData``)
+
+    Returns:
+        Tuple: (inferior, superior) por grupo
+    """
+    lengths = np.diff(offsets)
+    n_groups = lengths.size
+    starts = np.where(lengths == 0, 0, offsets[:-1])
+    group_ids = np.repeat(np.arange(n_groups), lengths)
+
+    if method.kind == OUTLIER_IQR:
+        q1 = sorted_group_quantile(sorted_values, starts, lengths, 0.25)
+        q3 = sorted_group_quantile(sorted_values, starts, lengths, 0.75)
+        return q1 - method.k * (q3 - q1), q3 + method.k * (q3 - q1)
+    if method.kind == OUTLIER_MAD:
+        median = sorted_group_quantile(sorted_values, starts, lengths, 0.5)
+        deviations = np.abs(sorted_values - median[group_ids])
+        # Único método que necesita un segundo orden: el de las desviaciones por grupo
+        order = np.lexsort((deviations, group_ids))
+        mad = sorted_group_quantile(deviations[order], starts, lengths, 0.5)
+        return median - method.k * MAD_SCALE * mad, median + method.k * MAD_SCALE * mad
+    if method.kind == OUTLIER_SD:
+        mean, std, _ = grouped_moments(sorted_values, group_ids, n_groups)
+        std = np.nan_to_num(std)
+        return mean - method.k * std, mean + method.k * std
+    if method.kind == OUTLIER_ABSOLUTE:
+        return np.full(n_groups, method.low), np.full(n_groups, method.high)
+    raise ValueError(f"Método de outliers desconocido: {method.kind}")
+
+def grouped_outlier_mask(sorted_values: np.ndarray, offsets: np.ndarray, method: OutlierMethod) -> np.ndarray:
+    """Máscara de valores conservados por ``method`` en cada grupo"""
+    lower, upper = grouped_outlier_bounds(sorted_values, offsets, method)
+    group_ids = np.repeat(np.arange(offsets.size - 1), np.diff(offsets))
+    return (sorted_values >= lower[group_ids]) & (sorted_values <= upper[group_ids])
+
+def study_outlier_sensitivity(compatible_rt: np.ndarray, compatible_offsets: np.ndarray,
+                              incompatible_rt: np.ndarray, incompatible_offsets: np.ndarray,
+                              methods: Sequence[OutlierMethod] = DEFAULT_OUTLIER_METHODS) -> List[Dict[str, Any]]:
+    """
+    D-Scores del estudio con cada método de exclusión
+
+    Usa los RT ya ordenados por participante de ``StudyTrialData``: cada método
+    es solo una máscara y unas sumas por grupo, sin reordenar.
+    """
+    n_participants = compatible_offsets.size - 1
+    compatible_ids = np.repeat(np.arange(n_participants), np.diff(compatible_offsets))
+    incompatible_ids = np.repeat(np.arange(n_participants), np.diff(incompatible_offsets))
+    total = compatible_rt.size + incompatible_rt.size
+
+    results = []
+    for method in methods:
+        keep_c = grouped_outlier_mask(compatible_rt, compatible_offsets, method)
+        keep_i = grouped_outlier_mask(incompatible_rt, incompatible_offsets, method)
+        mean_c, std_c, _ = grouped_moments(compatible_rt, compatible_ids, n_participants, keep_c)
+        mean_i, std_i, _ = grouped_moments(incompatible_rt, incompatible_ids, n_participants, keep_i)
+        combined_std = (std_c + std_i) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d_scores = (mean_i - mean_c) / combined_std
+        d_scores[combined_std == 0] = 0.0
+        finite = d_scores[np.isfinite(d_scores)]
+
+        results.append({
+            'method': method.label,
+            'exclusion_rate': float(1 - (keep_c.sum() + keep_i.sum()) / total) if total else 0.0,
+            'mean_d_score': float(finite.mean()) if finite.size else 0.0,
+            'sd_d_score': float(finite.std(ddof=1)) if finite.size > 1 else 0.0,
+            'd_scores': d_scores.tolist(),
+        })
+    return results
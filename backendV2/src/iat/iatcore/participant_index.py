@@ -0,0 +1,216 @@
+"""
+IAT Participant Index - Índice local de resúmenes por sesión, indexado por participante
+Permite test-retest e ICC por consulta al índice, actualizados incrementalmente
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_summaries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    study_id TEXT NOT NULL,
+    participant_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    d_score REAL NOT NULL,
+    compatible_mean_rt REAL,
+    compatible_std_rt REAL,
+    compatible_trials INTEGER,
+    compatible_accuracy REAL,
+    incompatible_mean_rt REAL,
+    incompatible_std_rt REAL,
+    incompatible_trials INTEGER,
+    incompatible_accuracy REAL,
+    recorded_at REAL NOT NULL,
+    UNIQUE (study_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_participant
+    ON session_summaries (study_id, participant_id, seq);
+CREATE TABLE IF NOT EXISTS retest_aggregates (
+    study_id TEXT PRIMARY KEY,
+    n_participants INTEGER NOT NULL DEFAULT 0,
+    n_sessions INTEGER NOT NULL DEFAULT 0,
+    sum_k2 REAL NOT NULL DEFAULT 0,
+    sum_x REAL NOT NULL DEFAULT 0,
+    sum_x2 REAL NOT NULL DEFAULT 0,
+    sum_group_sq_over_k REAL NOT NULL DEFAULT 0,
+    pair_n INTEGER NOT NULL DEFAULT 0,
+    pair_sx REAL NOT NULL DEFAULT 0,
+    pair_sy REAL NOT NULL DEFAULT 0,
+    pair_sxx REAL NOT NULL DEFAULT 0,
+    pair_syy REAL NOT NULL DEFAULT 0,
+    pair_sxy REAL NOT NULL DEFAULT 0
+);
+"""
+
+_AGGREGATE_FIELDS = (
+    'n_participants', 'n_sessions', 'sum_k2', 'sum_x', 'sum_x2', 'sum_group_sq_over_k',
+    'pair_n', 'pair_sx', 'pair_sy', 'pair_sxx', 'pair_syy', 'pair_sxy'
+)
+
+@dataclass
+class TestRetestResult:
+    """Confiabilidad test-retest del D-Score a nivel de estudio"""
+    test_retest_correlation: float  # Pearson entre primera y segunda sesión
+    icc: float                      # ICC(1,1) con todas las sesiones repetidas
+    participants_with_retest: int
+    repeated_sessions: int
+
+class ParticipantIndex:
+    """Índice SQLite de resúmenes de sesión por (estudio, participante)"""
+
+    def __init__(self, path: str = ':memory:'):
+        self.logger = logging.getLogger(f"{__name__}.ParticipantIndex")
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def record_session(self, participant_id: str, session_id: str, d_score: float,
+                       compatible: Optional[Dict[str, float]] = None,
+                       incompatible: Optional[Dict[str, float]] = None,
+                       study_id: str = '') -> TestRetestResult:
+        """
+        Guarda (o reemplaza) el resumen de una sesión y actualiza los agregados
+
+        Solo se recalcula la contribución del participante afectado a partir
+        de sus filas indexadas; el resto del estudio no se vuelve a leer.
+
+        Args:
+            compatible/incompatible: Estadísticos del bloque ('mean', 'std', 'count', 'accuracy')
+        """
+        compatible = compatible or {}
+        incompatible = incompatible or {}
+        with self._lock, self._connection:
+            before = self._participant_contribution(study_id, participant_id)
+            self._connection.execute(
+                """
+                INSERT INTO session_summaries (
+                    study_id, participant_id, session_id, d_score,
+                    compatible_mean_rt, compatible_std_rt, compatible_trials, compatible_accuracy,
+                    incompatible_mean_rt, incompatible_std_rt, incompatible_trials, incompatible_accuracy,
+                    recorded_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (study_id, session_id) DO UPDATE SET
+                    d_score = excluded.d_score,
+                    compatible_mean_rt = excluded.compatible_mean_rt,
+                    compatible_std_rt = excluded.compatible_std_rt,
+                    compatible_trials = excluded.compatible_trials,
+                    compatible_accuracy = excluded.compatible_accuracy,
+                    incompatible_mean_rt = excluded.incompatible_mean_rt,
+                    incompatible_std_rt = excluded.incompatible_std_rt,
+                    incompatible_trials = excluded.incompatible_trials,
+                    incompatible_accuracy = excluded.incompatible_accuracy
+                """,
+                (
+                    study_id, participant_id, session_id, float(d_score),
+                    compatible.get('mean'), compatible.get('std'),
+                    compatible.get('count'), compatible.get('accuracy'),
+                    incompatible.get('mean'), incompatible.get('std'),
+                    incompatible.get('count'), incompatible.get('accuracy'),
+                    time.time()
+                )
+            )
+            after = self._participant_contribution(study_id, participant_id)
+            self._apply_delta(study_id, before, after)
+            return self._retest_from_aggregates(self._aggregates(study_id))
+
+    def participant_history(self, participant_id: str, study_id: str = '') -> List[Dict[str, Any]]:
+        """Resúmenes de todas las sesiones de un participante, en orden de llegada"""
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT * FROM session_summaries WHERE study_id = ? AND participant_id = ? ORDER BY seq",
+                (study_id, participant_id)
+            )
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def test_retest(self, study_id: str = '') -> TestRetestResult:
+        """Test-retest e ICC del estudio en tiempo constante"""
+        with self._lock:
+            return self._retest_from_aggregates(self._aggregates(study_id))
+
+    def _participant_contribution(self, study_id: str, participant_id: str) -> Dict[str, float]:
+        """Contribución de un participante a los agregados (vacía si tiene < 2 sesiones)"""
+        rows = self._connection.execute(
+            "SELECT d_score FROM session_summaries WHERE study_id = ? AND participant_id = ? ORDER BY seq",
+            (study_id, participant_id)
+        ).fetchall()
+        contribution = dict.fromkeys(_AGGREGATE_FIELDS, 0.0)
+        if len(rows) < 2:
+            return contribution
+
+        values = np.array([row[0] for row in rows], dtype=np.float64)
+        k = float(values.size)
+        first, second = values[0], values[1]
+        contribution.update({
+            'n_participants': 1,
+            'n_sessions': k,
+            'sum_k2': k * k,
+            'sum_x': float(values.sum()),
+            'sum_x2': float((values * values).sum()),
+            'sum_group_sq_over_k': float(values.sum() ** 2 / k),
+            'pair_n': 1,
+            'pair_sx': float(first),
+            'pair_sy': float(second),
+            'pair_sxx': float(first * first),
+            'pair_syy': float(second * second),
+            'pair_sxy': float(first * second),
+        })
+        return contribution
+
+    def _apply_delta(self, study_id: str, before: Dict[str, float], after: Dict[str, float]) -> None:
+        self._connection.execute("INSERT OR IGNORE INTO retest_aggregates (study_id) VALUES (?)", (study_id,))
+        assignments = ', '.join(f"{name} = {name} + ?" for name in _AGGREGATE_FIELDS)
+        deltas = [after[name] - before[name] for name in _AGGREGATE_FIELDS]
+        self._connection.execute(
+            f"UPDATE retest_aggregates SET {assignments} WHERE study_id = ?", (*deltas, study_id)
+        )
+
+    def _aggregates(self, study_id: str) -> Dict[str, float]:
+        row = self._connection.execute(
+            f"SELECT {', '.join(_AGGREGATE_FIELDS)} FROM retest_aggregates WHERE study_id = ?", (study_id,)
+        ).fetchone()
+        return dict(zip(_AGGREGATE_FIELDS, row)) if row else dict.fromkeys(_AGGREGATE_FIELDS, 0.0)
+
+    @staticmethod
+    def _retest_from_aggregates(agg: Dict[str, float]) -> TestRetestResult:
+        n = agg['pair_n']
+        correlation = float('nan')
+        if n >= 3:
+            cov = agg['pair_sxy'] - agg['pair_sx'] * agg['pair_sy'] / n
+            var_x = agg['pair_sxx'] - agg['pair_sx'] ** 2 / n
+            var_y = agg['pair_syy'] - agg['pair_sy'] ** 2 / n
+            if var_x > 0 and var_y > 0:
+                correlation = cov / np.sqrt(var_x * var_y)
+
+        # ICC(1,1) de una vía para diseño no balanceado
+        icc = float('nan')
+        groups, total = agg['n_participants'], agg['n_sessions']
+        if groups >= 2 and total > groups:
+            ss_between = agg['sum_group_sq_over_k'] - agg['sum_x'] ** 2 / total
+            ss_within = agg['sum_x2'] - agg['sum_group_sq_over_k']
+            ms_between = ss_between / (groups - 1)
+            ms_within = ss_within / (total - groups)
+            k0 = (total - agg['sum_k2'] / total) / (groups - 1)
+            denominator = ms_between + (k0 - 1) * ms_within
+            if denominator > 0:
+                icc = (ms_between - ms_within) / denominator
+
+        return TestRetestResult(
+            test_retest_correlation=float(correlation),
+            icc=float(icc),
+            participants_with_retest=int(groups),
+            repeated_sessions=int(total)
+        )
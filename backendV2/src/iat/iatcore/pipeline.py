@@ -0,0 +1,149 @@
+"""
+IAT Analysis Pipeline - DAG de etapas de análisis con intermedios memoizados
+Cada nodo se calcula una sola vez por sesión y las ramas independientes
+pueden ejecutarse en paralelo
+"""
+
+import time
+import logging
+from typing import Dict, List, Any, Optional, Callable, Iterable, Tuple
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+from .logs import submit_in_context
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PipelineNode:
+    """Etapa con nombre dentro del DAG de análisis"""
+    name: str
+    func: Callable[..., Any]
+    dependencies: Tuple[str, ...] = ()
+
+@dataclass
+class PipelineRun:
+    """Resultado de una ejecución del pipeline"""
+    values: Dict[str, Any] = field(default_factory=dict)
+    node_timings: Dict[str, float] = field(default_factory=dict)  # segundos
+    total_time: float = 0.0
+
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.values.get(name, default)
+
+class AnalysisPipeline:
+    """DAG de etapas de análisis IAT"""
+
+    def __init__(self, max_workers: int = 1):
+        self.logger = logging.getLogger(f"{__name__}.AnalysisPipeline")
+        self.max_workers = max(1, max_workers)
+        self._nodes: Dict[str, PipelineNode] = {}
+
+    def add_node(self, name: str, func: Callable[..., Any],
+                 dependencies: Iterable[str] = ()) -> 'AnalysisPipeline':
+        """
+        Registra una etapa. ``func`` recibe los valores de sus dependencias
+        en el mismo orden en que fueron declaradas.
+        """
+        if name in self._nodes:
+            raise ValueError(f"Nodo duplicado en pipeline: {name}")
+        self._nodes[name] = PipelineNode(name=name, func=func, dependencies=tuple(dependencies))
+        return self
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes.keys())
+
+    def run(self, inputs: Optional[Dict[str, Any]] = None,
+            targets: Optional[Iterable[str]] = None) -> PipelineRun:
+        """
+        Ejecuta el DAG por niveles topológicos
+
+        Args:
+            inputs: Valores ya conocidos (no se recalculan)
+            targets: Nodos requeridos; por defecto todos. Solo se ejecutan
+                     sus ancestros.
+
+        Returns:
+            PipelineRun: Valores memoizados y tiempos por nodo
+        """
+        start_time = time.perf_counter()
+        run = PipelineRun(values=dict(inputs or {}))
+
+        pending = self._required_nodes(targets, run.values)
+        levels = self._topological_levels(pending, run.values)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+        try:
+            for level in levels:
+                if executor is not None and len(level) > 1:
+                    # Cada etapa con su copia del contexto (nivel de log de la petición)
+                    futures = {
+                        name: submit_in_context(executor, self._execute_node, name, run.values) for name in level
+                    }
+                    for name, future in futures.items():
+                        run.values[name], run.node_timings[name] = future.result()
+                else:
+                    for name in level:
+                        run.values[name], run.node_timings[name] = self._execute_node(name, run.values)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        run.total_time = time.perf_counter() - start_time
+        return run
+
+    def _execute_node(self, name: str, values: Dict[str, Any]) -> Tuple[Any, float]:
+        """Ejecuta un nodo con los valores de sus dependencias"""
+        node = self._nodes[name]
+        args = [values[dep] for dep in node.dependencies]
+        node_start = time.perf_counter()
+        value = node.func(*args)
+        return value, time.perf_counter() - node_start
+
+    def _required_nodes(self, targets: Optional[Iterable[str]], known: Dict[str, Any]) -> List[str]:
+        """Determina los nodos necesarios para obtener los objetivos"""
+        if targets is None:
+            return [name for name in self._nodes if name not in known]
+
+        required: List[str] = []
+        seen = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in seen or name in known:
+                continue
+            if name not in self._nodes:
+                raise KeyError(f"Nodo desconocido en pipeline: {name}")
+            seen.add(name)
+            required.append(name)
+            stack.extend(self._nodes[name].dependencies)
+        return required
+
+    def _topological_levels(self, pending: List[str], known: Dict[str, Any]) -> List[List[str]]:
+        """Agrupa nodos en niveles cuyas dependencias ya están resueltas"""
+        resolved = set(known)
+        remaining = [name for name in self._nodes if name in set(pending)]
+        levels: List[List[str]] = []
+
+        while remaining:
+            level = [
+                name for name in remaining
+                if all(dep in resolved for dep in self._nodes[name].dependencies)
+            ]
+            if not level:
+                missing = {
+                    dep for name in remaining for dep in self._nodes[name].dependencies
+                    if dep not in resolved and dep not in self._nodes
+                }
+                if missing:
+                    raise KeyError(f"Dependencias sin resolver en pipeline: {sorted(missing)}")
+                raise ValueError(f"Ciclo detectado en pipeline: {remaining}")
+            levels.append(level)
+            resolved.update(level)
+            remaining = [name for name in remaining if name not in resolved]
+
+        return levels
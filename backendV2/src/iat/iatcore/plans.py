@@ -0,0 +1,473 @@
+"""
+IAT Plans - Planes de estímulos compilados y cacheados
+Una configuración se compila una vez en un diccionario de estímulos y una
+plantilla de ids enteros por bloque; el plan de cada participante es una
+permutación determinista de la plantilla según su semilla, cacheada por
+(hash de configuración, semilla). Para el trabajo de campo, los planes de todo
+un estudio se pregeneran (contrabalanceados y con límite de rachas) en un
+único archivo empaquetado que se abre con ``np.memmap``
+"""
+
+import os
+import json
+import bisect
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+from dataclasses import dataclass
+import numpy as np
+
+# Cambia si cambia la forma de compilar: invalida hashes y planes persistidos
+PLAN_FORMAT_VERSION = 1
+DEFAULT_PLAN_CACHE_SIZE = 4096
+
+SIDE_LEFT = 0
+SIDE_RIGHT = 1
+
+# Archivo de banco de planes: MAGIC + longitud de cabecera (uint32 LE) + cabecera
+# JSON + arrays alineados a PLAN_BANK_ALIGNMENT bytes
+PLAN_BANK_MAGIC = b'IATPLAN\x01'
+PLAN_BANK_ALIGNMENT = 64
+PLAN_BANK_SUFFIX = '.iatplan'
+# Contador de filas repartidas, junto al banco (compartido entre procesos)
+PLAN_COUNTER_SUFFIX = '.next'
+MAX_SHUFFLE_ATTEMPTS = 1000
+
+def _swap_side(value: Any) -> Any:
+    """'left' <-> 'right' (también como sufijo, p. ej. 'category_left')"""
+    if not isinstance(value, str):
+        return value
+    if value.endswith('left'):
+        return value[:-4] + 'right'
+    if value.endswith('right'):
+        return value[:-5] + 'left'
+    return value
+
+def config_hash(data: Any) -> str:
+    """Hash estable (JSON canónico) de la parte de la configuración que define el plan"""
+    canonical = json.dumps([PLAN_FORMAT_VERSION, data], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+def plan_seed(key: str, pool_size: int) -> int:
+    """Semilla estable en ``[0, pool_size)`` para un participante o sesión"""
+    digest = hashlib.sha256(str(key).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % max(int(pool_size), 1)
+
+@dataclass
+class CompiledPlan:
+    """
+    Plantilla de una configuración
+
+    ``template`` concatena los ids de estímulo de todos los bloques en orden
+    canónico; los bloques con ``shuffled`` se permutan por semilla y el resto
+    conserva el orden de la plantilla.
+    """
+    config_hash: str
+    stimuli: List[Dict[str, Any]]     # id -> campos del estímulo
+    blocks: List[Dict[str, Any]]      # metadatos por bloque
+    template: np.ndarray              # int32
+    offsets: np.ndarray               # int64, n_bloques + 1
+    shuffled: np.ndarray              # bool por bloque
+    correct_sides: np.ndarray         # int8 por estímulo (SIDE_LEFT / SIDE_RIGHT)
+
+    @property
+    def n_trials(self) -> int:
+        return int(self.template.size)
+
+    @property
+    def block_ids(self) -> np.ndarray:
+        """Índice de bloque de cada posición de la plantilla"""
+        return np.repeat(np.arange(len(self.blocks)), np.diff(self.offsets))
+
+    @classmethod
+    def from_blocks(cls, plan_hash: str, blocks: Sequence[Tuple[Dict[str, Any], Sequence[Dict[str, Any]], bool]],
+                    side_field: str = 'correct_response') -> 'CompiledPlan':
+        """
+        Compila bloques (metadatos, estímulos, se_baraja)
+
+        Los estímulos iguales comparten id; los bloques barajados se guardan
+        ordenados por id para que la plantilla no dependa del orden recibido.
+        """
+        index: Dict[Tuple, int] = {}
+        stimuli: List[Dict[str, Any]] = []
+        parts, metas, shuffled = [], [], []
+        for meta, block_stimuli, shuffle in blocks:
+            ids = []
+            for stimulus in block_stimuli:
+                key = tuple(sorted(stimulus.items()))
+                if key not in index:
+                    index[key] = len(stimuli)
+                    stimuli.append(dict(stimulus))
+                ids.append(index[key])
+            ids = np.asarray(ids, dtype=np.int32)
+            parts.append(np.sort(ids) if shuffle else ids)
+            metas.append(dict(meta))
+            shuffled.append(bool(shuffle))
+
+        template = np.concatenate(parts).astype(np.int32) if parts else np.zeros(0, dtype=np.int32)
+        offsets = np.concatenate(([0], np.cumsum([part.size for part in parts]))).astype(np.int64)
+        sides = np.array([SIDE_RIGHT if s.get(side_field) == 'right' else SIDE_LEFT for s in stimuli], dtype=np.int8)
+        for array in (template, offsets, sides):
+            array.setflags(write=False)
+        return cls(config_hash=plan_hash, stimuli=stimuli, blocks=metas, template=template,
+                   offsets=offsets, shuffled=np.asarray(shuffled, dtype=bool), correct_sides=sides)
+
+    def stimulus_table(self, swap_sides: bool = False) -> List[Dict[str, Any]]:
+        """Diccionario de estímulos, con los lados intercambiados si ``swap_sides``"""
+        if not swap_sides:
+            return self.stimuli
+        swapped = self.__dict__.get('_swapped_stimuli')
+        if swapped is None:
+            swapped = [{key: _swap_side(value) if key in ('correct_response', 'stimulus_type') else value
+                        for key, value in stimulus.items()} for stimulus in self.stimuli]
+            self.__dict__['_swapped_stimuli'] = swapped
+        return swapped
+
+    def block_index(self, block_number: int) -> int:
+        for index, block in enumerate(self.blocks):
+            if block.get('block_number') == block_number:
+                return index
+        raise ValueError(f"Bloque inexistente en el plan: {block_number}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'config_hash': self.config_hash,
+            'stimuli': self.stimuli,
+            'blocks': self.blocks,
+            'template': self.template.tolist(),
+            'offsets': self.offsets.tolist(),
+            'shuffled': self.shuffled.tolist(),
+            'correct_sides': self.correct_sides.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompiledPlan':
+        arrays = {
+            'template': np.asarray(data['template'], dtype=np.int32),
+            'offsets': np.asarray(data['offsets'], dtype=np.int64),
+            'correct_sides': np.asarray(data['correct_sides'], dtype=np.int8),
+        }
+        for array in arrays.values():
+            array.setflags(write=False)
+        return cls(config_hash=data['config_hash'], stimuli=data['stimuli'], blocks=data['blocks'],
+                   shuffled=np.asarray(data['shuffled'], dtype=bool), **arrays)
+
+    def realize(self, seed: int) -> np.ndarray:
+        """Ids de estímulo del plan de ``seed``: una sola ordenación con claves aleatorias por bloque"""
+        rng = np.random.default_rng(seed)
+        block_ids = self.block_ids
+        keys = np.where(self.shuffled[block_ids], rng.random(self.n_trials), np.arange(self.n_trials))
+        return self.template[np.lexsort((keys, block_ids))]
+
+@dataclass
+class SessionPlan:
+    """
+    Plan de un participante: ids de estímulo por posición sobre una plantilla compartida
+
+    ``stimulus_ids`` sigue la disposición de bloques de la plantilla;
+    ``block_order`` (índices de bloque) da el orden de presentación y
+    ``swap_sides`` intercambia izquierda/derecha (contrabalanceo).
+    """
+    compiled: CompiledPlan
+    seed: Optional[int]
+    stimulus_ids: np.ndarray          # solo lectura; puede ser una fila de un memmap
+    block_order: Optional[np.ndarray] = None
+    swap_sides: bool = False
+    plan_index: Optional[int] = None  # fila del banco de planes, si viene de uno
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.compiled.offsets
+
+    def presentation_order(self) -> List[int]:
+        if self.block_order is None:
+            return list(range(len(self.compiled.blocks)))
+        return [int(index) for index in self.block_order]
+
+    def block(self, index: int) -> np.ndarray:
+        return self.stimulus_ids[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def n_trials(self) -> int:
+        return self.compiled.n_trials
+
+    def presentation_starts(self) -> Tuple[List[int], List[int]]:
+        """Posición inicial (en orden de presentación) e índice de bloque de cada bloque presentado"""
+        cached = self.__dict__.get('_presentation_starts')
+        if cached is None:
+            order = self.presentation_order()
+            lengths = np.diff(self.offsets)
+            starts = np.concatenate(([0], np.cumsum(lengths[order])[:-1])).astype(int).tolist() if order else []
+            cached = (starts, order)
+            self.__dict__['_presentation_starts'] = cached
+        return cached
+
+    def position(self, block_number: int, trial_number: int) -> Optional[int]:
+        """Posición de presentación del trial (``trial_number`` desde 1); None si no está en el plan"""
+        index = self.__dict__.get('_position_index')
+        if index is None:
+            starts, order = self.presentation_starts()
+            lengths = np.diff(self.offsets)
+            index = {self.compiled.blocks[block]['block_number']: (start, int(lengths[block]))
+                     for start, block in zip(starts, order)}
+            self.__dict__['_position_index'] = index
+        located = index.get(block_number)
+        if located is None or not 1 <= trial_number <= located[1]:
+            return None
+        return located[0] + trial_number - 1
+
+    def trial_at(self, position: int) -> Tuple[int, int, int]:
+        """(índice de bloque, trial desde 1, id de estímulo) de una posición de presentación"""
+        starts, order = self.presentation_starts()
+        slot = bisect.bisect_right(starts, position) - 1
+        block = order[slot]
+        offset = position - starts[slot]
+        return block, offset + 1, int(self.stimulus_ids[self.offsets[block] + offset])
+
+    def stimulus_table(self) -> List[Dict[str, Any]]:
+        return self.compiled.stimulus_table(self.swap_sides)
+
+    def correct_sides(self) -> np.ndarray:
+        sides = self.compiled.correct_sides[self.stimulus_ids]
+        return sides ^ 1 if self.swap_sides else sides
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'config_hash': self.compiled.config_hash,
+            'seed': self.seed,
+            'plan_index': self.plan_index,
+            'block_order': [self.compiled.blocks[index]['block_number'] for index in self.presentation_order()],
+            'swap_sides': self.swap_sides,
+        }
+
+class PlanCache:
+    """
+    Plantillas por hash y planes por (hash, semilla), con expulsión LRU de planes
+
+    Seguro entre hilos; los arrays devueltos son de solo lectura y se comparten.
+    """
+
+    def __init__(self, max_plans: int = DEFAULT_PLAN_CACHE_SIZE):
+        self.max_plans = max_plans
+        self._compiled: Dict[str, CompiledPlan] = {}
+        self._plans: 'OrderedDict[Tuple[str, int], SessionPlan]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compiled(self, plan_hash: str, compile_fn: Callable[[], CompiledPlan]) -> CompiledPlan:
+        with self._lock:
+            compiled = self._compiled.get(plan_hash)
+        if compiled is None:
+            compiled = compile_fn()
+            with self._lock:
+                compiled = self._compiled.setdefault(plan_hash, compiled)
+        return compiled
+
+    def get(self, plan_hash: str, seed: int, compile_fn: Callable[[], CompiledPlan]) -> SessionPlan:
+        key = (plan_hash, int(seed))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+
+        compiled = self.compiled(plan_hash, compile_fn)
+        stimulus_ids = compiled.realize(int(seed))
+        stimulus_ids.setflags(write=False)
+        plan = SessionPlan(compiled=compiled, seed=int(seed), stimulus_ids=stimulus_ids)
+        with self._lock:
+            plan = self._plans.setdefault(key, plan)
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'configs': len(self._compiled), 'plans': len(self._plans),
+                    'hits': self.hits, 'misses': self.misses}
+
+def _max_runs(sides: np.ndarray) -> np.ndarray:
+    """Racha más larga de lados iguales en cada fila de ``sides`` (n_filas, n_trials)"""
+    n_rows, n_cols = sides.shape
+    if n_cols == 0:
+        return np.zeros(n_rows, dtype=np.int64)
+    run = np.ones(n_rows, dtype=np.int64)
+    longest = run.copy()
+    for column in range(1, n_cols):
+        run = np.where(sides[:, column] == sides[:, column - 1], run + 1, 1)
+        np.maximum(longest, run, out=longest)
+    return longest
+
+def generate_plan_rows(compiled: CompiledPlan, n_plans: int, seed: int = 0,
+                       max_run: Optional[int] = None) -> np.ndarray:
+    """
+    Ids de estímulo de ``n_plans`` planes (n_plans, n_trials) con la disposición de la plantilla
+
+    Cada bloque barajado se permuta para todos los planes a la vez (argsort de
+    claves aleatorias por fila); con ``max_run``, las filas con más de
+    ``max_run`` respuestas correctas seguidas del mismo lado se vuelven a barajar.
+    """
+    rng = np.random.default_rng(seed)
+    dtype = np.int16 if len(compiled.stimuli) <= np.iinfo(np.int16).max else np.int32
+    rows = np.empty((n_plans, compiled.n_trials), dtype=dtype)
+    for index, shuffle in enumerate(compiled.shuffled):
+        start, stop = int(compiled.offsets[index]), int(compiled.offsets[index + 1])
+        block = compiled.template[start:stop]
+        if not shuffle or block.size < 2:
+            rows[:, start:stop] = block
+            continue
+
+        pending = np.arange(n_plans)
+        for _ in range(MAX_SHUFFLE_ATTEMPTS):
+            order = np.argsort(rng.random((pending.size, block.size)), axis=1)
+            candidate = block[order]
+            if max_run is not None:
+                ok = _max_runs(compiled.correct_sides[candidate]) <= max_run
+            else:
+                ok = np.ones(pending.size, dtype=bool)
+            rows[pending[ok], start:stop] = candidate[ok]
+            pending = pending[~ok]
+            if pending.size == 0:
+                break
+        else:
+            block_number = compiled.blocks[index].get('block_number')
+            raise ValueError(f"Restricción de rachas (max_run={max_run}) inalcanzable en el bloque {block_number}")
+    return rows
+
+def _aligned(offset: int) -> int:
+    return -(-offset // PLAN_BANK_ALIGNMENT) * PLAN_BANK_ALIGNMENT
+
+def write_plan_bank(path: str, compiled: CompiledPlan, rows: np.ndarray, conditions: np.ndarray,
+                    block_orders: Sequence[Sequence[int]], metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Escribe el banco de planes de forma atómica (archivo temporal + rename)
+
+    Args:
+        rows: Ids de estímulo (n_planes, n_trials) en disposición de plantilla
+        conditions: uint8 por plan = índice de orden de bloques * 2 + intercambio de lados
+        block_orders: Órdenes de presentación (índices de bloque de la plantilla)
+    """
+    rows = np.ascontiguousarray(rows)
+    conditions = np.ascontiguousarray(conditions, dtype=np.uint8)
+    header = {
+        'format': PLAN_FORMAT_VERSION,
+        'compiled': compiled.to_dict(),
+        'n_plans': int(rows.shape[0]),
+        'n_trials': int(rows.shape[1]),
+        'rows_dtype': rows.dtype.str,
+        'block_orders': [[int(index) for index in order] for order in block_orders],
+        'metadata': metadata or {},
+    }
+    # Los offsets dependen del tamaño de la cabecera: se fijan con un tamaño reservado
+    provisional = json.dumps(dict(header, conditions_offset=0, rows_offset=0), ensure_ascii=False)
+    header_size = _aligned(len(PLAN_BANK_MAGIC) + 4 + len(provisional.encode('utf-8')) + 64)
+    header['conditions_offset'] = header_size
+    header['rows_offset'] = _aligned(header_size + conditions.nbytes)
+    encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as bank_file:
+        bank_file.write(PLAN_BANK_MAGIC + struct.pack('<I', len(encoded)) + encoded)
+        bank_file.write(b'\0' * (header['conditions_offset'] - bank_file.tell()))
+        bank_file.write(conditions.tobytes())
+        bank_file.write(b'\0' * (header['rows_offset'] - bank_file.tell()))
+        bank_file.write(rows.tobytes())
+    os.replace(temporary, path)
+    # Un banco nuevo empieza su rotación desde la fila 0
+    if os.path.exists(path + PLAN_COUNTER_SUFFIX):
+        os.remove(path + PLAN_COUNTER_SUFFIX)
+    return {'path': path, 'n_plans': header['n_plans'], 'n_trials': header['n_trials'],
+            'bytes': header['rows_offset'] + rows.nbytes}
+
+class PlanBank:
+    """Banco de planes pregenerados abierto con ``np.memmap`` (solo lectura, compartible entre procesos)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as bank_file:
+            if bank_file.read(len(PLAN_BANK_MAGIC)) != PLAN_BANK_MAGIC:
+                raise ValueError(f"No es un banco de planes IAT: {path}")
+            (length,) = struct.unpack('<I', bank_file.read(4))
+            header = json.loads(bank_file.read(length).decode('utf-8'))
+        if header.get('format') != PLAN_FORMAT_VERSION:
+            raise ValueError(f"Formato de banco de planes no soportado: {header.get('format')}")
+        self.header = header
+        self.compiled = CompiledPlan.from_dict(header['compiled'])
+        self.n_plans = header['n_plans']
+        self.block_orders = [np.asarray(order, dtype=np.int64) for order in header['block_orders']]
+        self.conditions = np.memmap(path, dtype=np.uint8, mode='r',
+                                    offset=header['conditions_offset'], shape=(self.n_plans,))
+        self.rows = np.memmap(path, dtype=np.dtype(header['rows_dtype']), mode='r',
+                              offset=header['rows_offset'], shape=(self.n_plans, header['n_trials']))
+        self._lock = threading.Lock()
+
+    @property
+    def config_hash(self) -> str:
+        return self.compiled.config_hash
+
+    def next_index(self, fallback_key: str = '') -> int:
+        """
+        Siguiente fila en rotación, compartida entre hilos y procesos
+
+        Las condiciones rotan fila a fila: repartir filas consecutivas mantiene
+        equilibrado cualquier prefijo de sesiones. Node lanza un proceso por
+        petición, así que el contador se persiste junto al banco
+        (``<banco>.next``) bajo un bloqueo de archivo. Si no puede usarse
+        (solo lectura, sin ``fcntl``), la fila sale de ``plan_seed(fallback_key)``.
+        """
+        with self._lock:
+            try:
+                return self._claim_index()
+            except (ImportError, OSError, ValueError):
+                return plan_seed(fallback_key, self.n_plans)
+
+    def _claim_index(self) -> int:
+        import fcntl
+        descriptor = os.open(self.path + PLAN_COUNTER_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # El bloqueo se libera al cerrar el descriptor
+            fcntl.flock(descriptor, fcntl.LOCK_EX)
+            stored = os.read(descriptor, 32).strip()
+            index = int(stored) % self.n_plans if stored else 0
+            os.lseek(descriptor, 0, os.SEEK_SET)
+            os.ftruncate(descriptor, 0)
+            os.write(descriptor, str((index + 1) % self.n_plans).encode('ascii'))
+        finally:
+            os.close(descriptor)
+        return index
+
+    def session_plan(self, index: int) -> SessionPlan:
+        """Plan de la fila ``index`` (módulo n_plans); sin aleatorización en el momento"""
+        index = int(index) % self.n_plans
+        condition = int(self.conditions[index])
+        return SessionPlan(
+            compiled=self.compiled,
+            seed=None,
+            stimulus_ids=self.rows[index],
+            block_order=self.block_orders[condition >> 1],
+            swap_sides=bool(condition & 1),
+            plan_index=index
+        )
+
+def generate_plan_bank(path: str, compiled: CompiledPlan, n_plans: int, block_orders: Sequence[Sequence[int]],
+                       swap_sides: bool = True, seed: int = 0, max_run: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Genera y escribe los planes de un estudio
+
+    Las condiciones (orden de bloques × lados) se asignan en rotación, de modo
+    que cualquier prefijo de participantes consecutivos queda equilibrado.
+    """
+    rows = generate_plan_rows(compiled, n_plans, seed=seed, max_run=max_run)
+    n_sides = 2 if swap_sides else 1
+    cycle = np.arange(n_plans) % (len(block_orders) * n_sides)
+    conditions = ((cycle // n_sides) << 1) | (cycle % n_sides)
+    summary = write_plan_bank(path, compiled, rows, conditions.astype(np.uint8), block_orders,
+                              metadata={'seed': seed, 'max_run': max_run, 'swap_sides': swap_sides})
+    summary['conditions'] = len(block_orders) * n_sides
+    return summary
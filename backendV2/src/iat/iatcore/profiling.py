@@ -0,0 +1,247 @@
+"""
+IAT Profiling - Perfilado bajo demanda de peticiones de análisis
+Una petición con ``profile`` (o 1 de cada ``IAT_PROFILE_SAMPLE_EVERY``) se
+ejecuta bajo cProfile o bajo un perfilador por muestreo; el perfil se guarda en
+``IAT_PROFILE_DIR`` con el id de la petición y el resumen de las funciones más
+costosas se adjunta a ``performance_metrics``. Sin perfilado, solo se consulta
+la petición (cProfile, pstats y tempfile se importan al perfilar)
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import logging
+import itertools
+import threading
+from collections import Counter
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_EVERY_ENV = 'IAT_PROFILE_SAMPLE_EVERY'
+MODE_ENV = 'IAT_PROFILE_MODE'
+DIR_ENV = 'IAT_PROFILE_DIR'
+
+MODE_CPROFILE = 'cprofile'
+MODE_SAMPLING = 'sampling'
+PROFILE_MODES = (MODE_CPROFILE, MODE_SAMPLING)
+
+DEFAULT_TOP_N = 20
+DEFAULT_INTERVAL_MS = 5.0
+
+# Clave de función: (archivo, línea de definición, nombre), como en pstats
+FunctionKey = Tuple[str, int, str]
+
+def _env_sample_every() -> int:
+    try:
+        return max(0, int(os.environ.get(SAMPLE_EVERY_ENV, '0') or 0))
+    except ValueError:
+        return 0
+
+# Perfilado por muestreo de peticiones (0 = desactivado), leído una vez por proceso.
+# El sorteo es por petición y no por contador: Node lanza un proceso por petición
+SAMPLE_EVERY = _env_sample_every()
+_request_ids = itertools.count(1)
+
+def profile_dir() -> str:
+    if os.environ.get(DIR_ENV):
+        return os.environ[DIR_ENV]
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'iat-profiles')
+
+def _function_label(key: FunctionKey) -> str:
+    filename, line, name = key
+    if filename == '~':
+        # Funciones C en pstats: ('~', 0, "<built-in method ...>")
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+def _sampled(request_id: Any) -> bool:
+    """Sorteo 1 de cada SAMPLE_EVERY, independiente del proceso"""
+    if SAMPLE_EVERY <= 1:
+        return True
+    if request_id is None:
+        return random.random() < 1.0 / SAMPLE_EVERY
+    import zlib
+    return zlib.crc32(str(request_id).encode('utf-8')) % SAMPLE_EVERY == 0
+
+def profile_options(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Opciones de perfilado de la petición, o None si no se perfila
+
+    ``profile`` admite ``true``, un modo ('cprofile' / 'sampling') o un objeto
+    ``{"mode", "top", "interval_ms"}``. Sin ``profile``, se perfila 1 de cada
+    ``IAT_PROFILE_SAMPLE_EVERY`` peticiones en el modo ``IAT_PROFILE_MODE``
+    (por defecto, muestreo: su coste no depende del número de llamadas).
+    Con ``request_id``/``id`` el sorteo es un hash del id (misma decisión en
+    cualquier proceso); sin id, ``random.random() < 1/N``.
+    """
+    requested = request.get('profile')
+    if not requested:
+        if not SAMPLE_EVERY or not _sampled(request.get('request_id', request.get('id'))):
+            return None
+        requested = {'mode': os.environ.get(MODE_ENV, MODE_SAMPLING), 'sampled': True}
+    if requested is True:
+        requested = {}
+    elif isinstance(requested, str):
+        requested = {'mode': requested}
+
+    mode = str(requested.get('mode', MODE_CPROFILE)).strip().lower()
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfilado no soportado: {mode}")
+    return {
+        'mode': mode,
+        'top': int(requested.get('top', DEFAULT_TOP_N)),
+        'interval_ms': float(requested.get('interval_ms', DEFAULT_INTERVAL_MS)),
+        'sampled': bool(requested.get('sampled', False)),
+        'request_id': request.get('request_id', request.get('id')),
+    }
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo de pilas con ``sys._current_frames``
+
+    Un hilo de fondo toma la pila del hilo de la petición y de los hilos creados
+    mientras perfila (p. ej. el ``ThreadPoolExecutor`` del optimizador), que
+    cProfile no ve. Cuenta las pilas completas: el tiempo propio sale de la hoja
+    y el acumulado, de cada función presente en la pila.
+    """
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS):
+        self.interval = max(interval_ms, 0.5) / 1000.0
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._target: Optional[int] = None
+        self._existing: frozenset = frozenset()
+
+    def start(self) -> None:
+        self._target = threading.get_ident()
+        self._existing = frozenset(thread.ident for thread in threading.enumerate())
+        self._thread = threading.Thread(target=self._run, name='iat-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (ident != self._target and ident in self._existing):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def summary(self, top: int) -> List[Dict[str, Any]]:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for key in set(stack):
+                total[key] += count
+        interval_ms = self.interval * 1000.0
+        return [
+            {
+                'function': _function_label(key),
+                'self_samples': own[key],
+                'total_samples': samples,
+                'self_ms': round(own[key] * interval_ms, 3),
+                'total_ms': round(samples * interval_ms, 3),
+            }
+            for key, samples in total.most_common(top)
+        ]
+
+    def write(self, path: str) -> None:
+        """Pilas plegadas ('f1;f2;f3 N'), el formato de entrada de los flame graphs"""
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(';'.join(_function_label(key) for key in stack) + f" {count}\n")
+
+def _cprofile_summary(profiler: Any, top: int) -> List[Dict[str, Any]]:
+    import pstats
+    stats = pstats.Stats(profiler).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    return [
+        {
+            'function': _function_label(key),
+            'calls': calls,
+            'self_ms': round(own * 1000.0, 3),
+            'total_ms': round(cumulative * 1000.0, 3),
+        }
+        for key, (_, calls, own, cumulative, _) in ranked
+    ]
+
+def _profile_path(request_id: Any, mode: str) -> str:
+    if request_id is None:
+        request_id = f"{int(time.time())}-{os.getpid()}-{next(_request_ids)}"
+    safe_id = re.sub(r'[^A-Za-z0-9._-]', '_', str(request_id))[:128]
+    return os.path.join(profile_dir(), safe_id + ('.prof' if mode == MODE_CPROFILE else '.stacks'))
+
+def run_profiled(request: Dict[str, Any], handler: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Ejecuta ``handler`` y, si la petición lo pide, lo perfila
+
+    El resumen va en ``result['performance_metrics']['profile']`` junto a la
+    ruta del perfil (``.prof`` de pstats o pilas plegadas ``.stacks``). Un fallo
+    al guardar el perfil no hace fallar la petición.
+    """
+    options = profile_options(request)
+    if options is None:
+        return handler()
+
+    started = time.perf_counter()
+    if options['mode'] == MODE_CPROFILE:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = handler()
+        finally:
+            profiler.disable()
+        summary = _cprofile_summary(profiler, options['top'])
+        write = profiler.dump_stats
+    else:
+        profiler = SamplingProfiler(options['interval_ms'])
+        profiler.start()
+        try:
+            result = handler()
+        finally:
+            profiler.stop()
+        summary = profiler.summary(options['top'])
+        write = profiler.write
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+    path: Optional[str] = _profile_path(options['request_id'], options['mode'])
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write(path)
+    except OSError as e:
+        logger.error(f"Error guardando perfil en {path}: {str(e)}")
+        path = None
+
+    report = {
+        'mode': options['mode'],
+        'sampled': options['sampled'],
+        'wall_ms': round(elapsed_ms, 3),
+        'path': path,
+        'top': summary,
+    }
+    if options['mode'] == MODE_SAMPLING:
+        report['samples'] = profiler.samples
+        report['interval_ms'] = options['interval_ms']
+    metrics = result.get('performance_metrics')
+    if not isinstance(metrics, dict):
+        metrics = result['performance_metrics'] = {}
+    metrics['profile'] = report
+    return result
@@ -0,0 +1,153 @@
+"""
+IAT Reliability - Confiabilidad split-half por permutación con corrección Spearman–Brown
+Miles de divisiones aleatorias evaluadas con matrices de índices vectorizadas
+"""
+
+from typing import Optional, Tuple
+from dataclasses import dataclass
+import numpy as np
+
+from .dscore import IQR_MULTIPLIER, grouped_d_scores, grouped_moments
+
+# Presupuesto de elementos (divisiones x trials) por lote
+SPLIT_CHUNK_ELEMENTS = 2_000_000
+
+@dataclass
+class SplitHalfResult:
+    """Confiabilidad split-half promediada sobre divisiones aleatorias"""
+    split_half_correlation: float  # r medio sin corregir
+    spearman_brown: float          # Spearman–Brown del r medio
+    confidence_interval: Tuple[float, float]
+    n_splits: int
+    n_units: int  # participantes (estudio) o celdas (sesión)
+
+def spearman_brown(r: np.ndarray, length_factor: float = 2.0) -> np.ndarray:
+    """Corrección de Spearman–Brown para una prueba ``length_factor`` veces más larga"""
+    r = np.asarray(r, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return length_factor * r / (1 + (length_factor - 1) * r)
+
+def rowwise_correlation(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Correlación de Pearson fila a fila ignorando pares con NaN"""
+    valid = np.isfinite(a) & np.isfinite(b)
+    n = valid.sum(axis=1)
+    a0 = np.where(valid, a, 0.0)
+    b0 = np.where(valid, b, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_a = a0.sum(axis=1) / n
+        mean_b = b0.sum(axis=1) / n
+        da = np.where(valid, a0 - mean_a[:, None], 0.0)
+        db = np.where(valid, b0 - mean_b[:, None], 0.0)
+        r = (da * db).sum(axis=1) / np.sqrt((da * da).sum(axis=1) * (db * db).sum(axis=1))
+    r[n < 3] = np.nan
+    return r
+
+def random_halves(group_ids: np.ndarray, n_splits: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Asigna cada elemento a una mitad aleatoria dentro de su grupo
+
+    Args:
+        group_ids: Grupo de cada elemento (enteros >= 0)
+
+    Returns:
+        np.ndarray: (n_splits, n_elementos) booleano, True = mitad A
+    """
+    n = group_ids.size
+    counts = np.bincount(group_ids)
+    keys = group_ids[None, :] + rng.random((n_splits, n))
+    order = np.argsort(keys, axis=1)
+    # Posición dentro del grupo en el orden aleatorio
+    sorted_groups = group_ids[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = np.arange(n)[None, :] - starts[sorted_groups]
+    halves = np.empty((n_splits, n), dtype=bool)
+    np.put_along_axis(halves, order, positions < counts[sorted_groups] // 2, axis=1)
+    return halves
+
+def _summarize(correlations: np.ndarray, n_units: int) -> SplitHalfResult:
+    finite = correlations[np.isfinite(correlations)]
+    if finite.size == 0:
+        return SplitHalfResult(0.0, 0.0, (0.0, 0.0), int(correlations.size), n_units)
+    # Corrección sobre el r medio: promediar r corregidos diverge cuando r -> -1.
+    # Los percentiles sí pueden corregirse uno a uno (la corrección es monótona)
+    mean_r = float(finite.mean())
+    lower, upper = spearman_brown(np.percentile(finite, [2.5, 97.5]))
+    return SplitHalfResult(
+        split_half_correlation=mean_r,
+        spearman_brown=float(spearman_brown(mean_r)),
+        confidence_interval=(float(lower), float(upper)),
+        n_splits=int(correlations.size),
+        n_units=n_units
+    )
+
+def study_split_half_reliability(compatible_rt: np.ndarray, compatible_offsets: np.ndarray,
+                                 incompatible_rt: np.ndarray, incompatible_offsets: np.ndarray,
+                                 n_splits: int = 5000, seed: Optional[int] = 0,
+                                 iqr_multiplier: float = IQR_MULTIPLIER) -> SplitHalfResult:
+    """
+    Confiabilidad split-half del D-Score a nivel de estudio
+
+    En cada división, los trials compatibles e incompatibles de cada
+    participante se reparten al azar en dos mitades; se calcula el D-Score de
+    cada mitad y se correlacionan entre participantes. Usa el empaquetado de
+    ``StudyTrialData`` (RT ordenados por participante): filtrar con una máscara
+    conserva el orden, así la limpieza IQR no necesita reordenar.
+    """
+    n_participants = len(compatible_offsets) - 1
+    participants = np.arange(n_participants)
+    compatible_owner = np.repeat(participants, np.diff(compatible_offsets))
+    incompatible_owner = np.repeat(participants, np.diff(incompatible_offsets))
+
+    rng = np.random.default_rng(seed)
+    trials = max(1, compatible_rt.size + incompatible_rt.size)
+    per_chunk = max(1, SPLIT_CHUNK_ELEMENTS // trials)
+
+    correlations = []
+    done = 0
+    while done < n_splits:
+        size = min(per_chunk, n_splits - done)
+        compatible_halves = random_halves(compatible_owner, size, rng)
+        incompatible_halves = random_halves(incompatible_owner, size, rng)
+
+        half_scores = []
+        for compatible_mask, incompatible_mask in ((compatible_halves, incompatible_halves),
+                                                   (~compatible_halves, ~incompatible_halves)):
+            c_rows, c_cols = np.nonzero(compatible_mask)
+            i_rows, i_cols = np.nonzero(incompatible_mask)
+            d_scores = grouped_d_scores(
+                compatible_rt[c_cols], c_rows * n_participants + compatible_owner[c_cols],
+                incompatible_rt[i_cols], i_rows * n_participants + incompatible_owner[i_cols],
+                size * n_participants, iqr_multiplier
+            )
+            half_scores.append(d_scores.reshape(size, n_participants))
+
+        correlations.append(rowwise_correlation(half_scores[0], half_scores[1]))
+        done += size
+
+    return _summarize(np.concatenate(correlations), n_participants)
+
+def session_split_half_reliability(rt: np.ndarray, cell_ids: np.ndarray, n_splits: int = 1000,
+                                   seed: Optional[int] = 0) -> SplitHalfResult:
+    """
+    Confiabilidad split-half dentro de una sesión
+
+    Reparte al azar los trials de cada celda (por ejemplo, cada bloque) en dos
+    mitades y correlaciona el RT medio por celda entre mitades.
+    """
+    rt = np.asarray(rt, dtype=np.float64)
+    _, cell_ids = np.unique(np.asarray(cell_ids), return_inverse=True)
+    n_cells = int(cell_ids.max()) + 1 if cell_ids.size else 0
+    if n_cells < 3:
+        return SplitHalfResult(0.0, 0.0, (0.0, 0.0), 0, n_cells)
+
+    rng = np.random.default_rng(seed)
+    halves = random_halves(cell_ids, n_splits, rng)
+    split_index = np.repeat(np.arange(n_splits), rt.size)
+    flat_cells = np.tile(cell_ids, n_splits) + split_index * n_cells
+    flat_rt = np.tile(rt, n_splits)
+    flat_halves = halves.ravel()
+
+    means_a, _, _ = grouped_moments(flat_rt, flat_cells, n_splits * n_cells, flat_halves)
+    means_b, _, _ = grouped_moments(flat_rt, flat_cells, n_splits * n_cells, ~flat_halves)
+    correlations = rowwise_correlation(means_a.reshape(n_splits, n_cells), means_b.reshape(n_splits, n_cells))
+    return _summarize(correlations, n_cells)
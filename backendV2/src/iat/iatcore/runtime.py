@@ -0,0 +1,118 @@
+"""
+IAT Runtime - Perfil de ejecución y medición del arranque en frío
+Los motores solo requieren NumPy; el perfil 'slim' (IAT_RUNTIME_PROFILE=slim)
+además omite etapas opcionales costosas. El bytecode se precompila en el build
+porque el contenedor de Lambda no puede escribir ``__pycache__``
+"""
+
+import os
+import sys
+import time
+import logging
+from types import ModuleType
+from typing import Dict, List, Any, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = 'IAT_RUNTIME_PROFILE'
+PROFILE_FULL = 'full'
+PROFILE_SLIM = 'slim'
+
+def runtime_profile() -> str:
+    """Perfil activo; cualquier valor distinto de 'slim' equivale a 'full'"""
+    return PROFILE_SLIM if os.environ.get(PROFILE_ENV, '').strip().lower() == PROFILE_SLIM else PROFILE_FULL
+
+def is_slim() -> bool:
+    return runtime_profile() == PROFILE_SLIM
+
+def process_uptime_ms() -> Optional[float]:
+    """
+    Milisegundos desde que arrancó el proceso (intérprete + imports)
+
+    Usa ``/proc`` (Linux, resolución de un tick del reloj); None en otros sistemas.
+    """
+    try:
+        with open('/proc/self/stat') as stat_file:
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            fields = stat_file.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+        ticks = os.sysconf(os.sysconf_names['SC_CLK_TCK'])
+        return round(max(0.0, (uptime - int(fields[19]) / ticks) * 1000.0), 1)
+    except (OSError, ValueError, IndexError, KeyError):
+        return None
+
+def bytecode_available(module: ModuleType) -> bool:
+    """Si el módulo tiene bytecode precompilado junto a su fuente"""
+    cached = getattr(module, '__cached__', None)
+    return bool(cached) and os.path.exists(cached)
+
+class ColdStartTimer:
+    """
+    Separa el arranque del proceso del tiempo de cada petición
+
+    Se crea después de los imports del script: ``startup_ms`` cubre intérprete
+    e imports; cada ``finish`` mide la petición y marca si fue la primera
+    del proceso (fría) o una posterior (caliente).
+    """
+
+    def __init__(self, profile: Optional[str] = None):
+        self.profile = profile or runtime_profile()
+        self.startup_ms = process_uptime_ms()
+        self.requests = 0
+        self._started: Optional[float] = None
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+
+    def finish(self, **extra: Any) -> Dict[str, Any]:
+        handler_ms = (time.perf_counter() - self._started) * 1000.0 if self._started is not None else 0.0
+        self._started = None
+        return self.report(handler_ms, **extra)
+
+    def report(self, handler_ms: float, **extra: Any) -> Dict[str, Any]:
+        """Cuenta una petición medida por el llamador (servidores con peticiones concurrentes)"""
+        self.requests += 1
+        report = {
+            'profile': self.profile,
+            'cold_start': self.requests == 1,
+            'startup_ms': self.startup_ms if self.requests == 1 else None,
+            'handler_ms': round(handler_ms, 3),
+            'requests': self.requests,
+        }
+        report.update(extra)
+        return report
+
+def compile_bytecode(paths: Sequence[str], quiet: bool = True) -> bool:
+    """
+    Precompila ``paths`` con pyc de hash no verificado
+
+    El intérprete carga esos pyc sin comparar con la fuente (ni mtime ni hash),
+    lo que evita recompilar en contenedores de solo lectura. Por lo mismo, un
+    pyc obsoleto no se invalida: hay que recompilar tras cada cambio de fuente.
+    """
+    import compileall
+    import py_compile
+    ok = True
+    for path in paths:
+        if os.path.isdir(path):
+            ok &= bool(compileall.compile_dir(
+                path, quiet=int(quiet), invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+            ))
+        else:
+            ok &= bool(compileall.compile_file(
+                path, quiet=int(quiet), invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+            ))
+    return ok
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """``python -m iatcore.runtime compile [rutas...]`` (por defecto, el directorio de scripts IAT)"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] != 'compile':
+        print("Uso: python -m iatcore.runtime compile [rutas...]", file=sys.stderr)
+        return 2
+    paths = argv[1:] or [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    return 0 if compile_bytecode(paths) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
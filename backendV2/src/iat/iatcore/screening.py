@@ -0,0 +1,122 @@
+"""
+IAT Screening - Pre-filtro vectorizado de calidad de datos
+Clasifica una sesión como 'exclude', 'flag' o 'pass' antes de las etapas costosas
+"""
+
+import logging
+from typing import Dict, List, Any, Sequence
+from dataclasses import dataclass, field
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCREEN_EXCLUDE = 'exclude'
+SCREEN_FLAG = 'flag'
+SCREEN_PASS = 'pass'
+
+@dataclass
+class ScreeningConfig:
+    """Umbrales del pre-filtro (Greenwald et al., 2003)"""
+    fast_threshold_ms: float = 300.0
+    max_fast_rate: float = 0.10       # > 10% de trials < 300ms => exclude
+    max_valid_rt_ms: float = 10000.0  # mismo filtro que _prepare_dataframe
+    min_valid_trials: int = 10
+    compatible_blocks: Sequence[int] = (3, 4)
+    incompatible_blocks: Sequence[int] = (6, 7)
+    flag_fast_rate: float = 0.05
+    flag_error_rate: float = 0.30
+    flag_quality_score: float = 0.80
+
+@dataclass
+class ScreeningResult:
+    """Resultado del pre-filtro de calidad"""
+    status: str
+    reasons: List[str] = field(default_factory=list)
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def excluded(self) -> bool:
+        return self.status == SCREEN_EXCLUDE
+
+def extract_trial_arrays(responses: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Extrae RT, bloque y acierto de las respuestas crudas en arrays NumPy"""
+    n = len(responses)
+    return {
+        'rt': np.fromiter((r.get('responseTime', 0) or 0 for r in responses), dtype=np.float64, count=n),
+        'block': np.fromiter((r.get('blockNumber', 0) or 0 for r in responses), dtype=np.int32, count=n),
+        'correct': np.fromiter((bool(r.get('correct', False)) for r in responses), dtype=bool, count=n),
+    }
+
+def screen_responses(responses: List[Dict[str, Any]],
+                     config: ScreeningConfig = ScreeningConfig()) -> ScreeningResult:
+    """Pre-filtro directo sobre las respuestas crudas de la sesión"""
+    arrays = extract_trial_arrays(responses)
+    return screen_trials(arrays['rt'], arrays['block'], arrays['correct'], config)
+
+def screen_trials(rt: np.ndarray, block: np.ndarray, correct: np.ndarray,
+                  config: ScreeningConfig = ScreeningConfig()) -> ScreeningResult:
+    """
+    Pre-filtro de calidad en una sola pasada vectorizada
+
+    Usa los mismos criterios de penalización que ``_assess_data_quality``
+    (rápidas < 200ms, lentas > 5000ms) sobre los trials crudos, sin
+    calcular cuantiles ni bootstrap.
+    """
+    rt = np.asarray(rt, dtype=np.float64)
+    block = np.asarray(block)
+    correct = np.asarray(correct, dtype=bool)
+
+    total = int(rt.size)
+    if total == 0:
+        return ScreeningResult(status=SCREEN_EXCLUDE, reasons=['no_trials'], metrics={'total_trials': 0})
+
+    valid = (rt > 0) & (rt < config.max_valid_rt_ms)
+    valid_count = int(valid.sum())
+    compatible_count = int((valid & np.isin(block, config.compatible_blocks)).sum())
+    incompatible_count = int((valid & np.isin(block, config.incompatible_blocks)).sum())
+
+    if valid_count > 0:
+        valid_rt = rt[valid]
+        # RT <= 0 o ausentes son fallos de registro, no respuestas rápidas
+        fast_rate = float((valid_rt < config.fast_threshold_ms).mean())
+        error_rate = float(1.0 - correct[valid].mean())
+        very_fast_rate = float((valid_rt < 200).mean())
+        slow_rate = float((valid_rt > 5000).mean())
+    else:
+        fast_rate, error_rate, very_fast_rate, slow_rate = 0.0, 1.0, 0.0, 0.0
+
+    quality_estimate = max(0.0, min(1.0, 1.0 - very_fast_rate * 0.2 - slow_rate * 0.1))
+
+    metrics = {
+        'total_trials': total,
+        'valid_trials': valid_count,
+        'valid_rate': valid_count / total,
+        'fast_rate': fast_rate,
+        'error_rate': error_rate,
+        'compatible_trials': compatible_count,
+        'incompatible_trials': incompatible_count,
+        'quality_estimate': quality_estimate,
+    }
+
+    reasons: List[str] = []
+    if fast_rate > config.max_fast_rate:
+        reasons.append('too_many_fast_trials')
+    if valid_count < config.min_valid_trials:
+        reasons.append('insufficient_valid_trials')
+    if compatible_count == 0:
+        reasons.append('missing_compatible_block')
+    if incompatible_count == 0:
+        reasons.append('missing_incompatible_block')
+    if reasons:
+        return ScreeningResult(status=SCREEN_EXCLUDE, reasons=reasons, metrics=metrics)
+
+    if fast_rate > config.flag_fast_rate:
+        reasons.append('elevated_fast_trials')
+    if error_rate > config.flag_error_rate:
+        reasons.append('high_error_rate')
+    if quality_estimate < config.flag_quality_score:
+        reasons.append('low_quality_estimate')
+    if reasons:
+        return ScreeningResult(status=SCREEN_FLAG, reasons=reasons, metrics=metrics)
+
+    return ScreeningResult(status=SCREEN_PASS, metrics=metrics)
@@ -0,0 +1,232 @@
+"""
+IAT Sensitivity - D-Score bajo una rejilla de parámetros de limpieza
+Sobre RT ordenados por grupo con sumas prefijas: cada punto de la rejilla son
+unas pocas búsquedas binarias y restas, sin volver a ordenar ni filtrar
+"""
+
+import math
+from typing import Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, field
+import numpy as np
+
+from .bootstrap import percentile_interval, resample_session
+from .dscore import IQR_MULTIPLIER, sorted_group_quantile
+
+@dataclass
+class SensitivityGrid:
+    """Ejes de la rejilla; los valores por defecto incluyen los del motor"""
+    min_rt: List[float] = field(default_factory=lambda: [0.0, 200.0, 300.0])            # rt > min_rt
+    max_rt: List[float] = field(default_factory=lambda: [10000.0, 5000.0, 3000.0])      # rt < max_rt
+    fast_threshold: List[float] = field(default_factory=lambda: [300.0, 250.0, 350.0])  # exclusión de sesión
+    iqr_multiplier: List[float] = field(default_factory=lambda: [IQR_MULTIPLIER, 2.0, 3.0, math.inf])
+
+    def points(self) -> List[Tuple[float, float, float]]:
+        """Puntos (min_rt, max_rt, iqr) en orden C de los ejes"""
+        return [(low, high, k) for low in self.min_rt for high in self.max_rt for k in self.iqr_multiplier]
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return len(self.min_rt), len(self.max_rt), len(self.iqr_multiplier)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> 'SensitivityGrid':
+        grid = cls()
+        for name in ('min_rt', 'max_rt', 'fast_threshold', 'iqr_multiplier'):
+            if data and data.get(name):
+                setattr(grid, name, [math.inf if v is None else float(v) for v in data[name]])
+        return grid
+
+class GroupedSortedRT:
+    """Grupos contiguos de RT ordenados, con claves globales para búsquedas por grupo"""
+
+    def __init__(self, sorted_values: np.ndarray, offsets: np.ndarray):
+        self.values = np.asarray(sorted_values, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.n_groups = self.offsets.size - 1
+        self.group_ids = np.repeat(np.arange(self.n_groups), np.diff(self.offsets))
+        finite = self.values[np.isfinite(self.values)]
+        low = float(finite.min()) if finite.size else 0.0
+        self.low = low
+        # Separación entre grupos: la clave (grupo, valor) queda ordenada globalmente
+        self.span = (float(finite.max()) - low if finite.size else 0.0) * 2 + 2.0
+        self.keys = self.group_ids * self.span + (self.values - low)
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.values)))
+        self.prefix_sq = np.concatenate(([0.0], np.cumsum(self.values * self.values)))
+        self._base = np.arange(self.n_groups) * self.span
+
+    def search(self, bound: np.ndarray, side: str) -> np.ndarray:
+        """Posición global de ``bound`` (por grupo) dentro de cada grupo"""
+        clipped = np.clip(np.asarray(bound, dtype=np.float64) - self.low, -1.0, self.span - 1.0)
+        return np.searchsorted(self.keys, self._base + clipped, side=side)
+
+    def window_moments(self, start: np.ndarray, stop: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = (stop - start).astype(np.float64)
+        total = self.prefix[stop] - self.prefix[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            variance = (self.prefix_sq[stop] - self.prefix_sq[start] - total * mean) / (n - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        mean[n == 0] = np.nan
+        std[n < 2] = np.nan
+        return mean, std, n
+
+    def clean_moments(self, min_rt: float, max_rt: float,
+                      iqr_multiplier: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Media, desviación y n por grupo tras ``min_rt < rt < max_rt`` y limpieza IQR"""
+        start = self.search(np.full(self.n_groups, min_rt), 'right')
+        stop = np.maximum(start, self.search(np.full(self.n_groups, max_rt), 'left'))
+        if np.isfinite(iqr_multiplier):
+            lengths = stop - start
+            safe_start = np.where(lengths == 0, 0, start)
+            q1 = sorted_group_quantile(self.values, safe_start, lengths, 0.25)
+            q3 = sorted_group_quantile(self.values, safe_start, lengths, 0.75)
+            iqr = q3 - q1
+            start, stop = (
+                np.clip(self.search(q1 - iqr_multiplier * iqr, 'left'), start, stop),
+                np.clip(self.search(q3 + iqr_multiplier * iqr, 'right'), start, stop),
+            )
+        return self.window_moments(start, stop)
+
+    def below_rate(self, threshold: float) -> np.ndarray:
+        """Fracción de valores < threshold por grupo"""
+        lengths = np.diff(self.offsets)
+        below = self.search(np.full(self.n_groups, threshold), 'left') - self.offsets[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(lengths > 0, below / lengths, 0.0)
+
+def grid_d_scores(compatible: GroupedSortedRT, incompatible: GroupedSortedRT,
+                  grid: SensitivityGrid) -> np.ndarray:
+    """
+    D-Score de cada grupo en cada punto de la rejilla
+
+    Returns:
+        np.ndarray: (n_grupos, n_min, n_max, n_iqr); NaN sin datos suficientes
+    """
+    scores = np.empty((compatible.n_groups, len(grid.points())))
+    for index, (low, high, k) in enumerate(grid.points()):
+        mean_c, std_c, _ = compatible.clean_moments(low, high, k)
+        mean_i, std_i, _ = incompatible.clean_moments(low, high, k)
+        combined_std = (std_c + std_i) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d_scores = (mean_i - mean_c) / combined_std
+        d_scores[combined_std == 0] = 0.0
+        scores[:, index] = d_scores
+    return scores.reshape((compatible.n_groups,) + grid.shape)
+
+def _nullable(values: np.ndarray) -> List[Any]:
+    """Lista anidada con None donde no hay datos suficientes (NaN), no un D-Score 0"""
+    values = np.asarray(values, dtype=np.float64).astype(object)
+    values[~np.isfinite(values.astype(np.float64))] = None
+    return values.tolist()
+
+def session_sensitivity(compatible_rt: np.ndarray, incompatible_rt: np.ndarray,
+                        grid: Optional[SensitivityGrid] = None, n_bootstrap: int = 1000,
+                        seed: Optional[int] = 0, max_fast_rate: float = 0.10) -> Dict[str, Any]:
+    """
+    Rejilla de D-Score e IC bootstrap para una sesión
+
+    Las réplicas bootstrap se tratan como grupos: se remuestrean ya ordenadas
+    (``resample_session``, como el IC del motor) y toda la rejilla se evalúa
+    sobre ellas con las mismas búsquedas. Con la misma semilla, el punto con la
+    limpieza del motor reproduce su intervalo; las celdas sin datos
+    suficientes son None.
+
+    >>> from .bootstrap import session_bootstrap_d_scores
+    >>> rng = np.random.default_rng(1)
+    >>> compatible, incompatible = rng.normal(700, 100, 40), rng.normal(800, 120, 40)
+    >>> grid = SensitivityGrid(min_rt=[0.0], max_rt=[10000.0], iqr_multiplier=[IQR_MULTIPLIER])
+    >>> cell = session_sensitivity(compatible, incompatible, grid=grid, seed=0)
+    >>> replicates = session_bootstrap_d_scores(compatible, incompatible, rng=np.random.default_rng(0))
+    >>> bool(np.allclose([cell['ci_lower'][0][0][0], cell['ci_upper'][0][0][0]], percentile_interval(replicates)))
+    True
+    >>> session_sensitivity([700.0], [800.0], grid=grid)['d_score']
+    [[[None]]]
+
+    Args:
+        compatible_rt/incompatible_rt: RT crudos de bloques compatibles e incompatibles
+        max_fast_rate: Fracción de trials rápidos que excluye la sesión
+    """
+    grid = grid or SensitivityGrid()
+    compatible_rt = np.sort(np.asarray(compatible_rt, dtype=np.float64))
+    incompatible_rt = np.sort(np.asarray(incompatible_rt, dtype=np.float64))
+
+    compatible = GroupedSortedRT(compatible_rt, np.array([0, compatible_rt.size]))
+    incompatible = GroupedSortedRT(incompatible_rt, np.array([0, incompatible_rt.size]))
+    d_scores = grid_d_scores(compatible, incompatible, grid)[0]
+
+    rng = np.random.default_rng(seed)
+    resampled = [GroupedSortedRT(values, offsets)
+                 for values, offsets in resample_session(compatible_rt, incompatible_rt, n_bootstrap, rng)]
+    boot = grid_d_scores(resampled[0], resampled[1], grid)
+    ci_lower, ci_upper = percentile_interval(boot)
+    finite = d_scores[np.isfinite(d_scores)]
+
+    all_rt = GroupedSortedRT(np.sort(np.concatenate((compatible_rt, incompatible_rt))),
+                             np.array([0, compatible_rt.size + incompatible_rt.size]))
+    fast_rates = np.array([all_rt.below_rate(threshold)[0] for threshold in grid.fast_threshold])
+
+    return {
+        'axes': {
+            'min_rt': grid.min_rt,
+            'max_rt': grid.max_rt,
+            'iqr_multiplier': [None if not np.isfinite(k) else k for k in grid.iqr_multiplier],
+            'fast_threshold': grid.fast_threshold,
+        },
+        'd_score': _nullable(d_scores),
+        'ci_lower': _nullable(ci_lower),
+        'ci_upper': _nullable(ci_upper),
+        'd_score_range': [float(finite.min()), float(finite.max())] if finite.size else None,
+        'fast_rate': fast_rates.tolist(),
+        'excluded': (fast_rates > max_fast_rate).tolist(),
+    }
+
+def study_sensitivity(compatible_rt: np.ndarray, compatible_offsets: np.ndarray,
+                      incompatible_rt: np.ndarray, incompatible_offsets: np.ndarray,
+                      grid: Optional[SensitivityGrid] = None, max_fast_rate: float = 0.10) -> Dict[str, Any]:
+    """
+    Rejilla del D-Score medio de un estudio
+
+    Usa los RT ordenados por participante de ``StudyTrialData`` (empaquetado
+    sin el corte superior). El umbral rápido excluye participantes según la
+    fracción de trials críticos por debajo de él; el IC es media ± 1.96·EE
+    entre participantes.
+
+    Returns:
+        Dict: Ejes y arrays (n_fast, n_min, n_max, n_iqr)
+    """
+    grid = grid or SensitivityGrid()
+    compatible = GroupedSortedRT(compatible_rt, compatible_offsets)
+    incompatible = GroupedSortedRT(incompatible_rt, incompatible_offsets)
+    d_scores = grid_d_scores(compatible, incompatible, grid)
+
+    n_compatible = np.diff(compatible.offsets)
+    n_incompatible = np.diff(incompatible.offsets)
+    total = np.maximum(n_compatible + n_incompatible, 1)
+
+    means, lowers, uppers, included = [], [], [], []
+    for threshold in grid.fast_threshold:
+        fast = (compatible.below_rate(threshold) * n_compatible
+                + incompatible.below_rate(threshold) * n_incompatible) / total
+        keep = fast <= max_fast_rate
+        subset = d_scores[keep]
+        counts = np.isfinite(subset).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.nanmean(subset, axis=0) if subset.size else np.full(grid.shape, np.nan)
+            se = np.nanstd(subset, axis=0, ddof=1) / np.sqrt(counts) if subset.size else np.full(grid.shape, np.nan)
+        means.append(mean)
+        lowers.append(mean - 1.96 * se)
+        uppers.append(mean + 1.96 * se)
+        included.append(int(keep.sum()))
+
+    return {
+        'axes': {
+            'fast_threshold': grid.fast_threshold,
+            'min_rt': grid.min_rt,
+            'max_rt': grid.max_rt,
+            'iqr_multiplier': [None if not np.isfinite(k) else k for k in grid.iqr_multiplier],
+        },
+        'mean_d_score': _nullable(means),
+        'ci_lower': _nullable(lowers),
+        'ci_upper': _nullable(uppers),
+        'participants_included': included,
+    }
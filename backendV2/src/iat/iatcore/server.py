@@ -0,0 +1,310 @@
+"""
+IAT Server - Servidor RPC asyncio sobre socket Unix para los motores IAT
+Tramas con prefijo de longitud (4 bytes big-endian + JSON UTF-8) sobre un
+``IATDispatcher`` persistente: peticiones concurrentes por conexión,
+contrapresión, cancelación y etapas de CPU en un executor para que el bucle
+siga atendiendo el tráfico en vivo de ``process_response``
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import struct
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+from .dispatcher import IATDispatcher, TEST_ACTIONS, get_dispatcher
+from .logs import configure_logging
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV = 'IAT_RPC_SOCKET'
+DEFAULT_SOCKET_PATH = '/tmp/iat-engine.sock'
+
+HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+# Peticiones sin lectura de tramas pendiente por conexión
+MAX_IN_FLIGHT = 32
+
+# Acciones breves que se atienden en el propio bucle, sin esperar a la CPU
+LIVE_ACTIONS = frozenset(TEST_ACTIONS) | {'ping'}
+
+CANCELLED_RESULT = {'success': False, 'cancelled': True, 'error': 'Petición cancelada'}
+
+class FrameError(Exception):
+    """Trama mal formada o demasiado grande; la conexión no puede resincronizarse"""
+
+async def read_frame(reader: asyncio.StreamReader, max_bytes: int = MAX_FRAME_BYTES) -> Optional[bytes]:
+    """Siguiente trama, o None si el extremo cerró la conexión entre tramas"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise FrameError("Cabecera de trama incompleta")
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > max_bytes:
+        raise FrameError(f"Trama de {length} bytes supera el máximo de {max_bytes}")
+    try:
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise FrameError("Trama incompleta")
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    return HEADER.pack(len(payload)) + payload
+
+class IATRPCServer:
+    """
+    Servidor RPC de los motores IAT
+
+    Cada petición lleva un ``id`` que se devuelve en su respuesta; las respuestas
+    pueden llegar en otro orden. ``{"action": "cancel", "target": <id>}`` cancela
+    una petición en curso de la misma conexión. Al alcanzar ``max_in_flight``
+    peticiones la conexión deja de leer tramas (contrapresión hasta el socket
+    del cliente); las acciones de CPU esperan además un hueco en la cola acotada
+    del executor.
+    """
+
+    def __init__(self, path: Optional[str] = None, dispatcher: Optional[IATDispatcher] = None,
+                 max_in_flight: int = MAX_IN_FLIGHT, cpu_workers: Optional[int] = None,
+                 max_cpu_queue: Optional[int] = None):
+        self.logger = logging.getLogger(f"{__name__}.IATRPCServer")
+        self.path = path or os.environ.get(SOCKET_ENV, DEFAULT_SOCKET_PATH)
+        self.dispatcher = dispatcher or get_dispatcher()
+        self.max_in_flight = max_in_flight
+        self.cpu_workers = cpu_workers or min(os.cpu_count() or 1, 4)
+        self.executor = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix='iat-rpc')
+        self._cpu_slots = asyncio.Semaphore(max_cpu_queue or self.cpu_workers * 2)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {'connections': 0, 'requests': 0, 'cancelled': 0, 'errors': 0}
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.path)
+        os.chmod(self.path, 0o600)
+        self.logger.info(f"Servidor IAT escuchando en {self.path}")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.executor.shutdown(wait=False)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats['connections'] += 1
+        slots = asyncio.Semaphore(self.max_in_flight)
+        write_lock = asyncio.Lock()
+        tasks: Dict[Any, asyncio.Task] = {}
+        closing = False
+
+        async def send(message: Dict[str, Any]) -> None:
+            async with write_lock:
+                writer.write(encode_frame(message))
+                await writer.drain()
+
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                try:
+                    request = json.loads(frame)
+                    if not isinstance(request, dict):
+                        raise ValueError("la petición debe ser un objeto")
+                except ValueError as e:
+                    await send({'id': None, 'success': False, 'error': f'Trama JSON inválida: {str(e)}'})
+                    continue
+
+                request_id = request.get('id')
+                if request.get('action') == 'cancel':
+                    task = tasks.get(request.get('target'))
+                    if task is not None:
+                        task.cancel()
+                    await send({'id': request_id, 'success': True, 'cancelled': task is not None})
+                    continue
+                if request_id in tasks:
+                    await send({'id': request_id, 'success': False, 'error': f'Id de petición duplicado: {request_id}'})
+                    continue
+
+                # Contrapresión: con la conexión saturada no se leen más tramas
+                await slots.acquire()
+                task = asyncio.ensure_future(self._serve(request, send))
+                tasks[request_id] = task
+
+                def _done(task, request_id=request_id):
+                    tasks.pop(request_id, None)
+                    slots.release()
+                    # Cancelada antes de empezar: la corrutina no llegó a responder
+                    if task.cancelled() and not closing:
+                        self.stats['cancelled'] += 1
+                        asyncio.ensure_future(self._reply(send, request_id, CANCELLED_RESULT, 0.0))
+                task.add_done_callback(_done)
+        except FrameError as e:
+            self.logger.error(f"Error de trama, cerrando conexión: {str(e)}")
+            try:
+                await send({'id': None, 'success': False, 'error': str(e)})
+            except ConnectionError:
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            closing = True
+            pending = list(tasks.values())
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            writer.close()
+
+    async def _serve(self, request: Dict[str, Any],
+                     send: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        started = time.perf_counter()
+        action = request.get('action', 'analyze')
+        self.stats['requests'] += 1
+        try:
+            if action == 'ping':
+                result = {'success': True, 'stats': dict(self.stats)}
+            elif action in LIVE_ACTIONS:
+                result = self.dispatcher.dispatch(request)
+            else:
+                result = await self._run_cpu(request)
+        except asyncio.CancelledError:
+            # Una etapa ya en el executor termina igualmente; su resultado se descarta
+            self.stats['cancelled'] += 1
+            result = CANCELLED_RESULT
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error atendiendo {action}: {str(e)}")
+            result = {'success': False, 'error': f'Error en IAT Server: {str(e)}'}
+        await self._reply(send, request.get('id'), result, (time.perf_counter() - started) * 1000.0)
+
+    async def _run_cpu(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Despacha en el executor ocupando un hueco de CPU hasta que el hilo termina
+
+        Cancelar la espera cancela la petición si aún está en cola; si ya se
+        ejecuta, el hueco no se libera hasta que el hilo acaba, de modo que
+        ``max_cpu_queue`` limita también el trabajo de peticiones canceladas.
+        """
+        await self._cpu_slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(self.dispatcher.dispatch, request)
+        except BaseException:
+            self._cpu_slots.release()
+            raise
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._cpu_slots.release))
+        return await asyncio.wrap_future(future)
+
+    async def _reply(self, send: Callable[[Dict[str, Any]], Awaitable[None]], request_id: Any,
+                     result: Dict[str, Any], handler_ms: float) -> None:
+        result = dict(result, id=request_id)
+        result['runtime'] = self.dispatcher.runtime.report(handler_ms)
+        try:
+            await send(result)
+        except (ConnectionError, RuntimeError):
+            pass
+
+class IATRPCClient:
+    """Cliente asyncio del servidor (pruebas en localhost y procesos Python)"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._pending: Dict[Any, asyncio.Future] = {}
+        self._next_id = 0
+        self._reader_task = asyncio.ensure_future(self._read_responses())
+
+    @classmethod
+    async def connect(cls, path: Optional[str] = None) -> 'IATRPCClient':
+        reader, writer = await asyncio.open_unix_connection(path or os.environ.get(SOCKET_ENV, DEFAULT_SOCKET_PATH))
+        return cls(reader, writer)
+
+    async def send(self, request: Dict[str, Any]) -> Any:
+        """Envía sin esperar la respuesta; devuelve el id asignado"""
+        if 'id' not in request:
+            self._next_id += 1
+            request = dict(request, id=self._next_id)
+        self._pending[request['id']] = asyncio.get_running_loop().create_future()
+        self.writer.write(encode_frame(request))
+        await self.writer.drain()
+        return request['id']
+
+    async def wait(self, request_id: Any) -> Dict[str, Any]:
+        try:
+            return await self._pending[request_id]
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Envía y espera la respuesta; cancelar la llamada cancela la petición en el servidor"""
+        request_id = await self.send(request)
+        try:
+            return await asyncio.shield(self._pending[request_id])
+        except asyncio.CancelledError:
+            await self.cancel(request_id)
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def cancel(self, request_id: Any) -> None:
+        self.writer.write(encode_frame({'id': None, 'action': 'cancel', 'target': request_id}))
+        await self.writer.drain()
+
+    async def _read_responses(self) -> None:
+        try:
+            while True:
+                frame = await read_frame(self.reader)
+                if frame is None:
+                    break
+                message = json.loads(frame)
+                future = self._pending.get(message.get('id'))
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except (FrameError, ConnectionError) as e:
+            logger.error(f"Conexión con el servidor IAT interrumpida: {str(e)}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Conexión cerrada por el servidor"))
+
+    async def close(self) -> None:
+        self.writer.close()
+        self._reader_task.cancel()
+        await asyncio.gather(self._reader_task, return_exceptions=True)
+
+async def serve(path: Optional[str] = None) -> None:
+    """Atiende hasta SIGINT/SIGTERM"""
+    server = IATRPCServer(path)
+    await server.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+
+def main(argv: Optional[list] = None) -> int:
+    """``python -m iatcore.server [ruta_socket]``"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    configure_logging()
+    asyncio.run(serve(argv[0] if argv else None))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+IAT Significance - Pruebas de Welch y de permutación sobre el D-Score
+P-valores en forma cerrada con NumPy (sin SciPy), para una sesión o un lote
+"""
+
+import math
+from itertools import combinations
+from typing import Dict, Optional, Tuple
+from dataclasses import dataclass
+import numpy as np
+
+from .dscore import IQR_MULTIPLIER, grouped_clean_mask, grouped_moments
+
+# Presupuesto de elementos (sesiones x permutaciones x trials) por lote de permutaciones
+PERMUTATION_CHUNK_ELEMENTS = 4_000_000
+
+@dataclass
+class SignificanceResult:
+    """Resultado de las pruebas de significancia de una sesión"""
+    welch_t: float
+    welch_df: float
+    welch_p_value: float
+    permutation_p_value: float
+    permutation_method: str  # 'exact', 'sampled' o 'none'
+    n_permutations: int
+
+# ---------------------------------------------------------------------------
+# Distribución t de Student
+# ---------------------------------------------------------------------------
+
+_LANCZOS_G = 7.0
+_LANCZOS_COEFFICIENTS = np.array([
+    0.99999999999980993, 676.5203681218851, -1259.1392167224028,
+    771.32342877765313, -176.61502916214059, 12.507343278686905,
+    -0.13857109526572012, 9.9843695780195716e-6, 1.5056327351493116e-7
+])
+
+def log_gamma(x: np.ndarray) -> np.ndarray:
+    """log Γ(x) vectorizado (aproximación de Lanczos) para x > 0"""
+    x = np.asarray(x, dtype=np.float64)
+    reflect = x < 0.5
+    z = np.where(reflect, 1.0 - x, x) - 1.0
+    series = _LANCZOS_COEFFICIENTS[0] + sum(
+        _LANCZOS_COEFFICIENTS[k] / (z + k) for k in range(1, len(_LANCZOS_COEFFICIENTS))
+    )
+    t = z + _LANCZOS_G + 0.5
+    result = 0.5 * math.log(2 * math.pi) + (z + 0.5) * np.log(t) - t + np.log(series)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reflected = math.log(math.pi) - np.log(np.abs(np.sin(math.pi * x))) - result
+    return np.where(reflect, reflected, result)
+
+def _beta_continued_fraction(a: np.ndarray, b: np.ndarray, x: np.ndarray,
+                             max_iterations: int = 300, epsilon: float = 1e-14) -> np.ndarray:
+    """Fracción continua de la beta incompleta (Lentz modificado), vectorizada"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = np.where(np.abs(d) < tiny, tiny, d)
+    d = 1.0 / d
+    h = d.copy()
+    active = np.ones(x.shape, dtype=bool)
+
+    for m in range(1, max_iterations + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        d = 1.0 / d
+        h = np.where(active, h * d * c, h)
+
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        d = 1.0 / d
+        delta = d * c
+        h = np.where(active, h * delta, h)
+
+        active &= np.abs(delta - 1.0) >= epsilon
+        if not active.any():
+            break
+    return h
+
+def regularized_incomplete_beta(a: np.ndarray, b: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """I_x(a, b) vectorizada"""
+    a, b, x = np.broadcast_arrays(np.asarray(a, dtype=np.float64),
+                                  np.asarray(b, dtype=np.float64),
+                                  np.asarray(x, dtype=np.float64))
+    x = np.clip(x, 0.0, 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_front = (log_gamma(a + b) - log_gamma(a) - log_gamma(b)
+                     + a * np.log(x) + b * np.log1p(-x))
+    front = np.exp(log_front)
+
+    # Simetría I_x(a, b) = 1 - I_{1-x}(b, a) para convergencia rápida
+    direct = x < (a + 1.0) / (a + b + 2.0)
+    aa = np.where(direct, a, b)
+    bb = np.where(direct, b, a)
+    xx = np.where(direct, x, 1.0 - x)
+    fraction = _beta_continued_fraction(aa, bb, xx)
+
+    with np.errstate(invalid='ignore'):
+        result = np.where(direct, front * fraction / a, 1.0 - front * fraction / b)
+    result = np.where(x <= 0.0, 0.0, result)
+    result = np.where(x >= 1.0, 1.0, result)
+    return np.clip(result, 0.0, 1.0)
+
+def student_t_two_sided_p(t: np.ndarray, df: np.ndarray) -> np.ndarray:
+    """P-valor bilateral de la t de Student: I_{df/(df+t²)}(df/2, 1/2)"""
+    t = np.asarray(t, dtype=np.float64)
+    df = np.asarray(df, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = df / (df + t * t)
+    p_values = regularized_incomplete_beta(df / 2.0, 0.5, x)
+    return np.where(np.isfinite(t) & np.isfinite(df) & (df > 0), p_values, np.nan)
+
+# ---------------------------------------------------------------------------
+# Welch
+# ---------------------------------------------------------------------------
+
+def welch_from_moments(mean_c: np.ndarray, std_c: np.ndarray, n_c: np.ndarray,
+                       mean_i: np.ndarray, std_i: np.ndarray, n_i: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Prueba t de Welch (incompatible - compatible) a partir de momentos por grupo
+
+    Returns:
+        Tuple: (t, grados de libertad Welch–Satterthwaite, p bilateral)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_c = std_c ** 2 / n_c
+        var_i = std_i ** 2 / n_i
+        standard_error = np.sqrt(var_c + var_i)
+        t = (mean_i - mean_c) / standard_error
+        df = (var_c + var_i) ** 2 / (var_c ** 2 / (n_c - 1) + var_i ** 2 / (n_i - 1))
+    return t, df, student_t_two_sided_p(t, df)
+
+def welch_test(compatible_rt: np.ndarray, incompatible_rt: np.ndarray,
+               clean: bool = True, iqr_multiplier: float = IQR_MULTIPLIER) -> Tuple[float, float, float]:
+    """Prueba de Welch de una sesión sobre los mismos trials que usa el D-Score"""
+    t, df, p = welch_test_batch(
+        np.sort(np.asarray(compatible_rt, dtype=np.float64)), np.array([0, len(compatible_rt)]),
+        np.sort(np.asarray(incompatible_rt, dtype=np.float64)), np.array([0, len(incompatible_rt)]),
+        clean=clean, iqr_multiplier=iqr_multiplier
+    )
+    return float(t[0]), float(df[0]), float(p[0])
+
+def welch_test_batch(compatible_rt: np.ndarray, compatible_offsets: np.ndarray,
+                     incompatible_rt: np.ndarray, incompatible_offsets: np.ndarray,
+                     clean: bool = True,
+                     iqr_multiplier: float = IQR_MULTIPLIER) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Welch para un lote de sesiones en una sola pasada
+
+    Usa el mismo empaquetado que ``StudyTrialData`` (RT ordenados por sesión
+    y offsets de n_sesiones + 1).
+    """
+    n_sessions = len(compatible_offsets) - 1
+    mean_c, std_c, n_c = _packed_moments(compatible_rt, compatible_offsets, n_sessions, clean, iqr_multiplier)
+    mean_i, std_i, n_i = _packed_moments(incompatible_rt, incompatible_offsets, n_sessions, clean, iqr_multiplier)
+    return welch_from_moments(mean_c, std_c, n_c, mean_i, std_i, n_i)
+
+def _packed_moments(values: np.ndarray, offsets: np.ndarray, n_groups: int,
+                    clean: bool, iqr_multiplier: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    group_ids = np.repeat(np.arange(n_groups), np.diff(offsets))
+    keep = grouped_clean_mask(values, group_ids, n_groups, iqr_multiplier) if clean else None
+    return grouped_moments(values, group_ids, n_groups, keep)
+
+# ---------------------------------------------------------------------------
+# Permutación
+# ---------------------------------------------------------------------------
+
+def _d_statistics(values: np.ndarray, valid: np.ndarray, incompatible: np.ndarray) -> np.ndarray:
+    """
+    D-Score de cada asignación de etiquetas
+
+    Args:
+        values: (sesiones, trials) con relleno
+        valid: (sesiones, trials) máscara de trials reales
+        incompatible: (sesiones, permutaciones, trials) máscara de etiqueta incompatible
+    """
+    x = np.where(valid, values, 0.0)[:, None, :]
+    compatible = valid[:, None, :] & ~incompatible
+    incompatible = incompatible & valid[:, None, :]
+
+    def moments(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = mask.sum(axis=2)
+        total = (x * mask).sum(axis=2)
+        total_sq = (x * x * mask).sum(axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            std = np.sqrt(np.maximum((total_sq - n * mean * mean) / (n - 1), 0.0))
+        return mean, std
+
+    mean_c, std_c = moments(compatible)
+    mean_i, std_i = moments(incompatible)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (mean_i - mean_c) / ((std_c + std_i) / 2)
+
+def permutation_test(compatible_rt: np.ndarray, incompatible_rt: np.ndarray,
+                     n_permutations: int = 2000, exact_threshold: int = 10000,
+                     seed: Optional[int] = 0, clean: bool = True,
+                     iqr_multiplier: float = IQR_MULTIPLIER) -> Tuple[float, str, int]:
+    """
+    Prueba de permutación bilateral del D-Score de una sesión
+
+    Enumera todas las asignaciones si C(n, n_incompatible) <= exact_threshold;
+    en otro caso usa ``n_permutations`` asignaciones aleatorias.
+
+    Returns:
+        Tuple: (p-valor, método, permutaciones evaluadas)
+    """
+    compatible_rt = np.asarray(compatible_rt, dtype=np.float64)
+    incompatible_rt = np.asarray(incompatible_rt, dtype=np.float64)
+    if clean:
+        compatible_rt = _clean(compatible_rt, iqr_multiplier)
+        incompatible_rt = _clean(incompatible_rt, iqr_multiplier)
+
+    n_c, n_i = compatible_rt.size, incompatible_rt.size
+    if n_c < 2 or n_i < 2:
+        return float('nan'), 'none', 0
+
+    pooled = np.concatenate((compatible_rt, incompatible_rt))[None, :]
+    valid = np.ones_like(pooled, dtype=bool)
+    observed_labels = np.zeros((1, 1, pooled.shape[1]), dtype=bool)
+    observed_labels[..., n_c:] = True
+    observed = _d_statistics(pooled, valid, observed_labels)[0, 0]
+
+    total = n_c + n_i
+    if math.comb(total, n_i) <= exact_threshold:
+        labels = np.zeros((math.comb(total, n_i), total), dtype=bool)
+        for row, chosen in enumerate(combinations(range(total), n_i)):
+            labels[row, list(chosen)] = True
+        statistics = _d_statistics(pooled, valid, labels[None, :, :])[0]
+        p_value = float(np.mean(np.abs(statistics) >= abs(observed) - 1e-12))
+        return p_value, 'exact', int(labels.shape[0])
+
+    p_values = permutation_test_batch(pooled[:, :n_c], np.array([n_c]), pooled[:, n_c:], np.array([n_i]),
+                                      n_permutations=n_permutations, seed=seed, observed=np.array([observed]))
+    return float(p_values[0]), 'sampled', n_permutations
+
+def permutation_test_batch(compatible: np.ndarray, compatible_counts: np.ndarray,
+                           incompatible: np.ndarray, incompatible_counts: np.ndarray,
+                           n_permutations: int = 2000, seed: Optional[int] = 0,
+                           observed: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Pruebas de permutación muestreadas para un lote de sesiones
+
+    Args:
+        compatible: (sesiones, max_trials) RT compatibles con relleno
+        compatible_counts: trials reales por sesión
+        incompatible: (sesiones, max_trials) RT incompatibles con relleno
+        incompatible_counts: trials reales por sesión
+        observed: D-Score observado (se calcula si no se indica)
+
+    Returns:
+        np.ndarray: p-valor bilateral por sesión, con corrección (b + 1) / (m + 1)
+    """
+    compatible_counts = np.asarray(compatible_counts)
+    incompatible_counts = np.asarray(incompatible_counts)
+    n_sessions = compatible.shape[0]
+    width = compatible.shape[1] + incompatible.shape[1]
+
+    # Reunir trials válidos al inicio de cada fila: [compatibles | incompatibles | relleno]
+    columns = np.arange(width)
+    totals = compatible_counts + incompatible_counts
+    pooled = np.zeros((n_sessions, width))
+    pooled_c = np.arange(compatible.shape[1])[None, :] < compatible_counts[:, None]
+    pooled_i = np.arange(incompatible.shape[1])[None, :] < incompatible_counts[:, None]
+    rows_c, cols_c = np.nonzero(pooled_c)
+    rows_i, cols_i = np.nonzero(pooled_i)
+    pooled[rows_c, cols_c] = compatible[rows_c, cols_c]
+    pooled[rows_i, compatible_counts[rows_i] + cols_i] = incompatible[rows_i, cols_i]
+    valid = columns[None, :] < totals[:, None]
+
+    if observed is None:
+        labels = (columns[None, :] >= compatible_counts[:, None]) & valid
+        observed = _d_statistics(pooled, valid, labels[:, None, :])[:, 0]
+
+    rng = np.random.default_rng(seed)
+    exceed = np.zeros(n_sessions)
+    per_chunk = max(1, PERMUTATION_CHUNK_ELEMENTS // max(1, n_sessions * width))
+    done = 0
+    while done < n_permutations:
+        size = min(per_chunk, n_permutations - done)
+        # Rango de una clave aleatoria; el relleno va al final
+        keys = rng.random((n_sessions, size, width))
+        keys[~np.broadcast_to(valid[:, None, :], keys.shape)] = 2.0
+        ranks = np.argsort(np.argsort(keys, axis=2), axis=2)
+        labels = ranks >= compatible_counts[:, None, None]
+        statistics = _d_statistics(pooled, valid, labels)
+        exceed += (np.abs(statistics) >= np.abs(observed)[:, None] - 1e-12).sum(axis=1)
+        done += size
+
+    p_values = (exceed + 1) / (n_permutations + 1)
+    p_values[(compatible_counts < 2) | (incompatible_counts < 2)] = np.nan
+    return p_values
+
+def _clean(values: np.ndarray, iqr_multiplier: float) -> np.ndarray:
+    if values.size == 0:
+        return values
+    q1, q3 = np.percentile(values, [25, 75])
+    iqr = q3 - q1
+    return values[(values >= q1 - iqr_multiplier * iqr) & (values <= q3 + iqr_multiplier * iqr)]
+
+def session_significance(compatible_rt: np.ndarray, incompatible_rt: np.ndarray,
+                         n_permutations: int = 2000, seed: Optional[int] = 0,
+                         clean: bool = True) -> SignificanceResult:
+    """Welch + permutación del D-Score para una sesión (``clean=False``: RT ya limpios)"""
+    t, df, p = welch_test(compatible_rt, incompatible_rt, clean=clean)
+    permutation_p, method, evaluated = permutation_test(
+        compatible_rt, incompatible_rt, n_permutations=n_permutations, seed=seed, clean=clean
+    )
+    return SignificanceResult(
+        welch_t=t,
+        welch_df=df,
+        welch_p_value=p,
+        permutation_p_value=permutation_p,
+        permutation_method=method,
+        n_permutations=evaluated
+    )
+
+def batch_significance(compatible_rt: np.ndarray, compatible_offsets: np.ndarray,
+                       incompatible_rt: np.ndarray, incompatible_offsets: np.ndarray,
+                       n_permutations: int = 2000, seed: Optional[int] = 0) -> Dict[str, np.ndarray]:
+    """
+    Welch + permutación para un lote empaquetado como ``StudyTrialData``
+
+    Returns:
+        Dict: arrays 'welch_t', 'welch_df', 'welch_p_value', 'permutation_p_value'
+    """
+    n_sessions = len(compatible_offsets) - 1
+    t, df, p = welch_test_batch(compatible_rt, compatible_offsets, incompatible_rt, incompatible_offsets)
+
+    compatible, compatible_counts = _clean_and_pad(compatible_rt, compatible_offsets, n_sessions)
+    incompatible, incompatible_counts = _clean_and_pad(incompatible_rt, incompatible_offsets, n_sessions)
+    permutation_p = permutation_test_batch(compatible, compatible_counts, incompatible, incompatible_counts,
+                                           n_permutations=n_permutations, seed=seed)
+    return {
+        'welch_t': t,
+        'welch_df': df,
+        'welch_p_value': p,
+        'permutation_p_value': permutation_p,
+    }
+
+def _clean_and_pad(values: np.ndarray, offsets: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Aplica la limpieza IQR por sesión y rellena a una matriz (sesiones, max_trials)"""
+    group_ids = np.repeat(np.arange(n_groups), np.diff(offsets))
+    keep = grouped_clean_mask(values, group_ids, n_groups)
+    kept_values, kept_groups = values[keep], group_ids[keep]
+    counts = np.bincount(kept_groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = np.arange(kept_values.size) - starts[kept_groups]
+    padded = np.zeros((n_groups, int(counts.max()) if n_groups and counts.size else 0))
+    padded[kept_groups, positions] = kept_values
+    return padded, counts
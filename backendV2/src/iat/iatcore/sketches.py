@@ -0,0 +1,171 @@
+"""
+IAT Sketches - Sketch de cuantiles KLL combinable
+Resume distribuciones de RT y D-Score sin conservar los datos crudos
+"""
+
+import math
+from typing import Dict, List, Any, Iterable, Optional
+import numpy as np
+
+DEFAULT_K = 200
+_CAPACITY_DECAY = 2.0 / 3.0
+
+class KLLSketch:
+    """
+    Sketch KLL (Karnin, Lang y Liberty, 2016) con compactadores por nivel
+
+    Los elementos del nivel ``h`` pesan ``2**h``. Cuando el sketch supera su
+    capacidad, el primer nivel lleno se ordena y la mitad de sus elementos
+    (posiciones pares o impares, al azar) sube al nivel siguiente. Dos sketches
+    con el mismo ``k`` se combinan concatenando niveles y compactando.
+    El error de rango es de orden 1/k con alta probabilidad.
+    """
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = int(k)
+        self.n = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.levels: List[np.ndarray] = [np.empty(0)]
+
+    def update(self, values: Iterable[float]) -> 'KLLSketch':
+        """Añade un lote de valores (se ignoran NaN/inf)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return self
+
+        self.n += int(values.size)
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+        return self
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Combina ``other`` en este sketch"""
+        if other.k != self.k:
+            raise ValueError("Sketches KLL con distinto k no son combinables")
+        if other.n == 0:
+            return self
+
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.n += other.n
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Cuantiles aproximados; el 0 y el 1 devuelven mínimo y máximo exactos"""
+        qs = np.asarray(list(qs), dtype=np.float64)
+        if self.n == 0:
+            return [float('nan')] * qs.size
+
+        items, cumulative = self._sorted_view()
+        ranks = qs * cumulative[-1]
+        positions = np.searchsorted(cumulative, ranks, side='left')
+        result = items[np.minimum(positions, items.size - 1)]
+        result = np.where(qs <= 0, self.minimum, result)
+        result = np.where(qs >= 1, self.maximum, result)
+        return [float(value) for value in result]
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def cdf(self, points: Iterable[float]) -> List[float]:
+        """Fracción aproximada de valores <= cada punto"""
+        points = np.asarray(list(points), dtype=np.float64)
+        if self.n == 0:
+            return [float('nan')] * points.size
+
+        items, cumulative = self._sorted_view()
+        positions = np.searchsorted(items, points, side='right')
+        weights = np.concatenate(([0.0], cumulative))[positions]
+        return [float(value) for value in weights / cumulative[-1]]
+
+    def histogram(self, edges: Iterable[float]) -> List[float]:
+        """Conteos aproximados entre bordes consecutivos"""
+        edges = list(edges)
+        if self.n == 0:
+            return [0.0] * max(len(edges) - 1, 0)
+        fractions = np.asarray(self.cdf(edges))
+        return [float(count) for count in np.diff(fractions) * self.n]
+
+    def summary(self, qs: Iterable[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> Dict[str, Any]:
+        qs = list(qs)
+        return {
+            'count': self.n,
+            'min': self.minimum if self.n else None,
+            'max': self.maximum if self.n else None,
+            'quantiles': {f"p{int(round(q * 100)):02d}": value for q, value in zip(qs, self.quantiles(qs))}
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'k': self.k,
+            'n': self.n,
+            'min': self.minimum if self.n else None,
+            'max': self.maximum if self.n else None,
+            'levels': [items.tolist() for items in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KLLSketch':
+        sketch = cls(k=int(data.get('k', DEFAULT_K)))
+        sketch.n = int(data.get('n', 0))
+        if sketch.n:
+            sketch.minimum = float(data['min'])
+            sketch.maximum = float(data['max'])
+        levels = data.get('levels') or [[]]
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in levels]
+        return sketch
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], k: int = DEFAULT_K) -> 'KLLSketch':
+        return cls(k).update(values)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def _compress(self) -> None:
+        while sum(items.size for items in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if items.size >= self._capacity(level):
+                    break
+            else:
+                return
+
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            items = np.sort(items)
+            # Con tamaño impar, el último elemento se queda en su nivel
+            keep = items[-1:] if items.size % 2 else items[:0]
+            paired = items[:items.size - keep.size]
+            offset = self._coin(level)
+            self.levels[level + 1] = np.concatenate((self.levels[level + 1], paired[offset::2]))
+            self.levels[level] = keep
+
+    def _coin(self, level: int) -> int:
+        # Determinista dado el historial, para que los resultados sean reproducibles
+        return int(np.random.default_rng((self.n, level)).integers(2))
+
+    def _sorted_view(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level_items.size, 2.0 ** level)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+def merge_sketches(sketches: Iterable[Optional[KLLSketch]], k: int = DEFAULT_K) -> KLLSketch:
+    """Combina varios sketches (los ``None`` se ignoran)"""
+    merged = KLLSketch(k)
+    for sketch in sketches:
+        if sketch is not None:
+            merged.merge(sketch)
+    return merged
@@ -0,0 +1,176 @@
+"""
+IAT Temporal - Curvas de aprendizaje y fatiga a nivel de trial
+Medias, desviaciones y tasas de error móviles, pendiente y punto de cambio por
+sesión, calculados con sumas acumuladas sobre un lote completo de sesiones
+"""
+
+from typing import Dict, List, Any, Sequence
+from dataclasses import dataclass
+import numpy as np
+
+from .screening import extract_trial_arrays
+
+DEFAULT_WINDOW = 10
+# Estadístico estandarizado mínimo para reportar un punto de cambio
+CHANGEPOINT_THRESHOLD = 3.0
+MIN_SEGMENT = 5
+
+@dataclass
+class TemporalBatch:
+    """Trials de varias sesiones concatenados en orden de presentación"""
+    rt: np.ndarray
+    errors: np.ndarray
+    offsets: np.ndarray
+    session_ids: List[str]
+
+    @property
+    def n_sessions(self) -> int:
+        return self.offsets.size - 1
+
+    @classmethod
+    def from_sessions(cls, sessions: Sequence[Dict[str, Any]], max_rt: float = 10000.0) -> 'TemporalBatch':
+        """Mismo filtro ``0 < rt < max_rt`` de ``_prepare_dataframe``"""
+        rt_parts, error_parts, session_ids = [], [], []
+        for index, session in enumerate(sessions):
+            arrays = extract_trial_arrays(session.get('responses', []))
+            valid = (arrays['rt'] > 0) & (arrays['rt'] < max_rt)
+            rt_parts.append(arrays['rt'][valid])
+            error_parts.append(~arrays['correct'][valid])
+            session_ids.append(str(session.get('sessionId', index)))
+        return cls.from_arrays(rt_parts, error_parts, session_ids)
+
+    @classmethod
+    def from_arrays(cls, rt_parts: Sequence[np.ndarray], error_parts: Sequence[np.ndarray],
+                    session_ids: Sequence[str]) -> 'TemporalBatch':
+        lengths = [len(part) for part in rt_parts]
+        return cls(
+            rt=np.concatenate(rt_parts).astype(np.float64) if rt_parts else np.zeros(0),
+            errors=np.concatenate(error_parts).astype(np.float64) if error_parts else np.zeros(0),
+            offsets=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+            session_ids=list(session_ids)
+        )
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    return np.concatenate(([0.0], np.cumsum(values)))
+
+def rolling_series(batch: TemporalBatch, window: int = DEFAULT_WINDOW) -> Dict[str, np.ndarray]:
+    """
+    Media y desviación de RT y tasa de error en ventana móvil (al final de cada trial)
+
+    Los primeros trials de cada sesión usan la ventana disponible, sin cruzar
+    al inicio de la sesión anterior.
+    """
+    n = batch.rt.size
+    group_ids = np.repeat(np.arange(batch.n_sessions), np.diff(batch.offsets))
+    position = np.arange(n)
+    start = np.maximum(batch.offsets[:-1][group_ids], position + 1 - window)
+    stop = position + 1
+    count = (stop - start).astype(np.float64)
+
+    rt_prefix, rt_sq_prefix = _prefix(batch.rt), _prefix(batch.rt * batch.rt)
+    error_prefix = _prefix(batch.errors)
+
+    total = rt_prefix[stop] - rt_prefix[start]
+    mean = total / count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (rt_sq_prefix[stop] - rt_sq_prefix[start] - total * mean) / (count - 1)
+    std = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), 0.0)
+    error_rate = (error_prefix[stop] - error_prefix[start]) / count
+    return {'mean_rt': mean, 'sd_rt': std, 'error_rate': error_rate}
+
+def linear_slopes(batch: TemporalBatch) -> np.ndarray:
+    """Pendiente de RT por trial (ms/trial) de cada sesión, sin ``polyfit`` por sesión"""
+    lengths = np.diff(batch.offsets).astype(np.float64)
+    group_ids = np.repeat(np.arange(batch.n_sessions), np.diff(batch.offsets))
+    t = np.arange(batch.rt.size) - batch.offsets[:-1][group_ids]
+    k = batch.n_sessions
+    sum_t = np.bincount(group_ids, weights=t, minlength=k)
+    sum_y = np.bincount(group_ids, weights=batch.rt, minlength=k)
+    sum_tt = np.bincount(group_ids, weights=t * t, minlength=k)
+    sum_ty = np.bincount(group_ids, weights=t * batch.rt, minlength=k)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = (lengths * sum_ty - sum_t * sum_y) / (lengths * sum_tt - sum_t * sum_t)
+    return np.where(lengths > 1, slopes, 0.0)
+
+def mean_changepoints(batch: TemporalBatch, min_segment: int = MIN_SEGMENT) -> Dict[str, np.ndarray]:
+    """
+    Punto de cambio único en la media de RT por sesión
+
+    Para cada corte k se evalúa la reducción de suma de cuadrados
+    n1·n2/n·(m1 - m2)² con sumas acumuladas; el máximo por sesión se toma con
+    ``np.maximum.reduceat``. El estadístico es la diferencia estandarizada
+    con la desviación intra-segmentos.
+    """
+    k = batch.n_sessions
+    lengths = np.diff(batch.offsets)
+    group_ids = np.repeat(np.arange(k), lengths)
+    prefix, prefix_sq = _prefix(batch.rt), _prefix(batch.rt * batch.rt)
+
+    # Corte después del trial i: segmento izquierdo [start, i], derecho (i, end)
+    position = np.arange(batch.rt.size)
+    start, end = batch.offsets[:-1][group_ids], batch.offsets[1:][group_ids]
+    n1 = (position + 1 - start).astype(np.float64)
+    n2 = (end - position - 1).astype(np.float64)
+    sum1 = prefix[position + 1] - prefix[start]
+    sum2 = prefix[end] - prefix[position + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain = n1 * n2 / (n1 + n2) * (sum1 / n1 - sum2 / n2) ** 2
+    gain = np.where((n1 >= min_segment) & (n2 >= min_segment), gain, -np.inf)
+
+    index = np.full(k, -1, dtype=np.int64)
+    statistic = np.zeros(k)
+    before = np.full(k, np.nan)
+    after = np.full(k, np.nan)
+    nonempty = lengths > 0
+    if batch.rt.size:
+        best_gain = np.full(k, -np.inf)
+        best_gain[nonempty] = np.maximum.reduceat(gain, batch.offsets[:-1][nonempty])
+        candidates = np.flatnonzero(np.isfinite(best_gain))
+        if candidates.size:
+            # Primera posición que alcanza el máximo de su sesión
+            hit = np.flatnonzero(gain == best_gain[group_ids])
+            first = np.full(k, -1, dtype=np.int64)
+            first[group_ids[hit][::-1]] = hit[::-1]
+            cut = first[candidates]
+
+            s, e = batch.offsets[:-1][candidates], batch.offsets[1:][candidates]
+            a, b = n1[cut], n2[cut]
+            mean_a = sum1[cut] / a
+            mean_b = sum2[cut] / b
+            sse = (prefix_sq[e] - prefix_sq[s]) - a * mean_a ** 2 - b * mean_b ** 2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pooled = np.sqrt(np.maximum(sse, 0.0) / (a + b - 2))
+                stat = np.abs(mean_a - mean_b) / (pooled * np.sqrt(1 / a + 1 / b))
+
+            index[candidates] = cut - s
+            statistic[candidates] = np.nan_to_num(stat)
+            before[candidates] = mean_a
+            after[candidates] = mean_b
+
+    return {'index': index, 'statistic': statistic, 'mean_before': before, 'mean_after': after}
+
+def temporal_curves(batch: TemporalBatch, window: int = DEFAULT_WINDOW,
+                    changepoint_threshold: float = CHANGEPOINT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Curvas móviles, pendiente y punto de cambio de cada sesión del lote"""
+    series = rolling_series(batch, window)
+    slopes = linear_slopes(batch)
+    changepoints = mean_changepoints(batch)
+
+    curves = []
+    for session, (start, stop) in enumerate(zip(batch.offsets[:-1], batch.offsets[1:])):
+        significant = bool(changepoints['statistic'][session] >= changepoint_threshold)
+        curves.append({
+            'session_id': batch.session_ids[session],
+            'window': window,
+            'rolling_mean_rt': series['mean_rt'][start:stop].tolist(),
+            'rolling_sd_rt': series['sd_rt'][start:stop].tolist(),
+            'rolling_error_rate': series['error_rate'][start:stop].tolist(),
+            'slope_ms_per_trial': float(slopes[session]),
+            'changepoint': {
+                'trial_index': int(changepoints['index'][session]) if significant else None,
+                'statistic': float(changepoints['statistic'][session]),
+                'mean_before': float(changepoints['mean_before'][session]) if significant else None,
+                'mean_after': float(changepoints['mean_after'][session]) if significant else None,
+            },
+        })
+    return curves